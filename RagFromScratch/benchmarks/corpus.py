@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Small fixed vocabulary: topic words make chunks distinguishable, filler words make them realistic
+TOPICS = ["menu", "reservation", "delivery", "allergen", "payment", "opening", "parking", "catering", "vegan",
+          "dessert", "wine", "refund", "loyalty", "booking", "kitchen", "staff", "hygiene", "supplier", "invoice",
+          "discount", "takeaway", "breakfast", "lunch", "dinner", "terrace", "event", "gift", "voucher", "order",
+          "complaint", "feedback", "holiday"]
+FILLER = ["the", "a", "our", "guests", "can", "please", "note", "that", "we", "offer", "every", "day", "with",
+          "for", "and", "is", "are", "available", "on", "request", "from", "to", "in", "at", "restaurant", "team",
+          "policy", "service", "time", "minutes", "table", "customers", "should", "contact", "us", "before"]
+
+
+def _sentence(rng, topics):
+    words = rng.choice(FILLER, size=rng.integers(8, 16)).tolist()
+    for topic in topics:
+        words.insert(int(rng.integers(0, len(words) + 1)), topic)
+    words.append(f"code{int(rng.integers(0, 100000))}")
+    return " ".join(words).capitalize() + "."
+
+
+def generate_text(rng, characters):
+    """Synthetic prose of about `characters` characters, a few topics per paragraph."""
+    paragraphs = []
+    length = 0
+    while length < characters:
+        topics = rng.choice(TOPICS, size=2, replace=False).tolist()
+        paragraph = " ".join(_sentence(rng, topics) for _ in range(int(rng.integers(3, 7))))
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def generate_corpus(folder, num_files, characters_per_file=20000, seed=42):
+    """
+    Write a reproducible folder of .txt documents for the load/chunk/ingest benchmarks.
+    :param folder: Target folder, created if needed.
+    :param num_files: Number of files.
+    :param characters_per_file: Approximate size of every file; ~25 chunks at the default chunk size.
+    :param seed: Random seed, the same seed always produces the same corpus.
+    :return: Total number of characters written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    total = 0
+    for index in range(num_files):
+        text = generate_text(rng, characters_per_file)
+        with open(os.path.join(folder, f"doc_{index:06d}.txt"), "w", encoding="utf-8") as document_file:
+            document_file.write(text)
+        total += len(text)
+    return total
+
+
+def generate_chunks(count, chunk_characters=800, seed=42):
+    """
+    Generate chunk Documents directly, for index and retrieval benchmarks at 10^5-10^6 chunks where
+    writing and splitting files would dominate the run.
+    :param count: Number of chunks.
+    :param chunk_characters: Approximate chunk length.
+    :param seed: Random seed.
+    :return: List of Documents with source, start_index and chunk_id metadata.
+    """
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for index in range(count):
+        text = generate_text(rng, chunk_characters)[:chunk_characters]
+        chunks.append(Document(page_content=text,
+                               metadata={"source": f"doc_{index // 25:06d}.txt",
+                                         "start_index": (index % 25) * chunk_characters,
+                                         "chunk_id": f"chunk-{index:07d}"}))
+    return chunks
+
+
+def generate_queries(chunks, count, seed=7):
+    """
+    Known-item queries: a few words taken from a random chunk, so every query has a relevant answer.
+    :return: List of (query, chunk_id of the chunk it was taken from) pairs.
+    """
+    rng = np.random.default_rng(seed)
+    queries = []
+    for row in rng.choice(len(chunks), size=min(count, len(chunks)), replace=False):
+        words = chunks[row].page_content.split()
+        start = int(rng.integers(0, max(1, len(words) - 8)))
+        queries.append((" ".join(words[start:start + 8]), chunks[row].metadata["chunk_id"]))
+    return queries
@@ -0,0 +1,379 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+from RagFromScratch.benchmarks.run_benchmarks import directory_size, environment_info, latency_summary, timed
+from RagFromScratch.benchmarks.stubs import HashingEmbeddings
+
+# Bumped whenever a change invalidates the cached indexes
+CACHE_VERSION = 2
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def bootstrap_eval_set(csv_paths, output_path):
+    """
+    Write an evaluation set from FAQ CSVs (prompt,response columns): every question is expected to
+    retrieve a chunk of its CSV containing its answer. The harness indexes only the answers of
+    these rows, see EvaluationHarness.hold_out_questions.
+    :param csv_paths: FAQ CSV files, e.g. Config.FAQ_FILES.
+    :param output_path: JSONL file to write, one {"question", "sources", "answer"} object per line.
+    :return: List of evaluation items.
+    """
+    from RagFromScratch.src.faq_index import FaqCsvLoader
+
+    items = []
+    for csv_path in csv_paths:
+        for document in FaqCsvLoader(csv_path).lazy_load():
+            if "faq_prompt" in document.metadata:
+                items.append({"question": document.metadata["faq_prompt"],
+                              "sources": [os.path.basename(csv_path)],
+                              "answer": document.metadata["faq_response"]})
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        for item in items:
+            output_file.write(json.dumps(item) + "\n")
+    print(f"📝 Bootstrapped {len(items)} questions from {len(csv_paths)} CSV files into {output_path}")
+    return items
+
+
+def load_eval_set(path):
+    """
+    Read an evaluation set. Each JSONL line holds a question, the sources (paths relative to the
+    data folder, or file names of extra files) that should be retrieved and optionally an answer
+    text the retrieved chunk has to contain, for sources holding many answers like FAQ CSVs.
+    :param path: JSONL file.
+    :return: List of evaluation items.
+    """
+    with open(path, "r", encoding="utf-8") as eval_file:
+        return [json.loads(line) for line in eval_file if line.strip()]
+
+
+def is_relevant(document, item):
+    """A chunk is relevant if it comes from an expected source and, if given, holds part of the answer."""
+    if document.metadata.get("source") not in item["sources"]:
+        return False
+    answer = item.get("answer")
+    if not answer:
+        return True
+    chunk = normalize_text(document.page_content)
+    answer = normalize_text(answer)
+    # The answer may be split over several chunks: its beginning in one, or the chunk inside it
+    return answer[:60] in chunk or (len(chunk) >= 30 and chunk in answer)
+
+
+def score_results(results, item):
+    """
+    :param results: Ranked documents retrieved for the item's question.
+    :param item: Evaluation item.
+    :return: Tuple of (recall: share of the expected sources found, reciprocal rank of the first relevant chunk).
+    """
+    found = set()
+    reciprocal_rank = 0.0
+    for rank, document in enumerate(results, start=1):
+        if is_relevant(document, item):
+            found.add(document.metadata["source"])
+            if not reciprocal_rank:
+                reciprocal_rank = 1 / rank
+    return len(found) / len(item["sources"]), reciprocal_rank
+
+
+def create_embeddings(model):
+    """'hash' for the offline feature-hashing embedder, else a sentence-transformers model name."""
+    if model == "hash":
+        return HashingEmbeddings()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    from RagFromScratch.src.config import Config
+
+    return HuggingFaceEmbeddings(model_name=model, model_kwargs={"device": "cpu"},
+                                 encode_kwargs={"normalize_embeddings": True,
+                                                "batch_size": Config.EMBEDDING_BATCH_SIZE})
+
+
+class EvaluationHarness:
+    """
+    Sweeps chunking, embedding model and k over a labelled question set and reports retrieval
+    quality (recall@k, MRR) next to the cost of each configuration (ingest time, index size,
+    query p95). Stages only depending on part of a configuration are computed once and shared:
+    - the corpus is loaded once (unchanged PDFs come from the parsed document cache)
+    - chunks are cached per chunker, size and overlap
+    - embedded and persisted indexes are cached on disk per corpus, model and chunking, together
+      with the time it took to build them, so later sweeps and reruns only search
+    - query embeddings are computed once per model
+    FAQ rows whose question is in the evaluation set are indexed with their answer only: a chunk
+    holding the question verbatim would make retrieving it trivial and inflate recall to ~1.0.
+    """
+
+    def __init__(self, data_folder, eval_items, cache_dir, extra_files=()):
+        self.data_folder = data_folder
+        self.eval_items = eval_items
+        self.cache_dir = cache_dir
+        self.extra_files = [path for path in extra_files if os.path.exists(path)]
+
+        self.documents = None
+        self.load_seconds = 0.0
+        self.corpus_fingerprint = None
+        self._chunks = {}
+        self._indexes = {}
+        self._embeddings = {}
+        self._query_vectors = {}
+
+    def load_corpus(self):
+        from RagFromScratch.src.document_processor import DocumentProcessor
+
+        processor = DocumentProcessor()
+        started = time.perf_counter()
+        documents = processor.load_documents(self.data_folder) if os.path.exists(self.data_folder) else []
+        for file_path in self.extra_files:
+            documents.extend(processor.load_file(file_path, source=os.path.basename(file_path)))
+        self.load_seconds = time.perf_counter() - started
+        held_out = self.hold_out_questions(documents)
+        self.documents = documents
+
+        files = sorted({(doc.metadata["source"], doc.metadata["file_hash"]) for doc in documents})
+        self.corpus_fingerprint = hashlib.sha1(json.dumps([files, held_out]).encode("utf-8")).hexdigest()[:16]
+        print(f"📚 Corpus: {len(files)} files, {len(documents)} documents in {self.load_seconds:.2f}s, "
+              f"{len(held_out)} FAQ questions held out")
+        processor.print_parsed_cache_stats()
+
+    def hold_out_questions(self, documents):
+        """
+        Replace the text of FAQ documents whose question is an evaluation question by their answer.
+        :param documents: Loaded corpus documents, modified in place.
+        :return: Sorted list of (source, row) of the held-out FAQ rows.
+        """
+        questions = {normalize_text(item["question"]) for item in self.eval_items}
+        held_out = []
+        for document in documents:
+            prompt = document.metadata.get("faq_prompt")
+            if prompt and normalize_text(prompt) in questions:
+                document.page_content = document.metadata["faq_response"]
+                held_out.append((document.metadata["source"], document.metadata.get("row")))
+        return sorted(held_out, key=str)
+
+    def chunks(self, chunker, chunk_size, chunk_overlap):
+        """Chunks of the corpus and the seconds it took to produce them, cached per chunking."""
+        key = (chunker, chunk_size, chunk_overlap)
+        if key not in self._chunks:
+            from RagFromScratch.src.document_processor import DocumentProcessor
+
+            processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunker=chunker,
+                                          use_parsed_cache=False)
+            started = time.perf_counter()
+            chunks = processor.text_splitter.split_documents(self.documents)
+            DocumentProcessor.assign_chunk_ids(chunks)
+            self._chunks[key] = (chunks, time.perf_counter() - started)
+        return self._chunks[key]
+
+    def embeddings(self, model):
+        if model not in self._embeddings:
+            self._embeddings[model] = create_embeddings(model)
+        return self._embeddings[model]
+
+    def index(self, model, chunker, chunk_size, chunk_overlap):
+        """
+        Embedded and persisted index of one model and chunking, built once and reused from disk.
+        :return: Tuple of (NumpyVectorStore, build record with chunks, chunk/embed/index seconds and size).
+        """
+        from RagFromScratch.src.config import Config
+        from RagFromScratch.src.numpy_vector_store import NumpyVectorStore
+
+        key = json.dumps([CACHE_VERSION, self.corpus_fingerprint, model, chunker, chunk_size, chunk_overlap,
+                          Config.CHUNK_SIZE_UNIT, Config.CHUNK_TOKEN_SIZE, Config.CHUNK_TOKEN_OVERLAP,
+                          Config.VECTOR_DTYPE])
+        if key in self._indexes:
+            return self._indexes[key]
+
+        index_dir = os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+        record_path = os.path.join(index_dir, "build.json")
+        if os.path.exists(record_path):
+            with open(record_path, "r", encoding="utf-8") as record_file:
+                record = json.load(record_file)
+            store = NumpyVectorStore.load(index_dir, self.embeddings(model))
+        else:
+            shutil.rmtree(index_dir, ignore_errors=True)
+            chunks, chunk_seconds = self.chunks(chunker, chunk_size, chunk_overlap)
+            texts = [chunk.page_content for chunk in chunks]
+            vectors, embed_seconds = timed(self.embeddings(model).embed_documents, texts)
+
+            store = NumpyVectorStore(self.embeddings(model), persist_directory=index_dir, dtype=Config.VECTOR_DTYPE)
+
+            def build():
+                store.add_embeddings(texts, vectors, metadatas=[chunk.metadata for chunk in chunks],
+                                     ids=[chunk.metadata["chunk_id"] for chunk in chunks])
+                store.persist()
+
+            _, index_seconds = timed(build)
+            record = {"chunks": len(chunks), "chunk_seconds": chunk_seconds, "embed_seconds": embed_seconds,
+                      "index_seconds": index_seconds, "index_megabytes": directory_size(index_dir) / 2 ** 20}
+            # Written last, so an interrupted build is redone on the next run
+            with open(record_path, "w", encoding="utf-8") as record_file:
+                json.dump(record, record_file, indent=2)
+
+        self._indexes[key] = (store, record)
+        return self._indexes[key]
+
+    def query_vectors(self, model):
+        """Query embeddings of the evaluation questions and the latency of each, computed once per model."""
+        if model not in self._query_vectors:
+            embeddings = self.embeddings(model)
+            embeddings.embed_query(self.eval_items[0]["question"])  # Warm-up: model load
+            vectors, latencies = [], []
+            for item in self.eval_items:
+                vector, seconds = timed(embeddings.embed_query, item["question"])
+                vectors.append(vector)
+                latencies.append(seconds)
+            self._query_vectors[model] = (vectors, latencies)
+        return self._query_vectors[model]
+
+    def evaluate(self, model, chunker, chunk_size, chunk_overlap, k):
+        """
+        Evaluate one configuration.
+        :return: Dictionary with the configuration, recall@k, MRR, ingest time, index size and query latency.
+        """
+        store, record = self.index(model, chunker, chunk_size, chunk_overlap)
+        vectors, embed_latencies = self.query_vectors(model)
+
+        recalls, reciprocal_ranks, latencies = [], [], []
+        for item, vector, embed_seconds in zip(self.eval_items, vectors, embed_latencies):
+            results, search_seconds = timed(store.similarity_search_with_score_by_vector, vector, k=k)
+            recall, reciprocal_rank = score_results([document for document, _ in results], item)
+            recalls.append(recall)
+            reciprocal_ranks.append(reciprocal_rank)
+            latencies.append(embed_seconds + search_seconds)
+
+        latency = latency_summary(latencies)
+        ingest_seconds = (self.load_seconds + record["chunk_seconds"] + record["embed_seconds"]
+                          + record["index_seconds"])
+        return {"model": model, "chunker": chunker, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+                "k": k, "recall": float(np.mean(recalls)), "mrr": float(np.mean(reciprocal_ranks)),
+                "chunks": record["chunks"], "ingest_seconds": ingest_seconds,
+                "index_megabytes": record["index_megabytes"], "query_p50_ms": latency["p50_ms"],
+                "query_p95_ms": latency["p95_ms"]}
+
+    def sweep(self, models, chunkers, chunk_sizes, chunk_overlaps, ks):
+        """
+        Evaluate every combination of the grid, skipping overlaps not smaller than the chunk size.
+        The loops are ordered so each index is built once and then searched for every k.
+        :return: List of result rows, see evaluate().
+        """
+        if self.documents is None:
+            self.load_corpus()
+
+        rows = []
+        for model, chunker, chunk_size, chunk_overlap in itertools.product(models, chunkers, chunk_sizes,
+                                                                           chunk_overlaps):
+            if chunk_overlap >= chunk_size:
+                continue
+            print(f"⏱️ {model} / {chunker} {chunk_size}/{chunk_overlap}...")
+            for k in ks:
+                rows.append(self.evaluate(model, chunker, chunk_size, chunk_overlap, k))
+        return rows
+
+
+def select_configuration(rows, min_recall, min_mrr=0.0):
+    """
+    Fastest configuration meeting the quality bar: lowest query p95, then lowest ingest time.
+    :return: The selected row, or None if no configuration reaches the bar.
+    """
+    passing = [row for row in rows if row["recall"] >= min_recall and row["mrr"] >= min_mrr]
+    return min(passing, key=lambda row: (row["query_p95_ms"], row["ingest_seconds"]), default=None)
+
+
+def print_report(rows, best=None):
+    print(f"📊 {'model':<28} {'chunker':<9} {'size':>5} {'overlap':>7} {'k':>3} {'recall':>7} {'MRR':>6} "
+          f"{'chunks':>7} {'ingest s':>9} {'index MB':>9} {'p95 ms':>8}")
+    for row in rows:
+        marker = "✅" if row is best else "  "
+        print(f"{marker} {row['model']:<28} {row['chunker']:<9} {row['chunk_size']:>5} {row['chunk_overlap']:>7} "
+              f"{row['k']:>3} {row['recall']:>7.3f} {row['mrr']:>6.3f} {row['chunks']:>7} "
+              f"{row['ingest_seconds']:>9.2f} {row['index_megabytes']:>9.2f} {row['query_p95_ms']:>8.2f}")
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part]
+
+
+def _str_list(value):
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def main():
+    from RagFromScratch.src.config import Config
+
+    parser = argparse.ArgumentParser(
+        description="Offline retrieval evaluation: sweeps chunk size, overlap, chunker, embedding model and k over "
+                    "a labelled question set and reports recall@k, MRR, ingest time, index size and query p95.",
+        epilog="Example: python -m RagFromScratch.benchmarks.evaluate --chunk-sizes 300,600,1000 "
+               "--chunk-overlaps 0,100,200 --k 2,4,8 --min-recall 0.9 --output eval.json")
+    parser.add_argument("--data-folder", default=Config.DATA_FOLDER, help="Corpus folder, walked recursively.")
+    parser.add_argument("--extra-files", default=",".join(Config.FAQ_FILES),
+                        help="Comma-separated files indexed besides the data folder.")
+    parser.add_argument("--eval-set", default="./storage/eval_set.jsonl",
+                        help="JSONL question set, bootstrapped from the FAQ CSVs if it does not exist.")
+    parser.add_argument("--bootstrap-from", help="Comma-separated FAQ CSVs to (re)build the question set from.")
+    parser.add_argument("--cache-dir", default="./storage/eval_cache", help="Cache of the built indexes.")
+    parser.add_argument("--models", type=_str_list, default=["hash"],
+                        help="Comma-separated sentence-transformers models from the local cache, or 'hash' for the "
+                             "model-free hashing embedder.")
+    parser.add_argument("--chunkers", type=_str_list, default=[Config.CHUNKER])
+    parser.add_argument("--chunk-sizes", type=_int_list, help=f"Default: {Config.CHUNK_SIZE}.")
+    parser.add_argument("--chunk-overlaps", type=_int_list, help=f"Default: {Config.CHUNK_OVERLAP}.")
+    parser.add_argument("--k", type=_int_list, default=[Config.SEARCH_K])
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Quality bar on recall@k.")
+    parser.add_argument("--min-mrr", type=float, default=0.0, help="Quality bar on MRR.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    if Config.CHUNK_SIZE_UNIT == "tokens" and "structure" in args.chunkers:
+        if args.chunk_sizes or args.chunk_overlaps:
+            parser.error("CHUNK_SIZE_UNIT=tokens sizes structure chunks by CHUNK_TOKEN_SIZE / CHUNK_TOKEN_OVERLAP, "
+                         "so --chunk-sizes and --chunk-overlaps would be ignored. Sweep with CHUNK_SIZE_UNIT=chars "
+                         "or vary the token settings between runs.")
+        print(f"⚠️ CHUNK_SIZE_UNIT=tokens: structure chunks have {Config.CHUNK_TOKEN_SIZE} tokens with "
+              f"{Config.CHUNK_TOKEN_OVERLAP} overlap, the size and overlap columns do not apply to them.")
+    chunk_sizes = args.chunk_sizes or [Config.CHUNK_SIZE]
+    chunk_overlaps = args.chunk_overlaps if args.chunk_overlaps is not None else [Config.CHUNK_OVERLAP]
+
+    if args.bootstrap_from or not os.path.exists(args.eval_set):
+        eval_items = bootstrap_eval_set(_str_list(args.bootstrap_from or args.extra_files), args.eval_set)
+    else:
+        eval_items = load_eval_set(args.eval_set)
+    if not eval_items:
+        raise SystemExit("❌ The evaluation set is empty.")
+
+    harness = EvaluationHarness(args.data_folder, eval_items, args.cache_dir, extra_files=_str_list(args.extra_files))
+    rows = harness.sweep(args.models, args.chunkers, chunk_sizes, chunk_overlaps, args.k)
+    best = select_configuration(rows, args.min_recall, args.min_mrr)
+    print_report(rows, best)
+    if best is None:
+        print(f"⚠️ No configuration reaches recall@k >= {args.min_recall} and MRR >= {args.min_mrr}.")
+    else:
+        print(f"🏆 Fastest configuration meeting the bar: {best['model']}, {best['chunker']} chunker, "
+              f"CHUNK_SIZE={best['chunk_size']}, CHUNK_OVERLAP={best['chunk_overlap']}, SEARCH_K={best['k']} "
+              f"(recall {best['recall']:.3f}, MRR {best['mrr']:.3f}, p95 {best['query_p95_ms']:.2f} ms)")
+
+    if args.output:
+        report = {"environment": environment_info(), "questions": len(eval_items), "results": rows, "best": best}
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
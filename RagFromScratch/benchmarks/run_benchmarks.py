@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from RagFromScratch.benchmarks.corpus import generate_chunks, generate_corpus, generate_queries
+from RagFromScratch.benchmarks.stubs import HashingEmbeddings, StubChatModel
+
+# Corpora larger than this are generated as in-memory chunks, files would only benchmark the disk
+MAX_FILE_CHUNKS = 50000
+CHUNKS_PER_FILE = 25
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean/max of a list of durations, in milliseconds."""
+    milliseconds = np.asarray(seconds, dtype=np.float64) * 1000
+    return {"count": int(len(milliseconds)),
+            "p50_ms": float(np.percentile(milliseconds, 50)),
+            "p95_ms": float(np.percentile(milliseconds, 95)),
+            "p99_ms": float(np.percentile(milliseconds, 99)),
+            "mean_ms": float(milliseconds.mean()),
+            "max_ms": float(milliseconds.max())}
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class BenchmarkSuite:
+    """
+    Runs the benchmark stages in order (load, chunk, embed, index build, single and batched
+    retrieval, end-to-end query), each stage feeding the next, and collects their results.
+    """
+
+    def __init__(self, chunks=1000, queries=200, batch_size=64, k=4, embedder="hash", llm_latency_ms=50.0,
+                 e2e_queries=50, seed=42, work_dir=None):
+        self.num_chunks = chunks
+        self.num_queries = queries
+        self.batch_size = batch_size
+        self.k = k
+        self.embedder = embedder
+        self.llm_latency_ms = llm_latency_ms
+        self.e2e_queries = e2e_queries
+        self.seed = seed
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="rag_bench_")
+        self.results = {}
+
+        self.chunks = None
+        self.vectors = None
+        self.store = None
+        self.queries = None
+        self.embeddings = self._create_embeddings()
+
+    def _create_embeddings(self):
+        if self.embedder == "hash":
+            return HashingEmbeddings()
+
+        from RagFromScratch.src.vector_store_local import VectorStoreManager
+
+        # The configured backend (HuggingFace / ONNX) without the embedding cache, so every run embeds
+        return VectorStoreManager._create_embedding_model()
+
+    def parameters(self):
+        return {"chunks": self.num_chunks, "queries": self.num_queries, "batch_size": self.batch_size,
+                "k": self.k, "embedder": self.embedder, "llm_latency_ms": self.llm_latency_ms,
+                "e2e_queries": self.e2e_queries, "seed": self.seed}
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def bench_load_and_chunk(self):
+        """Load and chunk a generated file corpus, or generate chunks directly for very large runs."""
+        if self.num_chunks > MAX_FILE_CHUNKS:
+            self.chunks, seconds = timed(generate_chunks, self.num_chunks, seed=self.seed)
+            self.results["generate_chunks"] = {"chunks": len(self.chunks), "seconds": seconds}
+            return
+
+        from RagFromScratch.src.document_processor import DocumentProcessor
+
+        corpus_dir = os.path.join(self.work_dir, "corpus")
+        num_files = max(1, self.num_chunks // CHUNKS_PER_FILE)
+        characters = generate_corpus(corpus_dir, num_files, seed=self.seed)
+
+        processor = DocumentProcessor(use_parsed_cache=False)
+        documents, load_seconds = timed(processor.load_documents, corpus_dir)
+        self.results["load"] = {"files": num_files, "megabytes": characters / 2 ** 20, "seconds": load_seconds,
+                                "files_per_sec": num_files / load_seconds}
+
+        self.chunks, chunk_seconds = timed(processor.chunk_documents, documents)
+        self.results["chunk"] = {"chunks": len(self.chunks), "seconds": chunk_seconds,
+                                 "chunks_per_sec": len(self.chunks) / chunk_seconds}
+
+        # Throughput of the structure-aware chunker against LangChain's recursive splitter
+        from RagFromScratch.src.chunker import chunking_report
+
+        chunkers = {name: DocumentProcessor(chunker=name, use_parsed_cache=False).text_splitter
+                    for name in ("structure", "recursive")}
+        for row in chunking_report(documents, chunkers, repeats=1):
+            self.results[f"chunk_{row.pop('chunker')}"] = row
+
+    def bench_embed(self):
+        texts = [chunk.page_content for chunk in self.chunks]
+        self.embeddings.embed_documents(texts[:8])  # Warm-up: model load and first-call allocations
+        vectors, seconds = timed(self.embeddings.embed_documents, texts)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.results["embed"] = {"embedder": self.embedder, "chunks": len(texts), "seconds": seconds,
+                                 "chunks_per_sec": len(texts) / seconds}
+
+    def bench_index_build(self):
+        from RagFromScratch.src.config import Config
+        from RagFromScratch.src.numpy_vector_store import NumpyVectorStore
+
+        store_dir = os.path.join(self.work_dir, "store")
+        self.store = NumpyVectorStore(self.embeddings, persist_directory=store_dir, dtype=Config.VECTOR_DTYPE,
+                                      ann_index_type=Config.ANN_INDEX_TYPE or None,
+                                      quantization=Config.VECTOR_QUANTIZATION or None)
+
+        def build():
+            self.store.add_embeddings([chunk.page_content for chunk in self.chunks], self.vectors,
+                                      metadatas=[chunk.metadata for chunk in self.chunks],
+                                      ids=[chunk.metadata["chunk_id"] for chunk in self.chunks])
+            self.store.persist()
+
+        _, seconds = timed(build)
+        self.results["index_build"] = {"chunks": self.store.count(), "seconds": seconds,
+                                       "chunks_per_sec": self.store.count() / seconds,
+                                       "index_megabytes": directory_size(store_dir) / 2 ** 20,
+                                       "ann_index": Config.ANN_INDEX_TYPE or None,
+                                       "quantization": Config.VECTOR_QUANTIZATION or None}
+
+    def bench_retrieval(self):
+        self.queries = generate_queries(self.chunks, self.num_queries, seed=self.seed + 1)
+        query_vectors = np.asarray(self.embeddings.embed_documents([query for query, _ in self.queries]),
+                                   dtype=np.float32)
+
+        embed_latencies = []
+        search_latencies = []
+        hits = 0
+        for (query, expected_id), query_vector in zip(self.queries, query_vectors):
+            _, embed_seconds = timed(self.embeddings.embed_query, query)
+            results, search_seconds = timed(self.store.similarity_search_with_score_by_vector, query_vector, k=self.k)
+            embed_latencies.append(embed_seconds)
+            search_latencies.append(search_seconds)
+            hits += any(doc.id == expected_id for doc, _ in results)
+        self.results["query_embed"] = latency_summary(embed_latencies)
+        self.results["retrieval_single"] = {**latency_summary(search_latencies),
+                                            f"hit_rate@{self.k}": hits / len(self.queries)}
+
+        batch_latencies = []
+        for start in range(0, len(query_vectors), self.batch_size):
+            _, seconds = timed(self.store.batch_similarity_search_with_score_by_vector,
+                               query_vectors[start:start + self.batch_size], k=self.k)
+            batch_latencies.append(seconds)
+        total = sum(batch_latencies)
+        self.results["retrieval_batched"] = {**latency_summary(batch_latencies),
+                                             "batch_size": self.batch_size,
+                                             "per_query_ms": total * 1000 / len(query_vectors),
+                                             "queries_per_sec": len(query_vectors) / total}
+
+    def bench_end_to_end(self):
+        from RagFromScratch.src.rag_chain import RAGSystemChain
+
+        rag_system = RAGSystemChain(llm=StubChatModel(latency_ms=self.llm_latency_ms))
+        chain = rag_system.create_rag_chain(self.store.as_retriever(search_kwargs={"k": self.k}))
+
+        latencies = []
+        for query, _ in self.queries[:self.e2e_queries]:
+            _, seconds = timed(chain.invoke, query)
+            latencies.append(seconds)
+        summary = latency_summary(latencies)
+        self.results["end_to_end"] = {**summary, "llm_latency_ms": self.llm_latency_ms,
+                                      "overhead_p50_ms": summary["p50_ms"] - self.llm_latency_ms}
+
+    def run(self):
+        stages = [self.bench_load_and_chunk, self.bench_embed, self.bench_index_build, self.bench_retrieval]
+        if self.e2e_queries:
+            stages.append(self.bench_end_to_end)
+        try:
+            for stage in stages:
+                print(f"⏱️ {stage.__name__.replace('bench_', '')}...")
+                stage()
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        return self.results
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": commit,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+
+# Compared metrics: throughputs and hit rates should not drop, durations should not grow
+HIGHER_IS_BETTER = ("_per_sec", "hit_rate")
+DURATION_SUFFIXES = ("_ms", "seconds")
+
+
+def compare(current, previous, threshold=0.10):
+    """
+    Print the relative change of every metric against a previous run.
+    :param current: Results dictionary of this run.
+    :param previous: Results dictionary of the previous run.
+    :param threshold: Relative change counted as a regression.
+    :return: List of (stage, metric, previous, current, change) regressions.
+    """
+    regressions = []
+    print(f"📈 Comparison with previous run (regression threshold {threshold:.0%}):")
+    for stage, metrics in current.items():
+        for metric, value in metrics.items():
+            old = previous.get(stage, {}).get(metric)
+            higher_is_better = any(marker in metric for marker in HIGHER_IS_BETTER)
+            if not (higher_is_better or metric.endswith(DURATION_SUFFIXES)):
+                continue
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+
+            change = (value - old) / abs(old)
+            regressed = -change > threshold if higher_is_better else change > threshold
+            if regressed:
+                regressions.append((stage, metric, old, value, change))
+            print(f"   {'❌' if regressed else '  '} {stage}.{metric}: {old:.3f} -> {value:.3f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reproducible RAG performance benchmarks (load, chunk, embed, index build, single and batched "
+                    "retrieval, end-to-end query with a stub LLM) on a synthetic corpus generated from a fixed seed.",
+        epilog="Example: python -m RagFromScratch.benchmarks.run_benchmarks --chunks 10000 --output bench.json "
+               "--compare previous.json")
+    parser.add_argument("--chunks", type=int, default=1000, help="Corpus size in chunks (10^3 - 10^6).")
+    parser.add_argument("--queries", type=int, default=200, help="Retrieval queries.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Queries per batched retrieval call.")
+    parser.add_argument("--k", type=int, default=4, help="Documents retrieved per query.")
+    parser.add_argument("--embedder", choices=("hash", "model"), default="hash",
+                        help="'hash' for deterministic feature hashing, 'model' for the configured embedding model.")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="Latency of the stub LLM.")
+    parser.add_argument("--e2e-queries", type=int, default=50, help="End-to-end queries, 0 to skip.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Previous JSON results to compare against.")
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(chunks=args.chunks, queries=args.queries, batch_size=args.batch_size, k=args.k,
+                           embedder=args.embedder, llm_latency_ms=args.llm_latency_ms,
+                           e2e_queries=args.e2e_queries, seed=args.seed)
+    report = {"environment": environment_info(), "parameters": suite.parameters(), "results": suite.run()}
+    print(json.dumps(report["results"], indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as previous_file:
+            previous = json.load(previous_file)
+        if previous.get("parameters") != report["parameters"]:
+            print("⚠️ The previous run used different parameters, the comparison is only indicative.")
+        regressions = compare(report["results"], previous["results"])
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# The stub chat model is an LLM backend of the application (LLM_BACKEND=stub), re-exported for the benchmarks
+from RagFromScratch.src.llm_backends import StubChatModel  # noqa: F401
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, model-free embeddings for benchmarking the index at sizes where running the real
+    model would take hours. Every token is hashed to a dimension and a sign (feature hashing), so
+    texts sharing words get similar vectors and retrieval still has meaningful neighbours.
+    """
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+        self.model_name = f"hashing-{dimension}"
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if (digest >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class FakeOllamaServer:
+    """
+    Local HTTP server speaking the Ollama /api/chat protocol, answering with a StubChatModel's
+    deterministic replies and timing. Lets the ollama backend and the HTTP path be load-tested offline:
+    LLM_BACKEND=ollama OLLAMA_BASE_URL=http://127.0.0.1:<port>.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, stub=None):
+        self.stub = stub or StubChatModel()
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                prompt = "".join(message.get("content", "") for message in body.get("messages", []))
+                tokens = server.stub.reply_tokens(prompt)
+                final = {"model": body.get("model"), "done": True, "prompt_eval_count": max(1, len(prompt) // 4),
+                         "eval_count": len(tokens)}
+                delay = 1 / server.stub.tokens_per_second if server.stub.tokens_per_second else 0.0
+                time.sleep(server.stub.latency_ms / 1000)
+
+                if not body.get("stream", True):
+                    time.sleep(delay * len(tokens))
+                    self._send_json({**final, "message": {"role": "assistant", "content": "".join(tokens)}})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for index, token in enumerate(tokens):
+                    if index:
+                        time.sleep(delay)
+                    self._send_chunk({"model": body.get("model"), "done": False,
+                                      "message": {"role": "assistant", "content": token}})
+                self._send_chunk({**final, "message": {"role": "assistant", "content": ""}})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send_json(self, data):
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_chunk(self, data):
+                line = json.dumps(data).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.llm_backends import STUB_PROFILES
+
+    parser = argparse.ArgumentParser(description="Fake Ollama-compatible chat server with deterministic answers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--profile", choices=list(STUB_PROFILES), default="fast", help="Latency profile.")
+    args = parser.parse_args()
+
+    fake_server = FakeOllamaServer(args.host, args.port, stub=StubChatModel.from_profile(args.profile))
+    print(f"🦙 Fake Ollama server on {fake_server.base_url} ({args.profile} profile)")
+    try:
+        fake_server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake_server.httpd.server_close()
@@ -1,13 +1,14 @@
+import asyncio
+import json
 import os
 import sys
 
-from RagFromScratch.src.rag_chain import RAGSystemChain
+from RagFromScratch.src.startup import startup_timer
 
 # Add src to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.document_processor import DocumentProcessor
-from src.vector_store_local import VectorStoreManager
+# Heavy modules (LangChain loaders, Chroma, Gemini, embedding models) are imported on first use
 from src.config import Config
 
 
@@ -18,48 +19,101 @@ class RAGFromScratchApp:
     and creates the RAG chain for answering user queries.
     """
 
-    def __init__(self, data_folder=None):
+    def __init__(self, data_folder=None, llm=None, micro_batch_queries=False):
+        """
+        :param data_folder: Folder with the documents to index, defaults to Config.DATA_FOLDER.
+        :param llm: Optional chat model replacing the configured one, e.g. a stub for tests.
+        :param micro_batch_queries: Merge concurrent query embeddings into single model calls (servers).
+        """
         self.data_folder = data_folder or Config.DATA_FOLDER
-        self.processor = DocumentProcessor()
+        self.llm = llm
+        self.micro_batch_queries = micro_batch_queries
+        self._processor = None
         self.vs_manager = None
         self.rag_system = None
         self.chain = None
+        self.answer_cache = None
+        self.faq_index = None
+
+    @property
+    def processor(self):
+        """Document processor, only created when documents are (re)indexed."""
+        if self._processor is None:
+            from src.document_processor import DocumentProcessor
 
-    def initialize_environment(self, rebuild_vector_store=False):
+            self._processor = DocumentProcessor()
+        return self._processor
+
+    def initialize_environment(self, rebuild_vector_store=False, sync_vector_store=False):
         """
         Initialize the environment by loading configurations and validating them.
+        :param rebuild_vector_store: Re-embed every document from scratch.
+        :param sync_vector_store: Only embed new or changed files and drop removed ones.
         """
         try:
-            Config.validate_config(Config)
-            print("✅ Environment initialized and configuration validated.")
-            Config.print_config()
-            self.vs_manager = VectorStoreManager()
-
-            vector_store_exists = os.path.exists(Config.PERSIST_DIRECTORY)
-            if rebuild_vector_store or not vector_store_exists:
-                print("🔄 Building or rebuilding the vector store...")
-                documents = self.processor.load_documents(folder_path=self.data_folder)
-
-                if not documents:
-                    print("❌ No documents found to process. Please add documents to the data folder.")
-                    print("Supported file formats are: .txt, .pdf, .docx")
-                    return False
-
-                chunks = self.processor.chunk_documents(documents)
-                self.vs_manager.create_vector_store(chunks)
-            else:
-                print("🔍 Loading existing vector store...")
-                doc_count = self.vs_manager.get_doc_count()
-                print(f"✅ Loaded vector store with {doc_count} documents.")
-
-            retriever = self.vs_manager.get_retriever()
-            self.rag_system = RAGSystemChain()
-            self.chain = self.rag_system.create_rag_chain(retriever)
-
+            with startup_timer.phase("config"):
+                Config.validate_config(Config)
+                print("✅ Environment initialized and configuration validated.")
+                Config.print_config()
+
+            with startup_timer.phase("vector store"):
+                if Config.COLLECTIONS:
+                    # Named collections split into independently built shards, searched in parallel
+                    from src.sharded_store import ShardedIndexManager
+
+                    self.vs_manager = ShardedIndexManager(micro_batch_queries=self.micro_batch_queries)
+                else:
+                    from src.vector_store_local import VectorStoreManager
+
+                    self.vs_manager = VectorStoreManager(micro_batch_queries=self.micro_batch_queries)
+
+                vector_store_exists = self.vs_manager.exists()
+                if rebuild_vector_store or not vector_store_exists:
+                    print("🔄 Building or rebuilding the vector store...")
+                    chunk_count = self.vs_manager.build_vector_store_streaming(self.processor, self.data_folder)
+
+                    if not chunk_count:
+                        print("❌ No documents found to process. Please add documents to the data folder.")
+                        print("Supported file formats are: .txt, .pdf, .docx, .csv")
+                        return False
+                elif sync_vector_store:
+                    self.vs_manager.sync_vector_store(self.processor, self.data_folder)
+                else:
+                    print("🔍 Loading existing vector store...")
+                    doc_count = self.vs_manager.get_doc_count()
+                    print(f"✅ Loaded vector store with {doc_count} documents.")
+
+            with startup_timer.phase("retriever"):
+                retriever = self.vs_manager.get_retriever(search_type=Config.SEARCH_TYPE)
+
+            with startup_timer.phase("chain"):
+                from RagFromScratch.src.rag_chain import RAGSystemChain
+
+                self.rag_system = RAGSystemChain(llm=self.llm)
+                if Config.USE_ANSWER_CACHE:
+                    from src.answer_cache import AnswerCache
+
+                    vs_manager = self.vs_manager
+                    self.answer_cache = AnswerCache(embeddings=vs_manager.embeddings,
+                                                    index_version=lambda: vs_manager.index_version)
+                if Config.USE_FAQ_SHORTCUT:
+                    from src.faq_index import FaqIndex
+
+                    self.faq_index = FaqIndex.from_sources(self.processor, self.data_folder, Config.FAQ_FILES,
+                                                           embeddings=self.vs_manager.embeddings)
+                self.chain = self.rag_system.create_rag_chain(retriever, answer_cache=self.answer_cache,
+                                                              faq_index=self.faq_index)
+
+            from RagFromScratch.src.llm_backends import describe_llm
+
+            chat_model = describe_llm() if self.llm is None else type(self.llm).__name__
             print("\n✅ RAG System Ready!")
             print("   - Local embeddings: ✅ (no API limits)")
-            print("   - Gemini chat: ✅")
+            print(f"   - Chat model: ✅ ({chat_model})")
             print("   - Document retrieval: ✅")
+            print(f"   - Answer cache: {'✅' if self.answer_cache else 'disabled'}")
+            print(f"   - FAQ shortcut: {f'✅ ({len(self.faq_index)} questions)' if self.faq_index else 'disabled'}")
+            startup_timer.report()
 
             return True
 
@@ -73,18 +127,98 @@ class RAGFromScratchApp:
         :param question: The question to ask.
         :return: The generated answer.
         """
+        result = self.query_with_sources(question)
+        return result["answer"] if result else None
+
+    def query_with_sources(self, question):
+        """
+        Query the RAG chain and return the answer together with the documents it used.
+        :param question: The question to ask.
+        :return: Dictionary with the question, the retrieved documents and the answer.
+        """
         if not self.chain:
             print("❌ RAG chain is not initialized. Please initialize the environment first.")
             return None
 
         try:
             print(f"❓ Querying RAG Chain with question: {question}")
-            return self.rag_system.query(self.chain, question)
+            return self.rag_system.query_with_sources(self.chain, question)
 
         except Exception as e:
             print(f"❌ Error during query: {e}")
             return None
 
+    def stream_query(self, question):
+        """
+        Stream the answer to a question, see RAGSystemChain.stream_query for the event format.
+        :param question: The question to ask.
+        :return: Generator of stream events, or None if the chain is not initialized.
+        """
+        if not self.chain:
+            print("❌ RAG chain is not initialized. Please initialize the environment first.")
+            return None
+
+        return self.rag_system.stream_query(self.chain, question)
+
+    async def abatch_query(self, questions, concurrency=None, requests_per_second=None):
+        """
+        Answer many questions concurrently, see RAGSystemChain.abatch_query.
+        :param questions: List of questions.
+        :param concurrency: Maximum number of LLM calls in flight.
+        :param requests_per_second: LLM call rate limit.
+        :return: One result dictionary per question, in order.
+        """
+        if not self.chain:
+            print("❌ RAG chain is not initialized. Please initialize the environment first.")
+            return None
+
+        return await self.rag_system.abatch_query(questions, self.vs_manager,
+                                                  answer_cache=self.answer_cache,
+                                                  concurrency=concurrency,
+                                                  requests_per_second=requests_per_second,
+                                                  faq_index=self.faq_index)
+
+    def batch_query(self, questions, concurrency=None, requests_per_second=None):
+        """Synchronous wrapper around abatch_query for scripts and nightly jobs."""
+        return asyncio.run(self.abatch_query(questions, concurrency=concurrency,
+                                             requests_per_second=requests_per_second))
+
+    def batch_rows(self, questions):
+        """
+        Answer questions concurrently and return JSON-serializable rows.
+        :param questions: List of questions.
+        :return: One {"question", "answer", "error", "sources", "faq"} dictionary per question, in order.
+        """
+        return [self.result_row(result) for result in self.batch_query(questions) or []]
+
+    @staticmethod
+    def result_row(result):
+        """JSON-serializable form of a query result: the sources replace the retrieved documents."""
+        return {"question": result["question"],
+                "answer": result["answer"],
+                "error": result.get("error"),
+                "sources": [doc.metadata.get("source") for doc in result.get("documents") or []],
+                "faq": result["faq"]["method"] if result.get("faq") else None}
+
+    def batch_mode(self, questions_path, output_path=None, warm_worker=None):
+        """
+        Answer every line of a text file and write one JSON object per answer.
+        :param questions_path: File with one question per line.
+        :param output_path: JSON-lines output file, defaults to stdout.
+        :param warm_worker: Optional WarmWorkerClient that answers instead of this process.
+        """
+        with open(questions_path, "r", encoding="utf-8") as questions_file:
+            questions = [line.strip() for line in questions_file if line.strip()]
+
+        rows = warm_worker.batch(questions) if warm_worker else self.batch_rows(questions)
+        output = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+        try:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        finally:
+            if output_path:
+                output.close()
+
     def interactive_mode(self):
         """
         Start an interactive mode for user queries.
@@ -113,19 +247,61 @@ class RAGFromScratchApp:
                 elif question.lower() == '':
                     continue
 
-                if debug_mode:
-                    print("🔍 Retrieving documents...")
-                    retriever = self.vs_manager.get_retriever()
-                    docs = retriever.get_relevant_documents(question)
-                    print(f"📄 Retrieved {len(docs)} documents:")
-                    for i, doc in enumerate(docs, 1):
-                        source = doc.metadata.get('source', 'Unknown')
-                        print(f"   {i}. {source} ({len(doc.page_content)} chars)")
-                    print("-" * 30)
+                answer_started = False
+
+                # Stream the answer, the documents event tells which sources the chain used
+                events = self.stream_query(question)
+                if events is None:
+                    continue
 
-                # Get answer
-                answer = self.query(question)
-                print(f"\n🤖 Answer: {answer}")
+                for event in events:
+                    if event["type"] == "documents" and debug_mode:
+                        docs = event["documents"]
+                        print(f"📄 Retrieved {len(docs)} documents:")
+                        for i, doc in enumerate(docs, 1):
+                            source = doc.metadata.get('source', 'Unknown')
+                            print(f"   {i}. {source} ({len(doc.page_content)} chars)")
+                        print("-" * 30)
+                    elif event["type"] == "context" and debug_mode:
+                        stats = event["stats"]
+                        print(f"✂️ Context packed into {stats['passages']} passages: {stats['packed_tokens']} tokens "
+                              f"instead of {stats['original_tokens']} ({stats['saved_ratio']:.0%} saved)")
+                    elif event["type"] == "faq" and debug_mode:
+                        match = event["match"]
+                        print(f"💡 Answered from the FAQ ({match['method']} match, score {match['score']:.2f}): "
+                              f"{match['prompt']}")
+                    elif event["type"] == "token":
+                        if not answer_started:
+                            print("\n🤖 Answer: ", end="", flush=True)
+                            answer_started = True
+                        print(event["text"], end="", flush=True)
+                    elif event["type"] == "done":
+                        print()
+                        if debug_mode:
+                            print(f"⏱️ First token after {event['ttft_ms']:.0f} ms, "
+                                  f"full answer after {event['total_ms']:.0f} ms")
+                            for stage in event.get("stages", []):
+                                details = ", ".join(f"{key}={value:.0f}" if isinstance(value, float)
+                                                    else f"{key}={value}"
+                                                    for key, value in stage.items() if key not in ("stage", "ms"))
+                                print(f"   {stage['stage']:<14} {stage['ms']:8.1f} ms"
+                                      + (f"  ({details})" if details else ""))
+                            for cache, counts in event.get("caches", {}).items():
+                                print(f"   {cache} cache: {counts['hits']} hits, {counts['misses']} misses")
+                            if self.answer_cache:
+                                cache_stats = self.answer_cache.stats()
+                                print(f"⚡ Answer cache: {cache_stats['exact_hits']} exact hits, "
+                                      f"{cache_stats['semantic_hits']} similar-question hits, "
+                                      f"{cache_stats['misses']} misses")
+                            if self.faq_index:
+                                faq_stats = self.faq_index.stats()
+                                print(f"💡 FAQ shortcut: {faq_stats['hit_rate']:.0%} of questions, "
+                                      f"{faq_stats['average_shortcut_ms']:.1f} ms instead of "
+                                      f"{faq_stats['average_full_ms']:.0f} ms, {faq_stats['saved_seconds']:.1f}s saved")
+                            if Config.USE_RERANKER:
+                                rerank_stats = self.vs_manager.get_reranker().stats()
+                                print(f"🔀 Reranker: {rerank_stats['forward_passes']} forward passes, "
+                                      f"{rerank_stats['hit_rate']:.0%} score cache hit rate")
 
             except KeyboardInterrupt:
                 print("\n👋 Goodbye!")
@@ -136,29 +312,76 @@ class RAGFromScratchApp:
 
 def main():
     """Main function"""
-    print("🎯 RAG System with Google Gemini")
+    print(f"🎯 RAG System with the {Config.LLM_BACKEND} chat backend")
     print("   Built with LangChain + Local Embeddings")
 
+    startup_timer.record("imports", startup_timer.since_process_start())
+
     # Initialize application
     app = RAGFromScratchApp()
 
-    # Check if this is first run or rebuild requested
-    first_run = not os.path.exists(Config.PERSIST_DIRECTORY)
-    rebuild = first_run or (len(sys.argv) > 1 and sys.argv[1] == "--rebuild")
+    # A missing store is built by initialize_environment, checked by the single or sharded manager itself
+    rebuild = len(sys.argv) > 1 and sys.argv[1] == "--rebuild"
+    sync = len(sys.argv) > 1 and sys.argv[1] == "--sync"
 
-    if rebuild and not first_run:
+    if rebuild:
         print("♻️ Rebuilding vector store...")
+    elif sync:
+        print("🔄 Syncing vector store with changed documents...")
 
     # Initialize system
-    if app.initialize_environment(rebuild_vector_store=rebuild):
-        # Start interactive mode
-        app.interactive_mode()
+    batch = len(sys.argv) > 2 and sys.argv[1] == "--batch"
+    serve_warm = len(sys.argv) > 1 and sys.argv[1] == "--serve-warm"
+    serve_http = len(sys.argv) > 1 and sys.argv[1] == "--serve"
+    if serve_http:
+        # One process, one model: concurrent requests share it and their query embeddings are micro-batched
+        app.micro_batch_queries = True
+
+    if batch and Config.WARM_WORKER_ADDRESS:
+        # A running warm worker already holds the store, models and chain: skip initialization entirely
+        from RagFromScratch.src.warm_worker import WarmWorkerClient
+
+        with startup_timer.phase("connect warm worker"):
+            warm_worker = WarmWorkerClient.connect()
+        if warm_worker is not None:
+            print(f"🔥 Using warm worker at {Config.WARM_WORKER_ADDRESS}")
+            startup_timer.report()
+            with warm_worker:
+                app.batch_mode(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None, warm_worker=warm_worker)
+            return
+        print("⚠️ No warm worker running, starting up locally...")
+
+    if serve_warm and not Config.WARM_WORKER_ADDRESS:
+        print("❌ Set WARM_WORKER_ADDRESS (host:port or socket path) to serve a warm worker.")
+        return
+
+    if app.initialize_environment(rebuild_vector_store=rebuild, sync_vector_store=sync):
+        if serve_http:
+            # HTTP server: python main.py --serve (SERVER_HOST / SERVER_PORT)
+            from RagFromScratch.src.server import run_server
+
+            run_server(app)
+        elif serve_warm:
+            # Keep this initialized process around for later invocations: --serve-warm
+            from RagFromScratch.src.warm_worker import WarmWorker
+
+            WarmWorker(app).serve_forever()
+        elif batch:
+            # Answer a file of questions: --batch questions.txt [answers.jsonl]
+            app.batch_mode(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        else:
+            # Start interactive mode
+            app.interactive_mode()
     else:
         print("❌ Failed to initialize RAG system")
         print("\n💡 Troubleshooting tips:")
         print("   1. Check your Google AI API key in Secrets/gcp_keys.py")
+        print("      (or run offline with LLM_BACKEND=stub, or LLM_BACKEND=ollama for a local model)")
         print("   2. Add documents to data/documents/ folder")
         print("   3. Run: python setup.py to verify setup")
+        print("   4. Use --sync to re-embed only changed documents, --rebuild to start over")
+        print("   5. Use --serve to run the HTTP server (/query, /batch, /stream)")
+        print("   6. Use --serve-warm with WARM_WORKER_ADDRESS set to keep a pre-loaded worker for --batch runs")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+import os
+import time
+
+import numpy as np
+
+
+class FaissANNIndex:
+    """
+    Approximate nearest-neighbour index over the normalized embedding matrix, built with FAISS.
+    Supports HNSW (graph search, tuned with ef_search) and IVF-PQ (inverted lists with product
+    quantization, tuned with nprobe). Scores are inner products, i.e. cosine similarities.
+    After a sync the index is updated in place instead of retrained: FAISS ids then no longer equal
+    matrix rows, and `rows` maps every id to its current row (-1 for deleted chunks).
+    """
+
+    INDEX_FILE = "ann.faiss"
+    ROWS_FILE = "ann_rows.npy"
+    # PQ codebooks have 256 centroids and FAISS wants ~39 training points per centroid
+    MIN_IVFPQ_VECTORS = 256 * 39
+
+    def __init__(self, index_type=None, nlist=None, pq_m=None, hnsw_m=None, ef_construction=None,
+                 nprobe=None, ef_search=None, rescore_factor=None):
+        from RagFromScratch.src.config import Config
+
+        self.index_type = (index_type or Config.ANN_INDEX_TYPE).lower()
+        self.nlist = nlist or Config.ANN_NLIST
+        self.pq_m = pq_m or Config.ANN_PQ_M
+        self.hnsw_m = hnsw_m or Config.ANN_HNSW_M
+        self.ef_construction = ef_construction or Config.ANN_EF_CONSTRUCTION
+        self.nprobe = nprobe or Config.ANN_NPROBE
+        self.ef_search = ef_search or Config.ANN_EF_SEARCH
+        self.rescore_factor = rescore_factor or Config.ANN_RESCORE_FACTOR
+        self.index = None
+        self.rows = None  # FAISS id -> matrix row, None while they are equal
+        self.source_path = None  # File a memory-mapped index was read from
+
+        if self.index_type not in ("hnsw", "ivfpq"):
+            raise ValueError(f"Unknown ANN index type '{self.index_type}'. Use 'hnsw' or 'ivfpq'.")
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal if self.index is not None else 0
+
+    @property
+    def nrows(self):
+        """Number of matrix rows the index covers, i.e. ntotal without deleted entries."""
+        return self.ntotal if self.rows is None else int(np.count_nonzero(self.rows >= 0))
+
+    def _pq_subquantizers(self, dimension):
+        """Largest number of PQ sub-quantizers <= pq_m that divides the dimension."""
+        for m in range(min(self.pq_m, dimension), 0, -1):
+            if dimension % m == 0:
+                return m
+        return 1
+
+    def build(self, matrix):
+        """
+        Build the index from a matrix of normalized embeddings (one row per chunk).
+        :param matrix: Array of shape (n, d).
+        :return: self
+        """
+        import faiss
+
+        vectors = np.ascontiguousarray(matrix, dtype=np.float32)
+        count, dimension = vectors.shape
+        started = time.perf_counter()
+
+        if self.index_type == "ivfpq" and count < self.MIN_IVFPQ_VECTORS:
+            print(f"⚠️ {count} vectors are too few to train IVF-PQ (needs {self.MIN_IVFPQ_VECTORS}), "
+                  f"building HNSW instead.")
+            self.index_type = "hnsw"
+
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+            index.add(vectors)
+        else:
+            nlist = self.nlist or max(1, min(int(4 * np.sqrt(count)), count // 39))
+            index = faiss.index_factory(dimension, f"IVF{nlist},PQ{self._pq_subquantizers(dimension)}",
+                                        faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.add(vectors)
+
+        self.index = index
+        self.rows = None
+        self.source_path = None
+        self.set_search_params()
+        print(f"✅ Built {self.index_type.upper()} index over {count} vectors "
+              f"in {time.perf_counter() - started:.2f}s")
+        return self
+
+    def update(self, kept_rows, new_vectors):
+        """
+        Apply a sync without retraining: drop the ids of deleted rows and add the new vectors.
+        IVF-PQ removes them with remove_ids and adds the new codes under fresh ids with
+        add_with_ids, reusing the trained quantizers. HNSW cannot remove graph nodes, so deleted ids
+        stay in the graph and are only dropped from the results until the next --rebuild.
+        :param kept_rows: Old row of each kept row of the new matrix, in order; new rows follow them.
+        :param new_vectors: Normalized embeddings of the added rows, shape (m, d).
+        :return: self
+        """
+        import faiss
+
+        started = time.perf_counter()
+        old_count = self.nrows
+        # Memory-mapped inverted lists are read-only and cannot be cloned, so modify a fresh copy
+        if self.source_path is not None:
+            index = faiss.read_index(self.source_path)
+        else:
+            index = faiss.clone_index(self.index)
+
+        new_row_of_old = np.full(old_count, -1, dtype=np.int64)
+        new_row_of_old[kept_rows] = np.arange(len(kept_rows))
+        rows = np.arange(index.ntotal, dtype=np.int64) if self.rows is None else self.rows
+        mapped = np.full(len(rows), -1, dtype=np.int64)
+        mapped[rows >= 0] = new_row_of_old[rows[rows >= 0]]
+
+        removed = np.flatnonzero((rows >= 0) & (mapped < 0))
+        if len(removed) and self.index_type == "ivfpq":
+            index.remove_ids(removed.astype(np.int64))
+
+        vectors = np.ascontiguousarray(new_vectors, dtype=np.float32)
+        new_ids = np.arange(len(rows), len(rows) + len(vectors), dtype=np.int64)
+        if len(vectors):
+            if self.index_type == "ivfpq":
+                index.add_with_ids(vectors, new_ids)
+            else:
+                index.add(vectors)
+
+        self.index = index
+        self.rows = np.concatenate([mapped, np.arange(len(kept_rows), len(kept_rows) + len(vectors))])
+        self.source_path = None
+        self.set_search_params()
+        print(f"✅ Updated {self.index_type.upper()} index: +{len(vectors)} / -{len(removed)} vectors "
+              f"in {time.perf_counter() - started:.2f}s")
+        return self
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """
+        Adjust the recall/latency trade-off without rebuilding.
+        :param nprobe: Number of inverted lists visited per query (IVF-PQ).
+        :param ef_search: Size of the dynamic candidate list (HNSW).
+        :return:
+        """
+        import faiss
+
+        self.nprobe = nprobe or self.nprobe
+        self.ef_search = ef_search or self.ef_search
+        if self.index is None:
+            return
+        if self.index_type == "hnsw":
+            self.index.hnsw.efSearch = self.ef_search
+        else:
+            faiss.extract_index_ivf(self.index).nprobe = self.nprobe
+
+    def search(self, queries, k):
+        """
+        Search a batch of normalized query vectors.
+        :param queries: Array of shape (q, d).
+        :param k: Number of neighbours per query.
+        :return: Tuple of (scores, ids) arrays of shape (q, k); missing results have id -1.
+            Ids are matrix rows unless the index was updated, see `rows`.
+        """
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        return self.index.search(queries, k)
+
+    def search_rescored(self, matrix, query, k):
+        """
+        Fetch rescore_factor * k approximate candidates and re-rank them with exact inner products
+        against their rows of the full-precision matrix. This recovers most of the recall that the
+        compressed PQ codes lose, for the cost of a tiny gather + matmul.
+        :param matrix: The (possibly memory-mapped) embedding matrix the index was built from.
+        :param query: Normalized query vector.
+        :param k: Number of results.
+        :return: Tuple of (rows, scores) arrays, best first.
+        """
+        # Deleted entries of an updated HNSW graph can still be returned, fetch that many more
+        candidates = max(k, k * self.rescore_factor) * self.ntotal // max(self.nrows, 1)
+        _, ids = self.search(query, min(self.ntotal, candidates))
+        ids = ids[0][ids[0] >= 0]
+        rows = ids if self.rows is None else self.rows[ids]
+        # Sorted rows turn the gather into a forward scan of the memory-mapped matrix
+        rows = np.sort(rows[rows >= 0])
+        scores = (matrix[rows] @ query.astype(matrix.dtype, copy=False)).astype(np.float32, copy=False)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return rows[order], scores[order]
+
+    def save(self, persist_directory):
+        import faiss
+
+        rows_path = os.path.join(persist_directory, self.ROWS_FILE)
+        if self.rows is not None:
+            np.save(rows_path + ".tmp.npy", self.rows)
+            os.replace(rows_path + ".tmp.npy", rows_path)
+        elif os.path.exists(rows_path):
+            os.remove(rows_path)
+
+        tmp_path = os.path.join(persist_directory, "tmp_" + self.INDEX_FILE)
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, os.path.join(persist_directory, self.INDEX_FILE))
+
+    @classmethod
+    def load(cls, persist_directory, **params):
+        """
+        Load a persisted index, or return None when there is none.
+        :param persist_directory: Directory containing ann.faiss and, after updates, ann_rows.npy.
+        :param params: Search parameters overriding the Config defaults.
+        :return: FaissANNIndex or None.
+        """
+        import faiss
+
+        index_path = os.path.join(persist_directory, cls.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+        ann_index = cls(index_type="hnsw" if hasattr(index, "hnsw") else "ivfpq", **params)
+        ann_index.index = index
+        ann_index.source_path = index_path
+        rows_path = os.path.join(persist_directory, cls.ROWS_FILE)
+        if os.path.exists(rows_path):
+            ann_index.rows = np.load(rows_path)
+        ann_index.set_search_params()
+        return ann_index
+
+
+def recall_report(store, k=10, sample_size=200, nprobe_values=(1, 4, 16, 64), ef_search_values=(16, 64, 128, 256),
+                  seed=42):
+    """
+    Measure recall@k and per-query latency of the ANN index against the exact matmul search.
+    Queries are stored vectors with a little noise added, so they behave like unseen questions
+    that land close to indexed chunks. The ANN timings include the exact rescoring step.
+    :param store: NumpyVectorStore with an ANN index.
+    :param k: Number of neighbours compared.
+    :param sample_size: Number of queries sampled from the store.
+    :param nprobe_values: nprobe settings swept for IVF-PQ.
+    :param ef_search_values: efSearch settings swept for HNSW.
+    :param seed: Random seed for the query sample.
+    :return: List of dictionaries, one per search setting, including the exact baseline.
+    """
+    ann_index = store.ann_index
+    if ann_index is None:
+        raise ValueError("The vector store has no ANN index. Set ANN_INDEX_TYPE and rebuild the store.")
+
+    matrix = np.asarray(store._matrix, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(matrix), size=min(sample_size, len(matrix)), replace=False)
+    queries = matrix[rows] + rng.normal(scale=0.05, size=(len(rows), matrix.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        scores = matrix @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        latencies.append(time.perf_counter() - started)
+        exact.append(set(top.tolist()))
+
+    def summarize(setting, hits, timings):
+        timings_ms = np.asarray(timings) * 1000
+        return {"setting": setting,
+                f"recall@{k}": hits / (k * len(queries)),
+                "p50_ms": float(np.percentile(timings_ms, 50)),
+                "p95_ms": float(np.percentile(timings_ms, 95))}
+
+    report = [summarize("exact", k * len(queries), latencies)]
+    if ann_index.index_type == "hnsw":
+        settings = [("ef_search", value) for value in ef_search_values]
+    else:
+        settings = [("nprobe", value) for value in nprobe_values]
+
+    original = {"nprobe": ann_index.nprobe, "ef_search": ann_index.ef_search}
+    try:
+        for name, value in settings:
+            ann_index.set_search_params(**{name: value})
+            hits = 0
+            timings = []
+            for query, expected in zip(queries, exact):
+                started = time.perf_counter()
+                found, _ = ann_index.search_rescored(matrix, query, k)
+                timings.append(time.perf_counter() - started)
+                hits += len(expected.intersection(found.tolist()))
+            report.append(summarize(f"{name}={value}", hits, timings))
+    finally:
+        ann_index.set_search_params(**original)
+
+    print(f"📊 ANN recall@{k} vs latency ({ann_index.index_type.upper()}, {len(matrix)} vectors, "
+          f"{len(queries)} queries):")
+    for row in report:
+        print(f"   - {row['setting']:<14} recall@{k}={row[f'recall@{k}']:.3f}  "
+              f"p50={row['p50_ms']:.3f}ms  p95={row['p95_ms']:.3f}ms")
+    return report
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.vector_store_local import VectorStoreManager
+
+    vs_manager = VectorStoreManager()
+    recall_report(vs_manager.load_vector_store())
@@ -0,0 +1,154 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from RagFromScratch.src.instrumentation import get_instrumentation
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial variants share a key."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?!.")
+
+
+def document_ids(documents):
+    """Stable IDs of retrieved chunks, falling back to a content hash for chunks without one."""
+    ids = []
+    for doc in documents:
+        chunk_id = getattr(doc, "id", None) or doc.metadata.get("chunk_id")
+        ids.append(chunk_id or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest())
+    return tuple(ids)
+
+
+class AnswerCache:
+    """
+    In-memory answer cache placed in front of the LLM call.
+    Exact hits are keyed by the normalized question plus the IDs of the retrieved chunks;
+    near-duplicate questions hit when their query embedding is close enough to a cached one, the
+    cached answer was generated from at least one of the chunks retrieved now, and the two questions
+    do not differ by a negation or a number.
+    Entries expire after a TTL, the least recently used ones are evicted past max_entries, and the
+    whole cache is dropped whenever the index version changes (rebuild or sync).
+    """
+
+    def __init__(self, embeddings=None, max_entries=None, ttl_seconds=None, similarity_threshold=None,
+                 index_version=None):
+        from RagFromScratch.src.config import Config
+
+        self.embeddings = embeddings
+        self.max_entries = max_entries or Config.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.ANSWER_CACHE_TTL_SECONDS
+        self.similarity_threshold = similarity_threshold or Config.ANSWER_CACHE_SIMILARITY_THRESHOLD
+        self.index_version = index_version or (lambda: 0)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = self.index_version()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _embed(self, question, query_vector=None):
+        if query_vector is None:
+            if self.embeddings is None:
+                return None
+            query_vector = self.embeddings.embed_query(question)
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        version = self.index_version()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _evict_expired(self, now):
+        expired = [key for key, entry in self._entries.items() if entry["expires_at"] <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, question, documents, query_vector=None):
+        """
+        Look up a cached answer.
+        :param question: The user question.
+        :param documents: The documents retrieved for it.
+        :param query_vector: Embedding of the question if already computed, otherwise it is embedded here.
+        :return: The cached answer, or None on a miss.
+        """
+        key = (normalize_question(question), document_ids(documents))
+        now = time.time()
+
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] > now:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                get_instrumentation().cache_event("answer", hits=1)
+                return entry["answer"]
+
+        from RagFromScratch.src.faq_index import conflicting_words
+
+        query_vector = self._embed(question, query_vector)
+        current_ids = set(key[1])
+
+        with self._lock:
+            self._evict_expired(now)
+            if query_vector is not None and self._entries:
+                keys = list(self._entries.keys())
+                vectors = np.stack([self._entries[cached_key]["vector"] for cached_key in keys])
+                similarities = vectors @ query_vector
+                for best in np.argsort(-similarities, kind="stable"):
+                    if similarities[best] < self.similarity_threshold:
+                        break
+                    cached_question, cached_ids = keys[best]
+                    if current_ids.isdisjoint(cached_ids) or conflicting_words(question, cached_question):
+                        continue
+                    self._entries.move_to_end(keys[best])
+                    self.semantic_hits += 1
+                    get_instrumentation().cache_event("answer", hits=1)
+                    return self._entries[keys[best]]["answer"]
+
+            self.misses += 1
+        get_instrumentation().cache_event("answer", misses=1)
+        return None
+
+    def put(self, question, documents, answer, query_vector=None):
+        """
+        Store an answer for a question and the documents it was generated from.
+        :param question: The user question.
+        :param documents: The documents retrieved for it.
+        :param answer: The generated answer.
+        :param query_vector: Embedding of the question if already computed, otherwise it is embedded here.
+        :return:
+        """
+        key = (normalize_question(question), document_ids(documents))
+        vector = self._embed(question, query_vector)
+        if vector is None:
+            vector = np.zeros(1, dtype=np.float32)
+
+        with self._lock:
+            self._check_version()
+            self._entries[key] = {"answer": answer, "vector": vector, "expires_at": time.time() + self.ttl_seconds}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {"exact_hits": self.exact_hits,
+                    "semantic_hits": self.semantic_hits,
+                    "misses": self.misses,
+                    "hit_rate": hits / total if total else 0.0,
+                    "entries": len(self._entries)}
@@ -0,0 +1,263 @@
+import os
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+FORMAT_VERSION = 2
+
+
+def tokenize(text):
+    """Lowercased word tokens; product codes like 'JS-101' become ['js', '101']."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Compact BM25 inverted index that can be updated in place.
+    Postings live in segments in CSR form: for term t, doc_ids[indptr[t]:indptr[t + 1]] are the
+    documents of the segment containing it and tfs[...] their term frequencies. Every build() of
+    newly added chunks appends one segment and deletions only clear a document's live flag, so a
+    sync touches the changed chunks only; segments are merged once there are too many or most of
+    their documents are deleted.
+    BM25 weights are computed at query time from the live documents, so document frequencies and
+    the average length stay exact after updates. The weights of all matching postings are
+    scatter-added into one score array with bincount and the top k are selected with argpartition.
+    """
+
+    MAX_SEGMENTS = 8
+    SPARSE_RATIO = 16  # Fewer matching postings than documents / SPARSE_RATIO are scored sparsely
+
+    def __init__(self, k1=None, b=None):
+        from RagFromScratch.src.config import Config
+
+        self.k1 = Config.BM25_K1 if k1 is None else k1
+        self.b = Config.BM25_B if b is None else b
+
+        self.vocabulary = {}
+        self.segments = []  # (indptr, doc_ids, tfs) per segment, doc_ids number documents globally
+        self.chunk_ids = np.zeros(0, dtype=object)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        self.average_length = 1.0  # Of the live documents
+        self._doc_of = {}  # chunk_id -> document number of its live version
+
+        # Token ids per document, only kept until the next build()
+        self._pending_terms = []
+        self._pending_chunk_ids = []
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    def copy(self):
+        """
+        Copy to update while searches keep using the original. Segments are never modified, so
+        they are shared; only the per-document arrays and the vocabulary are copied.
+        """
+        index = BM25Index(k1=self.k1, b=self.b)
+        index.vocabulary = dict(self.vocabulary)
+        index.segments = list(self.segments)
+        index.chunk_ids = self.chunk_ids
+        index.doc_lengths = self.doc_lengths
+        index.live = self.live.copy()
+        index.average_length = self.average_length
+        index._doc_of = dict(self._doc_of)
+        index._pending_terms = list(self._pending_terms)
+        index._pending_chunk_ids = list(self._pending_chunk_ids)
+        return index
+
+    def add(self, chunk_id, text):
+        """
+        Queue a chunk for indexing, replacing an indexed chunk with the same ID.
+        Call build() once all chunks are added.
+        :param chunk_id: ID of the chunk in the vector store.
+        :param text: Chunk text.
+        :return:
+        """
+        term_ids = [self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokenize(text)]
+        self._pending_terms.append(np.asarray(term_ids, dtype=np.int32))
+        self._pending_chunk_ids.append(chunk_id)
+
+    def delete(self, chunk_ids):
+        """
+        Remove chunks from the index.
+        :param chunk_ids: IDs of the chunks to remove, unknown IDs are ignored.
+        :return: Number of removed chunks.
+        """
+        docs = [self._doc_of.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in self._doc_of]
+        if docs:
+            self.live[docs] = False
+            self._update_average_length()
+        return len(docs)
+
+    def _update_average_length(self):
+        live_lengths = self.doc_lengths[self.live]
+        self.average_length = float(live_lengths.mean()) if len(live_lengths) else 0.0
+        self.average_length = self.average_length or 1.0
+
+    def build(self):
+        """
+        Turn the queued chunks into a new CSR segment.
+        :return: self
+        """
+        if self._pending_terms:
+            self.delete(self._pending_chunk_ids)
+            self._append_segment()
+        if len(self.segments) > self.MAX_SEGMENTS or len(self._doc_of) * 2 < len(self.live):
+            self.compact()
+        self._update_average_length()
+        return self
+
+    def _append_segment(self):
+        base = len(self.chunk_ids)
+        doc_count = len(self._pending_terms)
+        doc_lengths = np.asarray([len(terms) for terms in self._pending_terms], dtype=np.float32)
+
+        # One (term, doc) pair per token, reduced to (term, doc, tf) triples sorted by term
+        terms = np.concatenate(self._pending_terms).astype(np.int64)
+        docs = np.repeat(np.arange(doc_count, dtype=np.int64), doc_lengths.astype(np.int64))
+        unique_pairs, term_frequencies = np.unique(terms * doc_count + docs, return_counts=True)
+        posting_terms = unique_pairs // doc_count
+        posting_docs = (unique_pairs % doc_count + base).astype(np.int32)
+
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(posting_terms, minlength=len(self.vocabulary)))])
+        self.segments.append((indptr.astype(np.int64), posting_docs, term_frequencies.astype(np.float32)))
+
+        chunk_ids = np.empty(doc_count, dtype=object)
+        chunk_ids[:] = self._pending_chunk_ids
+        self.chunk_ids = np.concatenate([self.chunk_ids, chunk_ids])
+        self.doc_lengths = np.concatenate([self.doc_lengths, doc_lengths])
+        self.live = np.concatenate([self.live, np.ones(doc_count, dtype=bool)])
+        self._doc_of.update((chunk_id, base + row) for row, chunk_id in enumerate(self._pending_chunk_ids))
+
+        self._pending_terms = []
+        self._pending_chunk_ids = []
+
+    def compact(self):
+        """Merge all segments into one and drop deleted documents, without re-tokenizing any text."""
+        renumbered = np.cumsum(self.live) - 1
+        posting_terms, posting_docs, posting_tfs = [], [], []
+        for indptr, doc_ids, tfs in self.segments:
+            terms = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+            keep = self.live[doc_ids]
+            posting_terms.append(terms[keep])
+            posting_docs.append(renumbered[doc_ids[keep]])
+            posting_tfs.append(tfs[keep])
+
+        self.chunk_ids = self.chunk_ids[self.live]
+        self.doc_lengths = self.doc_lengths[self.live]
+        self.live = np.ones(len(self.chunk_ids), dtype=bool)
+        self._doc_of = {chunk_id: doc for doc, chunk_id in enumerate(self.chunk_ids.tolist())}
+        self.segments = []
+        if not len(self.chunk_ids):
+            return self
+
+        terms = np.concatenate(posting_terms)
+        docs = np.concatenate(posting_docs).astype(np.int32)
+        order = np.lexsort((docs, terms))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)))])
+        self.segments = [(indptr.astype(np.int64), docs[order], np.concatenate(posting_tfs)[order])]
+        return self
+
+    def search(self, query, k=10):
+        """
+        Score the chunks matching the query terms.
+        :param query: Query text.
+        :param k: Number of results.
+        :return: List of (chunk_id, score) pairs, best first.
+        """
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        doc_count = len(self._doc_of)
+        if not term_ids or not doc_count:
+            return []
+
+        live = self.live
+        doc_slices, tf_slices, posting_terms = [], [], []
+        for position, term_id in enumerate(term_ids):
+            for indptr, doc_ids, tfs in self.segments:
+                if term_id + 1 < len(indptr) and indptr[term_id + 1] > indptr[term_id]:
+                    doc_slices.append(doc_ids[indptr[term_id]:indptr[term_id + 1]])
+                    tf_slices.append(tfs[indptr[term_id]:indptr[term_id + 1]])
+                    posting_terms.append(np.full(len(doc_slices[-1]), position, dtype=np.int32))
+        if not doc_slices:
+            return []
+
+        docs, tf, terms = np.concatenate(doc_slices), np.concatenate(tf_slices), np.concatenate(posting_terms)
+        if doc_count < len(live):
+            keep = live[docs]
+            docs, tf, terms = docs[keep], tf[keep], terms[keep]
+            if not len(docs):
+                return []
+
+        # Document frequencies and weights of the live postings of all query terms at once
+        document_frequencies = np.bincount(terms, minlength=len(term_ids))
+        idf = np.log(1 + (doc_count - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.average_length)
+        weights = idf[terms] * tf * (self.k1 + 1) / (tf + norm)
+
+        # Scatter-add the weights of every matching posting into one score array: a dense one over
+        # all documents, or one over the matched documents when only a few postings match
+        if len(docs) * self.SPARSE_RATIO < len(live):
+            matched, positions = np.unique(docs, return_inverse=True)
+            scores = np.bincount(positions, weights=weights, minlength=len(matched))
+        else:
+            matched = None
+            scores = np.bincount(docs, weights=weights, minlength=len(live))
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.chunk_ids[doc if matched is None else matched[doc]], float(scores[doc]))
+                for doc in top if scores[doc] > 0]
+
+    def save(self, index_path):
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+
+        arrays = {}
+        for number, (indptr, doc_ids, tfs) in enumerate(self.segments):
+            arrays[f"indptr_{number}"] = indptr
+            arrays[f"doc_ids_{number}"] = doc_ids
+            arrays[f"tfs_{number}"] = tfs
+
+        tmp_path = index_path + ".tmp.npz"
+        np.savez(tmp_path,
+                 version=np.asarray(FORMAT_VERSION),
+                 segments=np.asarray(len(self.segments)),
+                 doc_lengths=self.doc_lengths,
+                 live=self.live,
+                 terms=terms.astype(str) if len(terms) else np.zeros(0, dtype=str),
+                 chunk_ids=self.chunk_ids.astype(str) if len(self.chunk_ids) else np.zeros(0, dtype=str),
+                 params=np.asarray([self.k1, self.b], dtype=np.float32),
+                 **arrays)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path):
+        """
+        Load a persisted index, or return None when it does not exist or has an older format.
+        :param index_path: Path written by save().
+        :return: BM25Index or None.
+        """
+        if not os.path.exists(index_path):
+            return None
+
+        with np.load(index_path, allow_pickle=False) as data:
+            if "version" not in data or int(data["version"]) != FORMAT_VERSION:
+                return None
+            k1, b = data["params"].tolist()
+            index = cls(k1=k1, b=b)
+            index.segments = [(data[f"indptr_{number}"], data[f"doc_ids_{number}"], data[f"tfs_{number}"])
+                              for number in range(int(data["segments"]))]
+            index.doc_lengths = data["doc_lengths"]
+            index.live = data["live"]
+            index.chunk_ids = data["chunk_ids"].astype(object)
+            index.vocabulary = {term: term_id for term_id, term in enumerate(data["terms"].tolist())}
+        index._doc_of = {chunk_id: doc for doc, chunk_id in enumerate(index.chunk_ids.tolist()) if index.live[doc]}
+        index._update_average_length()
+        return index
@@ -0,0 +1,213 @@
+import re
+import time
+from bisect import bisect_right
+
+from langchain_core.documents import Document
+
+# Preferred cut points, strongest first; the offset is where the cut goes relative to the match
+BOUNDARIES = ((("\n\n", 0),),
+              ((". ", 1), ("? ", 1), ("! ", 1), (".\n", 1), ("?\n", 1), ("!\n", 1)),
+              (("\n", 0),),
+              ((" ", 0), ("\t", 0)))
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_WHITESPACE = re.compile(r"\S")
+
+
+def find_cut(text, lo, hi):
+    """
+    Best place to end a chunk inside text[lo:hi]: the last paragraph break, else the last sentence
+    end, else the last line break, else the last space, else a hard cut at hi.
+    Uses str.rfind on the window, so nothing is copied and every search runs in C.
+    :return: Tuple of (character offset of the cut with lo < cut <= hi, True if it is a paragraph break).
+    """
+    for level, separators in enumerate(BOUNDARIES):
+        best = -1
+        for separator, offset in separators:
+            position = text.rfind(separator, lo, hi)
+            if position != -1 and position + offset > best:
+                best = position + offset
+        if best > lo:
+            return best, level == 0
+    return hi, False
+
+
+class StructureChunker:
+    """
+    Single-pass chunker cutting at paragraph, sentence and word boundaries.
+    Every chunk is found by looking back from the furthest allowed end for the strongest boundary
+    in the second half of the window, so the text is scanned about once instead of being split
+    recursively into pieces and merged again. Chunks cut inside a paragraph overlap the next one by
+    about chunk_overlap, starting at a word; chunks ending at a paragraph break do not overlap,
+    as with the recursive splitter. Chunks are slices of the page text, their character range is
+    kept in the start_index/end_index metadata.
+    Sizes are in characters, or with size_unit="tokens" in tokens of the embedding model's
+    tokenizer, so chunks fit the model's EMBEDDING_MAX_SEQ_LENGTH window instead of being truncated.
+    """
+
+    def __init__(self, chunk_size=None, chunk_overlap=None, size_unit=None, tokenizer=None):
+        from RagFromScratch.src.config import Config
+
+        self.size_unit = (size_unit or Config.CHUNK_SIZE_UNIT).lower()
+        if self.size_unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown chunk size unit '{self.size_unit}'. Use 'chars' or 'tokens'.")
+
+        tokens = self.size_unit == "tokens"
+        self.chunk_size = chunk_size or (Config.CHUNK_TOKEN_SIZE if tokens else Config.CHUNK_SIZE)
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else (
+            Config.CHUNK_TOKEN_OVERLAP if tokens else Config.CHUNK_OVERLAP)
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("The chunk overlap must be smaller than the chunk size.")
+        if tokens and self.chunk_size > Config.EMBEDDING_MAX_SEQ_LENGTH - 2:
+            print(f"⚠️ Chunks of {self.chunk_size} tokens exceed the embedding window of "
+                  f"{Config.EMBEDDING_MAX_SEQ_LENGTH} tokens, their ends will be truncated when embedded.")
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        """Fast tokenizer of the embedding model, loaded on first use, only needed for token sizes."""
+        if self._tokenizer is None:
+            from tokenizers import Tokenizer
+
+            from RagFromScratch.src.config import Config
+
+            tokenizer = Tokenizer.from_pretrained(Config.EMBEDDING_MODEL)
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            self._tokenizer = tokenizer
+        return self._tokenizer
+
+    @staticmethod
+    def _trim_end(text, start, end):
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return end
+
+    @staticmethod
+    def _next_word(text, position, limit):
+        """First word start at or after position, so overlapping chunks do not begin mid-word."""
+        if position == 0 or text[position - 1].isspace():
+            return position
+        match = _WHITESPACE.search(text, position, limit)
+        return match.end() if match else limit
+
+    def _character_spans(self, text):
+        length = len(text)
+        match = _NON_WHITESPACE.search(text)
+        start = match.start() if match else length
+        while start < length:
+            hi = start + self.chunk_size
+            if hi >= length:
+                end = self._trim_end(text, start, length)
+                if end > start:
+                    yield start, end
+                return
+
+            cut, paragraph_break = find_cut(text, start + self.chunk_size // 2, hi)
+            end = self._trim_end(text, start, cut)
+            yield start, end
+
+            next_start = end
+            if self.chunk_overlap and not paragraph_break:
+                next_start = self._next_word(text, max(end - self.chunk_overlap, start + 1), end)
+            match = _NON_WHITESPACE.search(text, next_start)
+            start = match.start() if match else length
+
+    def _token_spans(self, text):
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        starts = [token_start for token_start, _ in offsets]
+        ends = [token_end for _, token_end in offsets]
+        count = len(offsets)
+
+        token = 0
+        while token < count:
+            start = starts[token]
+            last = token + self.chunk_size
+            if last >= count:
+                end = self._trim_end(text, start, len(text))
+                if end > start:
+                    yield start, end
+                return
+
+            cut, paragraph_break = find_cut(text, ends[token + self.chunk_size // 2 - 1], ends[last - 1])
+            end = self._trim_end(text, start, cut)
+            yield start, end
+
+            # Continue after the tokens that fit, minus the overlap, at the start of a word
+            covered = bisect_right(ends, end)
+            overlap = 0 if paragraph_break else self.chunk_overlap
+            next_token = max(token + 1, covered - overlap)
+            while next_token < covered and not text[starts[next_token] - 1].isspace():
+                next_token += 1
+            token = next_token
+
+    def iter_spans(self, text):
+        """
+        :param text: Text to split.
+        :return: Generator of (start, end) character offsets of the chunks, in order.
+        """
+        if self.size_unit == "tokens":
+            return self._token_spans(text)
+        return self._character_spans(text)
+
+    def split_text(self, text):
+        return [text[start:end] for start, end in self.iter_spans(text)]
+
+    def iter_chunks(self, documents):
+        """
+        Chunk documents lazily, one page at a time.
+        :param documents: Iterable of Documents, e.g. the pages of a PDF.
+        :return: Generator of chunk Documents with the page metadata plus start_index and end_index.
+        """
+        for document in documents:
+            text = document.page_content
+            for start, end in self.iter_spans(text):
+                yield Document(page_content=text[start:end],
+                               metadata={**document.metadata, "start_index": start, "end_index": end})
+
+    def split_documents(self, documents):
+        return list(self.iter_chunks(documents))
+
+
+def chunking_report(documents, chunkers, repeats=3):
+    """
+    Compare the throughput and chunk shapes of several chunkers on the same documents.
+    :param documents: Loaded documents.
+    :param chunkers: Mapping of name -> object with split_documents(documents).
+    :param repeats: Runs per chunker, the fastest one is reported.
+    :return: List of dictionaries, one per chunker.
+    """
+    megabytes = sum(len(document.page_content) for document in documents) / 2 ** 20
+    report = []
+    for name, chunker in chunkers.items():
+        best = float("inf")
+        chunks = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            chunks = chunker.split_documents(documents)
+            best = min(best, time.perf_counter() - started)
+        lengths = [len(chunk.page_content) for chunk in chunks]
+        report.append({"chunker": name,
+                       "chunks": len(chunks),
+                       "seconds": best,
+                       "chunks_per_sec": len(chunks) / best if best else 0.0,
+                       "mb_per_sec": megabytes / best if best else 0.0,
+                       "average_length": sum(lengths) / len(lengths) if lengths else 0.0,
+                       "max_length": max(lengths, default=0)})
+
+    print(f"📊 Chunking {len(documents)} documents ({megabytes:.2f} MB):")
+    for row in report:
+        print(f"   - {row['chunker']:<10} {row['chunks']:7d} chunks in {row['seconds']:.3f}s  "
+              f"{row['chunks_per_sec']:9.0f} chunks/s  {row['mb_per_sec']:6.2f} MB/s  "
+              f"avg {row['average_length']:.0f} / max {row['max_length']} chars")
+    return report
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.config import Config
+    from RagFromScratch.src.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    docs = processor.load_documents(Config.DATA_FOLDER)
+    chunking_report(docs, {"structure": StructureChunker(),
+                           "recursive": DocumentProcessor(chunker="recursive").text_splitter})
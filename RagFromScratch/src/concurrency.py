@@ -0,0 +1,61 @@
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+    """
+    Asyncio token-bucket rate limiter.
+    Tokens refill continuously at `rate` per second up to `capacity`; every acquire takes one token
+    and waits until one is available. A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def retry_with_backoff(operation, max_attempts=None, base_delay=None, max_delay=None):
+    """
+    Await an async operation, retrying failures with exponential backoff and full jitter.
+    :param operation: Zero-argument callable returning a coroutine.
+    :param max_attempts: Total number of attempts, including the first one.
+    :param base_delay: Delay in seconds before the first retry, doubled on every further retry.
+    :param max_delay: Upper bound of a single delay in seconds.
+    :return: The result of the first successful attempt.
+    """
+    from RagFromScratch.src.config import Config
+
+    max_attempts = max_attempts or Config.LLM_RETRY_ATTEMPTS
+    base_delay = Config.LLM_RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = Config.LLM_RETRY_MAX_DELAY if max_delay is None else max_delay
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return await operation()
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            print(f"⚠️ Attempt {attempt}/{max_attempts} failed ({e}), retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
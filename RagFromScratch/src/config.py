@@ -2,7 +2,11 @@ import os
 
 from dotenv import load_dotenv
 
-from Secrets.openai_key import google_api_key
+try:
+    from Secrets.openai_key import google_api_key
+except ImportError:
+    # Only the Gemini backend needs the key, local backends run without the Secrets package
+    google_api_key = None
 
 load_dotenv()
 
@@ -14,17 +18,146 @@ class Config:
     It includes settings for the OpenAI API key, the directory for storing vector data,
     and any other relevant configuration parameters needed for the RAG system to function properly.
     """
-    GOOGLE_API_KEY = google_api_key
+    GOOGLE_API_KEY = google_api_key or os.getenv("GOOGLE_API_KEY")
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L12-v2"
+    # Tokens the embedding model reads per text, longer texts are truncated (128 for all-MiniLM-L12-v2)
+    EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "128"))
     CHAT_MODEL = "gemini-flash-latest"
 
+    # Chat model backend: "gemini", "ollama" (Ollama-compatible HTTP server) or "stub" (deterministic, offline)
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+    OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+    STUB_LLM_PROFILE = os.getenv("STUB_LLM_PROFILE", "fast")  # "instant", "fast", "hosted" or "local-cpu"
+    # Override the profile's time to first token / generation speed, unset = profile value
+    STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS")) if os.getenv("STUB_LLM_LATENCY_MS") else None
+    STUB_LLM_TOKENS_PER_SECOND = (float(os.getenv("STUB_LLM_TOKENS_PER_SECOND"))
+                                  if os.getenv("STUB_LLM_TOKENS_PER_SECOND") else None)
+    STUB_LLM_ANSWER_TOKENS = int(os.getenv("STUB_LLM_ANSWER_TOKENS", "12"))
+
     CHUNK_SIZE = 1000  # Size of text chunks for processing
     CHUNK_OVERLAP = 200  # Overlap between chunks to maintain context
+    CHUNKER = os.getenv("CHUNKER", "structure").lower()  # "structure" (single pass) or "recursive" (LangChain)
+    CHUNK_SIZE_UNIT = os.getenv("CHUNK_SIZE_UNIT", "chars").lower()  # "chars" or "tokens" of the embedding model
+    # Defaults to the embedding window minus [CLS]/[SEP], so token-sized chunks are never truncated
+    CHUNK_TOKEN_SIZE = int(os.getenv("CHUNK_TOKEN_SIZE", str(EMBEDDING_MAX_SEQ_LENGTH - 2)))
+    CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", "32"))
 
     DATA_FOLDER = os.getenv("DATA_FOLDER", "../data/documents")
     PERSIST_DIRECTORY = os.getenv("PERSIST_DIRECTORY", "./storage/chroma_db")
+    # Per-file content hashes and chunk IDs used by the incremental sync (--sync)
+    MANIFEST_PATH = os.getenv("MANIFEST_PATH", PERSIST_DIRECTORY.rstrip("/\\") + "_manifest.json")
+
+    # Vector store backend: "chroma" or "numpy" (memory-mapped matrix, float32 or float16)
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma").lower()
+    VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+
+    # Approximate nearest-neighbour index for the numpy backend: "" (exact), "hnsw" or "ivfpq"
+    ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "").lower()
+    ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # IVF lists, 0 picks ~4 * sqrt(n)
+    ANN_PQ_M = int(os.getenv("ANN_PQ_M", "48"))  # PQ sub-quantizers per vector
+    ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))  # IVF lists visited per query
+    ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))  # HNSW graph neighbours per node
+    ANN_EF_CONSTRUCTION = int(os.getenv("ANN_EF_CONSTRUCTION", "200"))
+    ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "128"))  # HNSW candidate list size per query
+    ANN_RESCORE_FACTOR = int(os.getenv("ANN_RESCORE_FACTOR", "4"))  # Candidates rescored exactly per result
+
+    # Optional compressed codes for the first search pass of the numpy backend: "" (off), "int8" or "binary"
+    VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "").lower()
+    QUANTIZATION_RESCORE_FACTOR = int(os.getenv("QUANTIZATION_RESCORE_FACTOR", "10"))  # Shortlist per result
+
+    # Streaming ingestion: loader processes, chunks per embedding batch, batches buffered per queue
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+
+    # Embedding backend: "huggingface" (PyTorch) or "onnx" (ONNX Runtime, optionally int8-quantized)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface").lower()
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    EMBEDDING_INTRA_OP_THREADS = int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0"))  # 0 = runtime default
+    ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./storage/onnx")
+    ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+
+    # Persistent embedding cache keyed by (model, normalize flag, text hash)
+    USE_EMBEDDING_CACHE = os.getenv("USE_EMBEDDING_CACHE", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./storage/embedding_cache.sqlite")
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+    # Cache of the pages extracted from PDF/DOCX files keyed by path, size, mtime and content hash
+    USE_PARSED_CACHE = os.getenv("USE_PARSED_CACHE", "true").lower() == "true"
+    PARSED_CACHE_PATH = os.getenv("PARSED_CACHE_PATH", "./storage/parsed_cache.sqlite")
+    PARSED_CACHE_EXTENSIONS = [ext for ext in os.getenv("PARSED_CACHE_EXTENSIONS", ".pdf,.docx").lower().split(",") if ext]
+
+    # Answer cache in front of the LLM: exact (question + chunk IDs) and near-duplicate question hits
+    USE_ANSWER_CACHE = os.getenv("USE_ANSWER_CACHE", "true").lower() == "true"
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+    ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+
+    # LLM calls: client retries, and concurrency / rate limit / backoff for batch queries
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+    LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "5"))  # 0 disables rate limiting
+    LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "5"))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
 
     SEARCH_K = 4  # Number of top results to retrieve from the vector store
+    # BM25 lexical index persisted beside the vector store, fused with dense results for search_type="hybrid"
+    BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", PERSIST_DIRECTORY.rstrip("/\\") + "_bm25.npz")
+    BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+    BM25_B = float(os.getenv("BM25_B", "0.75"))
+    HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))  # Candidates fetched from each retriever
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # Reciprocal rank fusion constant
+    SEARCH_TYPE = os.getenv("SEARCH_TYPE", "similarity")  # "similarity" or "hybrid"
+
+    # Optional cross-encoder reranking of over-fetched candidates (needs sentence-transformers)
+    USE_RERANKER = os.getenv("USE_RERANKER", "false").lower() == "true"
+    RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANKER_DEVICE = os.getenv("RERANKER_DEVICE", "cpu")
+    RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", "512"))
+    RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", "20"))  # Candidates scored by the cross-encoder
+    RERANK_SCORE_MARGIN = float(os.getenv("RERANK_SCORE_MARGIN", "0.15"))  # Cosine gap that skips reranking, 0 = always rerank
+    RERANK_RRF_MARGIN = float(os.getenv("RERANK_RRF_MARGIN", "0.01"))  # Same for hybrid RRF scores, at most 2 / (HYBRID_RRF_K + 1)
+    RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "10000"))
+
+    # HTTP query server (python main.py --serve)
+    SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "8"))  # Threads running chain calls, sharing one model
+    SERVER_MAX_PENDING = int(os.getenv("SERVER_MAX_PENDING", "64"))  # Admitted requests before answering 429
+    SERVER_REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "60"))  # Seconds before answering 504
+    SERVER_MAX_BATCH = int(os.getenv("SERVER_MAX_BATCH", "100"))  # Questions accepted per /batch request
+    EMBEDDING_MICRO_BATCH_SIZE = int(os.getenv("EMBEDDING_MICRO_BATCH_SIZE", "32"))
+    EMBEDDING_MICRO_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_MICRO_BATCH_WAIT_MS", "5"))
+
+    # Sharded collections: "name=folder;other=folder" switches from the single store to one index per
+    # collection, split into shards that are built independently and searched in parallel
+    COLLECTIONS = os.getenv("COLLECTIONS", "")
+    QUERY_COLLECTIONS = os.getenv("QUERY_COLLECTIONS", "")  # Comma-separated collections searched by default, "" = all
+    SHARDS_PER_COLLECTION = int(os.getenv("SHARDS_PER_COLLECTION", "1"))
+    SHARD_ROOT = os.getenv("SHARD_ROOT", "./storage/shards")
+    SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "8"))
+
+    # Known-question shortcut: FAQ CSVs (prompt,response) answered without retrieval or LLM call
+    USE_FAQ_SHORTCUT = os.getenv("USE_FAQ_SHORTCUT", "true").lower() == "true"
+    FAQ_FILES = [path for path in os.getenv("FAQ_FILES", "../data/data_faqs.csv").split(",") if path]  # Besides the data folder CSVs
+    # Typo-tolerant step, off by default: its hits still need the same word set or the embedding score
+    FAQ_FUZZY_MATCH = os.getenv("FAQ_FUZZY_MATCH", "false").lower() == "true"
+    FAQ_FUZZY_THRESHOLD = float(os.getenv("FAQ_FUZZY_THRESHOLD", "96"))  # RapidFuzz token-sort ratio, 0-100
+    FAQ_SIMILARITY_THRESHOLD = float(os.getenv("FAQ_SIMILARITY_THRESHOLD", "0.92"))  # Cosine of question embeddings
+
+    # Stage instrumentation exporters: "" (no-op), "prometheus", "otel" or "prometheus,otel"
+    INSTRUMENTATION = os.getenv("INSTRUMENTATION", "").lower()
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Standalone Prometheus endpoint, 0 = off (the server has /metrics)
+
+    # Optional pre-loaded worker that short-lived CLI invocations connect to ("host:port" or a Unix socket path)
+    WARM_WORKER_ADDRESS = os.getenv("WARM_WORKER_ADDRESS", "")
+    # Shared secret of the worker connection; unset = a random key the worker writes to WARM_WORKER_KEY_FILE (0600)
+    WARM_WORKER_AUTHKEY = os.getenv("WARM_WORKER_AUTHKEY", "").encode("utf-8")
+    WARM_WORKER_KEY_FILE = os.getenv("WARM_WORKER_KEY_FILE", "./storage/warm_worker.key")
+
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # Max prompt tokens spent on context
 
     @staticmethod
     def validate_config(cls):
@@ -32,7 +165,11 @@ class Config:
         Validate that all required configurations are present
         :return:
         """
-        if not cls.GOOGLE_API_KEY:
+        from RagFromScratch.src.llm_backends import LLM_BACKENDS
+
+        if cls.LLM_BACKEND not in LLM_BACKENDS:
+            raise ValueError(f"Unknown LLM backend '{cls.LLM_BACKEND}'. Use one of: {', '.join(LLM_BACKENDS)}.")
+        if cls.LLM_BACKEND == "gemini" and not cls.GOOGLE_API_KEY:
             raise ValueError("Google API key is missing. Please set the GOOGLE_API_KEY environment variable.")
 
         return True
@@ -44,11 +181,23 @@ class Config:
         :return:
         """
         print("🔧 RAG System Configuration:")
-        print(f"   - Chat Model: {cls.CHAT_MODEL}")
-        print(f"   - Embedding Model: {cls.EMBEDDING_MODEL}")
+        from RagFromScratch.src.llm_backends import describe_llm
+
+        print(f"   - Chat Model: {describe_llm()}")
+        print(f"   - Embedding Model: {cls.EMBEDDING_MODEL} ({cls.EMBEDDING_BACKEND})")
+        print(f"   - Vector Store Backend: {cls.VECTOR_STORE_BACKEND}")
+        if cls.COLLECTIONS:
+            print(f"   - Collections: {cls.COLLECTIONS} ({cls.SHARDS_PER_COLLECTION} shards each)")
         print(f"   - Data Folder: {cls.DATA_FOLDER}")
-        print(f"   - Chunk Size: {cls.CHUNK_SIZE}")
+        chunk_size = f"{cls.CHUNK_TOKEN_SIZE} tokens" if cls.CHUNK_SIZE_UNIT == "tokens" else cls.CHUNK_SIZE
+        print(f"   - Chunk Size: {chunk_size} ({cls.CHUNKER} chunker)")
+        print(f"   - Embedding Cache: {cls.EMBEDDING_CACHE_PATH if cls.USE_EMBEDDING_CACHE else 'disabled'}")
+        print(f"   - Parsed Document Cache: {cls.PARSED_CACHE_PATH if cls.USE_PARSED_CACHE else 'disabled'}")
         print(f"   - Documents to Retrieve: {cls.SEARCH_K}")
+        print(f"   - Search Type: {cls.SEARCH_TYPE}")
+        print(f"   - Reranker: {cls.RERANKER_MODEL if cls.USE_RERANKER else 'disabled'}")
+        print(f"   - FAQ Shortcut: {'enabled' if cls.USE_FAQ_SHORTCUT else 'disabled'}")
+        print(f"   - Instrumentation: {cls.INSTRUMENTATION or 'disabled'}")
 
 
 if __name__ == "__main__":
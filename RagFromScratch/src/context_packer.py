@@ -0,0 +1,155 @@
+import threading
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text):
+    """
+    Count tokens with tiktoken's BPE, which is fast and close enough to the chat model's tokenizer
+    for budgeting. Falls back to the usual ~4 characters per token estimate when the encoding
+    cannot be loaded (e.g. offline without a cached encoding file).
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    print(f"⚠️ tiktoken encoding unavailable ({e.__class__.__name__}), estimating tokens from length.")
+                    _encoding = False
+
+    if _encoding is False:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to at most max_tokens tokens, preferring to end on a whitespace boundary."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding:
+        text = _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        text = text[:max_tokens * 4]
+    cut = text.rfind(" ")
+    return text[:cut] if cut > len(text) // 2 else text
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into the prompt context under a token budget.
+    Chunks of the same source (and page) are ordered by their character offset, the spans that
+    overlap between neighbours are dropped and contiguous chunks are merged into one passage.
+    Passages are then added in relevance order until the budget is used up.
+    """
+
+    def __init__(self, token_budget=None, min_passage_tokens=50):
+        from RagFromScratch.src.config import Config
+
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.min_passage_tokens = min_passage_tokens
+
+    @staticmethod
+    def _suffix_prefix_overlap(left, right, max_overlap=2000, min_overlap=20):
+        """Length of the longest suffix of left that is also a prefix of right."""
+        for size in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+            if left.endswith(right[:size]):
+                return size
+        return 0
+
+    def _merge_group(self, chunks):
+        """
+        Merge the chunks of one source/page into non-overlapping passages.
+        :param chunks: List of (rank, document) pairs from the same source and page.
+        :return: List of passages {"rank", "source", "text"}.
+        """
+        with_offsets = all("start_index" in doc.metadata for _, doc in chunks)
+        if with_offsets:
+            chunks = sorted(chunks, key=lambda item: item[1].metadata["start_index"])
+
+        passages = []
+        current = None
+        for rank, doc in chunks:
+            text = doc.page_content
+            if current is not None:
+                if with_offsets:
+                    start = doc.metadata["start_index"]
+                    overlap = current["end"] - start
+                    contiguous = overlap >= 0
+                else:
+                    overlap = self._suffix_prefix_overlap(current["text"], text)
+                    contiguous = overlap > 0
+                    # Without offsets the chunks are in rank order, so the neighbour may come before
+                    reverse_overlap = 0 if contiguous else self._suffix_prefix_overlap(text, current["text"])
+                    if reverse_overlap:
+                        current["text"] = text + current["text"][reverse_overlap:]
+                        current["rank"] = min(current["rank"], rank)
+                        continue
+
+                if contiguous:
+                    current["text"] += text[max(overlap, 0):]
+                    current["end"] = max(current["end"], start + len(text)) if with_offsets else current["end"]
+                    current["rank"] = min(current["rank"], rank)
+                    continue
+                if text in current["text"]:
+                    current["rank"] = min(current["rank"], rank)
+                    continue
+
+            current = {"rank": rank,
+                       "source": doc.metadata.get("source", "Unknown Source"),
+                       "text": text,
+                       "end": doc.metadata.get("start_index", 0) + len(text)}
+            passages.append(current)
+        return passages
+
+    def pack(self, documents):
+        """
+        Build the context string for the retrieved documents.
+        :param documents: Retrieved documents, most relevant first.
+        :return: Dictionary with the packed "context" and the "stats" of the prompt-size savings.
+        """
+        if not documents:
+            return {"context": "No relevant documents found.",
+                    "stats": {"chunks": 0, "passages": 0, "original_tokens": 0, "packed_tokens": 0,
+                              "saved_tokens": 0, "saved_ratio": 0.0}}
+
+        groups = {}
+        for rank, doc in enumerate(documents):
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            groups.setdefault(key, []).append((rank, doc))
+
+        passages = [passage for chunks in groups.values() for passage in self._merge_group(chunks)]
+        passages.sort(key=lambda passage: passage["rank"])
+
+        formatted_docs = []
+        remaining = self.token_budget
+        for passage in passages:
+            header = f"Document {len(formatted_docs) + 1} (Source: {passage['source']}):\n"
+            content = passage["text"].strip()
+            cost = count_tokens(header) + count_tokens(content)
+            if cost > remaining:
+                room = remaining - count_tokens(header)
+                if room < self.min_passage_tokens:
+                    continue
+                content = truncate_to_tokens(content, room)
+                cost = count_tokens(header) + count_tokens(content)
+            formatted_docs.append(f"{header}{content}\n")
+            remaining -= cost
+
+        context = "\n\n".join(formatted_docs)
+        # Baseline: every chunk in full with its own header, as the context used to be built
+        original_tokens = sum(count_tokens(f"Document {i} (Source: {doc.metadata.get('source', 'Unknown Source')}):\n"
+                                           f"{doc.page_content.strip()}\n") for i, doc in enumerate(documents, 1))
+        packed_tokens = count_tokens(context)
+        return {"context": context,
+                "stats": {"chunks": len(documents),
+                          "passages": len(formatted_docs),
+                          "original_tokens": original_tokens,
+                          "packed_tokens": packed_tokens,
+                          "saved_tokens": max(0, original_tokens - packed_tokens),
+                          "saved_ratio": max(0, original_tokens - packed_tokens) / original_tokens
+                          if original_tokens else 0.0}}
@@ -1,32 +1,119 @@
+import hashlib
 import os
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (Docx2txtLoader, PyPDFLoader,
                                                   TextLoader)
 
+from RagFromScratch.src.chunker import StructureChunker
 from RagFromScratch.src.config import Config
+from RagFromScratch.src.faq_index import FaqCsvLoader
+from RagFromScratch.src.index_manifest import IndexManifest
+from RagFromScratch.src.parsed_cache import ParsedDocumentCache, print_parsed_cache_stats
 
 
 class DocumentProcessor:
     """Handles loading and processing documents"""
 
-    def __init__(self, chunk_size=None, chunk_overlap=None):
+    def __init__(self, chunk_size=None, chunk_overlap=None, chunker=None, use_parsed_cache=None):
         self.chunk_size = chunk_size or Config.CHUNK_SIZE
-        self.chunk_overlap = chunk_overlap or Config.CHUNK_OVERLAP
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else Config.CHUNK_OVERLAP
+        self.chunker = (chunker or Config.CHUNKER).lower()
         print(f"Initializing DocumentProcessor with chunk size: {self.chunk_size} "
-              f"and chunk overlap: {self.chunk_overlap}")
-
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size,
-                                                            chunk_overlap=self.chunk_overlap,
-                                                            length_function=len,
-                                                            separators=["\n\n", "\n", " ", "", "\t", ".", ". ", ",",
-                                                                        "!", "?", ";", ":", "-", "_", "(", ")", "[",
-                                                                        "]", "{", "}", "\"", "'"])
+              f"and chunk overlap: {self.chunk_overlap} ({self.chunker} chunker)")
+
+        if self.chunker == "recursive":
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+            self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size,
+                                                                chunk_overlap=self.chunk_overlap,
+                                                                length_function=len,
+                                                                add_start_index=True,
+                                                                separators=["\n\n", "\n", " ", "", "\t", ".", ". ",
+                                                                            ",", "!", "?", ";", ":", "-", "_", "(",
+                                                                            ")", "[", "]", "{", "}", "\"", "'"])
+        elif self.chunker == "structure":
+            # Token-sized chunks take their size and overlap from CHUNK_TOKEN_SIZE / CHUNK_TOKEN_OVERLAP
+            tokens = Config.CHUNK_SIZE_UNIT == "tokens"
+            self.text_splitter = StructureChunker(chunk_size=None if tokens else self.chunk_size,
+                                                  chunk_overlap=None if tokens else self.chunk_overlap)
+        else:
+            raise ValueError(f"Unknown chunker '{self.chunker}'. Use 'structure' or 'recursive'.")
         self.supported_extensions = {'.pdf': PyPDFLoader,
                                      '.txt': TextLoader,
-                                     '.docx': Docx2txtLoader
+                                     '.docx': Docx2txtLoader,
+                                     '.csv': FaqCsvLoader
                                      }
 
+        # Extracted PDF/DOCX pages are cached, so re-ingesting or re-chunking never parses them again
+        use_parsed_cache = Config.USE_PARSED_CACHE if use_parsed_cache is None else use_parsed_cache
+        self.parsed_cache = ParsedDocumentCache() if use_parsed_cache else None
+
+    def iter_file(self, file_path, source=None, file_hash=None):
+        """
+        Load a supported file lazily, one page at a time.
+        PDF and DOCX pages come from the parsed document cache when the file did not change.
+        :param file_path: Path of the file to load.
+        :param source: Value stored in the 'source' metadata, defaults to the file name.
+        :param file_hash: Content hash of the file if the caller already computed it.
+        :return: Generator of documents.
+        """
+        source = source or os.path.basename(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower()
+        loader_class = self.supported_extensions[file_ext]
+
+        if self.parsed_cache is not None and file_ext in Config.PARSED_CACHE_EXTENSIONS:
+            pages, file_hash = self.parsed_cache.load(file_path, loader_class, file_hash=file_hash)
+        else:
+            file_hash = file_hash or IndexManifest.hash_file(file_path)
+            pages = loader_class(file_path).lazy_load()
+
+        for doc in pages:
+            doc.metadata['source'] = source  # Add source metadata to each document
+            doc.metadata['file_hash'] = file_hash
+            yield doc
+
+    def load_file(self, file_path, source=None, file_hash=None):
+        """
+        Load a single supported file into documents.
+        :param file_path: Path of the file to load.
+        :param source: Value stored in the 'source' metadata, defaults to the file name.
+        :param file_hash: Content hash of the file if the caller already computed it.
+        :return: List of loaded documents, empty if the file is unsupported or fails to load.
+        """
+        file_name = os.path.basename(file_path)
+        source = source or file_name
+        file_ext = os.path.splitext(file_name)[1].lower()
+
+        if file_ext not in self.supported_extensions:
+            print(f"Unsupported file format: {file_name}. "
+                  f"Skipping this file. Supported formats are: {', '.join(self.supported_extensions.keys())}")
+            return []
+
+        try:
+            loaded_docs = list(self.iter_file(file_path, source=source, file_hash=file_hash))
+            print(f"Loaded '{len(loaded_docs)}' documents from {file_name}.")
+            return loaded_docs
+        except Exception as e:
+            print(f"Error loading {file_name}: {e}. Skipping this file.")
+            return []
+
+    def iter_files(self, folder_path):
+        """
+        Walk a folder recursively and yield the supported files in a stable order.
+        :param folder_path: Root folder of the documents.
+        :return: Generator of (file_path, source) pairs, where source is the path relative to the folder.
+        """
+        for root, dir_names, file_names in os.walk(folder_path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(root, file_name)
+                if os.path.splitext(file_name)[1].lower() not in self.supported_extensions:
+                    print(f"Unsupported file format: {file_name}. Skipping this file. "
+                          f"Supported formats are: {', '.join(self.supported_extensions.keys())}")
+                    continue
+                source = os.path.relpath(file_path, folder_path).replace(os.sep, "/")
+                yield file_path, source
+
     def load_documents(self, folder_path):
         documents = []
 
@@ -35,29 +122,26 @@ class DocumentProcessor:
                   "Please check the path and try again.".format(folder_path))
             return documents
 
-        for file_name in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, file_name)
-            file_ext = os.path.splitext(file_name)[1].lower()
-            if file_ext in self.supported_extensions:
-                try:
-                    loader_class = self.supported_extensions[file_ext]
-                    loader = loader_class(file_path)
-                    loaded_docs = loader.load()
-
-                    for doc in loaded_docs:
-                        doc.metadata['source'] = file_name  # Add source metadata to each document
-
-                    documents.extend(loaded_docs)
-                    print(f"Loaded '{len(loaded_docs)}' documents from {file_name}.")
-                except Exception as e:
-                    print(f"Error loading {file_name}: {e}. Skipping this file.")
-            else:
-                print(f"Unsupported file format: {file_name}. "
-                      f"Skipping this file. Supported formats are: {', '.join(self.supported_extensions.keys())}")
+        for file_path, source in self.iter_files(folder_path):
+            documents.extend(self.load_file(file_path, source=source))
 
         print(f"📊 Total documents loaded: {len(documents)}")
         return documents
 
+    def get_parsed_cache_stats(self, since=None):
+        """
+        :param since: Earlier result of this method, to report only what happened after it.
+        :return: Parsed document cache statistics, or None if the cache is disabled.
+        """
+        if self.parsed_cache is None:
+            return None
+        return self.parsed_cache.stats(since=since)
+
+    def print_parsed_cache_stats(self, since=None):
+        stats = self.get_parsed_cache_stats(since=since)
+        if stats is not None:
+            print_parsed_cache_stats(stats)
+
     def chunk_documents(self, documents):
         """Split the loaded documents into smaller pieces based on the specified chunk size and overlap for processing."""
         if not documents:
@@ -68,6 +152,7 @@ class DocumentProcessor:
               f"and chunk overlap {self.chunk_overlap}. This may take a moment...")
 
         chunks = self.text_splitter.split_documents(documents)
+        self.assign_chunk_ids(chunks)
         print("Chunked documents into {} chunks.".format(len(chunks)))
 
         avg_chunk_length = sum(len(chunk.page_content) for chunk in chunks) / len(chunks) if chunks else 0
@@ -75,6 +160,27 @@ class DocumentProcessor:
 
         return chunks
 
+    @staticmethod
+    def assign_chunk_ids(chunks):
+        """
+        Give every chunk a deterministic ID derived from its source and content.
+        Unchanged chunks keep the same ID across runs, so they never have to be embedded again.
+        :param chunks: Chunks to label, the ID is stored in metadata['chunk_id'].
+        :return: List of chunk IDs in the same order as the chunks.
+        """
+        seen = {}
+        chunk_ids = []
+        for chunk in chunks:
+            source = chunk.metadata.get('source', '')
+            digest = hashlib.sha1(f"{source}\x00{chunk.page_content}".encode("utf-8")).hexdigest()
+            # Identical chunks inside the same source get an occurrence suffix to stay unique
+            occurrence = seen.get(digest, 0)
+            seen[digest] = occurrence + 1
+            chunk_id = digest if occurrence == 0 else f"{digest}-{occurrence}"
+            chunk.metadata['chunk_id'] = chunk_id
+            chunk_ids.append(chunk_id)
+        return chunk_ids
+
 
 if __name__ == "__main__":
     processor = DocumentProcessor()
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from RagFromScratch.src.instrumentation import get_instrumentation
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded embedding store backed by SQLite.
+    Vectors are stored as packed float32 blobs keyed by a SHA-256 digest, and the least recently
+    used entries are evicted once the cache grows past its maximum number of entries.
+    The entry count is tracked in memory and only recounted before an eviction, and the recency of
+    cache hits is written in batches, at most every touch_flush_seconds or touch_flush_entries hits.
+    """
+
+    touch_flush_entries = 1024
+    touch_flush_seconds = 30.0
+
+    def __init__(self, cache_path=None, max_entries=None):
+        from RagFromScratch.src.config import Config
+
+        self.cache_path = cache_path or Config.EMBEDDING_CACHE_PATH
+        self.max_entries = max_entries or Config.EMBEDDING_CACHE_MAX_ENTRIES
+
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+                                        key BLOB PRIMARY KEY,
+                                        vector BLOB NOT NULL,
+                                        last_used REAL NOT NULL
+                                    ) WITHOUT ROWID""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._connection.commit()
+
+        self._count = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # Last hit time of keys whose last_used column has not been updated yet
+        self._touched = {}
+        self._touched_flushed_at = time.monotonic()
+
+    @staticmethod
+    def make_key(namespace, text):
+        return hashlib.sha256(f"{namespace}\x00{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once.
+        :param keys: List of cache keys.
+        :return: Dictionary of key -> vector for the keys that were found.
+        """
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            for key, blob in self._select("key, vector", list(dict.fromkeys(keys))):
+                found[key] = array("f", blob).tolist()
+
+            if found:
+                self._touched.update(dict.fromkeys(found, time.time()))
+                if (len(self._touched) >= self.touch_flush_entries
+                        or time.monotonic() - self._touched_flushed_at >= self.touch_flush_seconds):
+                    self._flush_touched()
+                    self._connection.commit()
+        return found
+
+    def _select(self, columns, keys):
+        """Rows of the given keys, queried in batches that stay below SQLite's default limit on bound parameters."""
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            yield from self._connection.execute(
+                f"SELECT {columns} FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+
+    def _flush_touched(self):
+        """Write the buffered hit times to the last_used column, the caller commits."""
+        if self._touched:
+            self._connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                         [(last_used, key) for key, last_used in self._touched.items()])
+            self._touched.clear()
+        self._touched_flushed_at = time.monotonic()
+
+    def put_many(self, items):
+        """
+        Store several vectors and evict the oldest entries if the cache is over its size bound.
+        :param items: Iterable of (key, vector) pairs.
+        :return:
+        """
+        now = time.time()
+        rows = {key: (key, array("f", vector).tobytes(), now) for key, vector in items}
+        if not rows:
+            return
+
+        with self._lock:
+            existing = sum(1 for _ in self._select("key", list(rows)))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", list(rows.values()))
+            for key in rows:
+                self._touched.pop(key, None)
+            self._count += len(rows) - existing
+            if self._count > self.max_entries:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        # Other processes may share the file, so the tracked count is checked before anything is deleted
+        self._count = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._count <= self.max_entries:
+            return
+
+        # Evict down to 90% of the bound so eviction does not run on every insert
+        self._flush_touched()
+        excess = self._count - int(self.max_entries * 0.9)
+        deleted = self._connection.execute("""DELETE FROM embeddings WHERE key IN (
+                                                  SELECT key FROM embeddings ORDER BY last_used LIMIT ?)""",
+                                           (excess,)).rowcount
+        self._count -= deleted
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM embeddings")
+            self._connection.commit()
+            self._count = 0
+            self._touched.clear()
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._connection.commit()
+            self._connection.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves vectors from an EmbeddingCache and only runs the
+    underlying model on cache misses. Entries are keyed by model name, normalize flag and text.
+    """
+
+    def __init__(self, embeddings, cache=None, model_name=None, normalize=None):
+        self.embeddings = embeddings
+        self.cache = cache or EmbeddingCache()
+
+        model_name = model_name or getattr(embeddings, "model_name", type(embeddings).__name__)
+        if normalize is None:
+            normalize = bool(getattr(embeddings, "encode_kwargs", {}).get("normalize_embeddings", False))
+        self.namespace = f"{model_name}|normalize={normalize}"
+
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _embed(self, texts, embed_function):
+        keys = [EmbeddingCache.make_key(self.namespace, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Embed each distinct missing text only once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            with get_instrumentation().stage("embed") as stage:
+                vectors = embed_function(list(missing.values()))
+                stage.set("texts", len(missing))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed.items())
+            cached.update(computed)
+
+        with self._stats_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        get_instrumentation().cache_event("embedding", hits=len(texts) - len(missing), misses=len(missing))
+
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def stats(self):
+        """
+        Hit/miss counters of this wrapper since it was created.
+        :return: Dictionary with hits, misses, hit rate and number of stored entries.
+        """
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"hits": hits,
+                "misses": misses,
+                "hit_rate": hits / total if total else 0.0,
+                "entries": len(self.cache)}
@@ -0,0 +1,275 @@
+import csv
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+from RagFromScratch.src.answer_cache import normalize_question
+from RagFromScratch.src.instrumentation import get_instrumentation
+
+QUESTION_COLUMNS = ("prompt", "question", "query", "q")
+ANSWER_COLUMNS = ("response", "answer", "a")
+
+# Words that flip or change the meaning of a question while barely changing its string or embedding
+NEGATIONS = frozenset(("not", "no", "never", "without", "cannot", "can't", "cant", "don't", "dont", "doesn't",
+                       "doesnt", "isn't", "isnt", "aren't", "arent", "won't", "wont", "shouldn't", "shouldnt",
+                       "avoid", "except", "nor", "none"))
+_WORD = re.compile(r"[\w']+")
+
+
+def question_words(question):
+    return set(_WORD.findall(normalize_question(question)))
+
+
+def conflicting_words(question, prompt):
+    """
+    True if the words only one of the two questions has include a negation or a number, e.g.
+    "What should I not do..." vs "What should I do..." or "the 60/30/10 rule" vs "the 50/30/20 rule".
+    """
+    differing = question_words(question) ^ question_words(prompt)
+    return any(word in NEGATIONS or any(character.isdigit() for character in word) for word in differing)
+
+
+class FaqCsvLoader(BaseLoader):
+    """
+    Load a CSV of question/answer pairs (e.g. prompt,response) as one Document per row.
+    The question and answer are kept in the faq_prompt / faq_response metadata, so the same
+    documents feed both the vector store and the FaqIndex. CSVs without recognizable question and
+    answer columns are loaded as plain rows of "column: value" lines.
+    """
+
+    def __init__(self, file_path, encoding="utf-8"):
+        self.file_path = file_path
+        self.encoding = encoding
+
+    @staticmethod
+    def _find_column(fieldnames, candidates):
+        by_name = {name.strip().lower(): name for name in fieldnames or []}
+        return next((by_name[candidate] for candidate in candidates if candidate in by_name), None)
+
+    def lazy_load(self):
+        with open(self.file_path, "r", encoding=self.encoding, newline="") as csv_file:
+            reader = csv.DictReader(csv_file)
+            question_column = self._find_column(reader.fieldnames, QUESTION_COLUMNS)
+            answer_column = self._find_column(reader.fieldnames, ANSWER_COLUMNS)
+
+            for row_number, row in enumerate(reader):
+                if question_column and answer_column:
+                    prompt = (row.get(question_column) or "").strip()
+                    response = (row.get(answer_column) or "").strip()
+                    if not prompt or not response:
+                        continue
+                    yield Document(page_content=f"Question: {prompt}\nAnswer: {response}",
+                                   metadata={"row": row_number, "faq_prompt": prompt, "faq_response": response})
+                else:
+                    content = "\n".join(f"{column}: {value}" for column, value in row.items() if column)
+                    yield Document(page_content=content, metadata={"row": row_number})
+
+
+class FaqIndex:
+    """
+    Known question -> stored answer lookup that lets the RAG chain skip retrieval and the LLM.
+    A question matches in three steps, cheapest first:
+    - exact: same normalized question (case, whitespace and trailing punctuation ignored)
+    - fuzzy (optional): RapidFuzz token-sort ratio of at least fuzzy_threshold (typos, reordered
+      words). A high ratio alone does not tell "What is compound interest?" from "What is not
+      compound interest?", so a fuzzy candidate is only accepted with the same set of words or an
+      embedding similarity of at least similarity_threshold.
+    - semantic: cosine similarity of the question embeddings of at least similarity_threshold
+    Fuzzy and semantic matches are rejected when the differing words include a negation or a number.
+    The query embedding goes through the embedding cache, so a miss does not embed the question a
+    second time for retrieval.
+    """
+
+    def __init__(self, embeddings=None, fuzzy_threshold=None, similarity_threshold=None, fuzzy_match=None):
+        from RagFromScratch.src.config import Config
+
+        self.embeddings = embeddings
+        self.fuzzy_match = Config.FAQ_FUZZY_MATCH if fuzzy_match is None else fuzzy_match
+        self.fuzzy_threshold = fuzzy_threshold or Config.FAQ_FUZZY_THRESHOLD
+        self.similarity_threshold = similarity_threshold or Config.FAQ_SIMILARITY_THRESHOLD
+
+        self.entries = []
+        self._exact = {}
+        self._choices = []
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.shortcut_seconds = 0.0
+        self.full_seconds = 0.0
+        self.full_answers = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, prompt, response, source=None):
+        key = normalize_question(prompt)
+        if not key or key in self._exact:
+            return
+        with self._lock:
+            self._exact[key] = len(self.entries)
+            self._choices.append(key)
+            self.entries.append({"prompt": prompt, "response": response, "source": source})
+            self._vectors = None
+
+    def add_documents(self, documents):
+        """Add the FAQ rows among documents, as loaded by FaqCsvLoader."""
+        for doc in documents:
+            if "faq_prompt" in doc.metadata:
+                self.add(doc.metadata["faq_prompt"], doc.metadata["faq_response"], doc.metadata.get("source"))
+
+    @classmethod
+    def from_sources(cls, processor, folder_path=None, extra_files=(), embeddings=None):
+        """
+        Build the index from the FAQ CSVs of the data folder plus extra CSV files.
+        :param processor: DocumentProcessor used to load the CSVs.
+        :param folder_path: Data folder, its .csv files are indexed.
+        :param extra_files: Additional CSV paths, e.g. Config.FAQ_FILES.
+        :param embeddings: Embeddings for the semantic step, None disables it.
+        :return: FaqIndex, possibly empty.
+        """
+        index = cls(embeddings=embeddings)
+        paths = []
+        if folder_path and os.path.exists(folder_path):
+            paths.extend((file_path, source) for file_path, source in processor.iter_files(folder_path)
+                         if file_path.lower().endswith(".csv"))
+        paths.extend((file_path, os.path.basename(file_path)) for file_path in extra_files
+                     if os.path.exists(file_path))
+
+        for file_path, source in paths:
+            index.add_documents(processor.load_file(file_path, source=source))
+        print(f"❔ FAQ index: {len(index)} questions from {len(paths)} CSV files.")
+        return index
+
+    def _ensure_vectors(self):
+        if self._vectors is None and self.embeddings is not None and self.entries:
+            vectors = np.asarray(self.embeddings.embed_documents([entry["prompt"] for entry in self.entries]),
+                                 dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            self._vectors = vectors
+        return self._vectors
+
+    def _fuzzy_match(self, key):
+        from rapidfuzz import fuzz, process
+
+        match = process.extractOne(key, self._choices, scorer=fuzz.token_sort_ratio,
+                                   score_cutoff=self.fuzzy_threshold)
+        return (match[2], match[1] / 100) if match else None
+
+    def _query_vector(self, question):
+        if self._ensure_vectors() is None:
+            return None
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return query / max(float(np.linalg.norm(query)), 1e-12)
+
+    def _confirmed_fuzzy_match(self, question, key, query_vector):
+        """Fuzzy candidate, kept only with the same words or a high enough embedding similarity."""
+        found = self._fuzzy_match(key)
+        if found is None or conflicting_words(question, self.entries[found[0]]["prompt"]):
+            return None
+        if question_words(question) == question_words(self.entries[found[0]]["prompt"]):
+            return found
+        if query_vector is not None and float(self._vectors[found[0]] @ query_vector) >= self.similarity_threshold:
+            return found
+        return None
+
+    def _semantic_match(self, question, query_vector):
+        if query_vector is None:
+            return None
+        similarities = self._vectors @ query_vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        if conflicting_words(question, self.entries[best]["prompt"]):
+            return None
+        return best, float(similarities[best])
+
+    def match(self, question):
+        """
+        Look up a stored answer for a question.
+        :param question: The user question.
+        :return: {"prompt", "response", "source", "method", "score"} or None when no FAQ matches.
+        """
+        if not self.entries:
+            return None
+
+        with get_instrumentation().stage("faq_lookup") as stage:
+            key = normalize_question(question)
+            method = "exact"
+            found = (self._exact[key], 1.0) if key in self._exact else None
+            query_vector = None if found else self._query_vector(question)
+            if found is None and self.fuzzy_match:
+                method = "fuzzy"
+                found = self._confirmed_fuzzy_match(question, key, query_vector)
+            if found is None:
+                method = "semantic"
+                found = self._semantic_match(question, query_vector)
+            stage.set("method", method if found else "miss")
+
+        with self._lock:
+            if found is None:
+                self.misses += 1
+            else:
+                setattr(self, f"{method}_hits", getattr(self, f"{method}_hits") + 1)
+        get_instrumentation().cache_event("faq", hits=int(found is not None), misses=int(found is None))
+
+        if found is None:
+            return None
+        row, score = found
+        return {**self.entries[row], "method": method, "score": score}
+
+    def record_latency(self, seconds, shortcut):
+        """Record how long an answer took, to estimate the time saved by the FAQ shortcut."""
+        with self._lock:
+            if shortcut:
+                self.shortcut_seconds += seconds
+            else:
+                self.full_seconds += seconds
+                self.full_answers += 1
+
+    def stats(self):
+        """
+        Shortcut statistics. The saved time is estimated as hits * (average answer time without the
+        shortcut - average answer time with it).
+        :return: Dictionary with hits per method, misses, hit rate, average latencies and saved seconds.
+        """
+        with self._lock:
+            hits = self.exact_hits + self.fuzzy_hits + self.semantic_hits
+            lookups = hits + self.misses
+            average_shortcut = self.shortcut_seconds / hits if hits else 0.0
+            average_full = self.full_seconds / self.full_answers if self.full_answers else 0.0
+            return {"entries": len(self.entries),
+                    "exact_hits": self.exact_hits,
+                    "fuzzy_hits": self.fuzzy_hits,
+                    "semantic_hits": self.semantic_hits,
+                    "misses": self.misses,
+                    "hit_rate": hits / lookups if lookups else 0.0,
+                    "average_shortcut_ms": average_shortcut * 1000,
+                    "average_full_ms": average_full * 1000,
+                    "saved_seconds": hits * max(0.0, average_full - average_shortcut)}
+
+
+def faq_document(match):
+    """Document standing for the FAQ entry an answer came from, in place of retrieved chunks."""
+    return Document(page_content=f"Question: {match['prompt']}\nAnswer: {match['response']}",
+                    metadata={"source": match.get("source"), "faq_prompt": match["prompt"],
+                              "faq_method": match["method"], "faq_score": match["score"]})
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.config import Config
+    from RagFromScratch.src.document_processor import DocumentProcessor
+
+    faq_index = FaqIndex.from_sources(DocumentProcessor(), Config.DATA_FOLDER, Config.FAQ_FILES)
+    for test_question in ("what is compound interest", "How can I improve my credit scor?"):
+        started = time.perf_counter()
+        print(test_question, "->", faq_index.match(test_question),
+              f"({(time.perf_counter() - started) * 1000:.2f} ms)")
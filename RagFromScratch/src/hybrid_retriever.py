@@ -0,0 +1,88 @@
+from typing import Any
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from RagFromScratch.src.instrumentation import get_instrumentation
+
+
+def chunk_id_of(doc):
+    return getattr(doc, "id", None) or doc.metadata.get("chunk_id")
+
+
+def reciprocal_rank_fusion(dense_docs, lexical_chunk_ids, rrf_k):
+    """
+    Fuse a dense and a lexical ranking: each chunk scores sum(1 / (rrf_k + rank)) over the rankings it appears in.
+    :param dense_docs: Documents of the vector search, best first.
+    :param lexical_chunk_ids: Chunk IDs of the BM25 search, best first.
+    :param rrf_k: Reciprocal rank fusion constant.
+    :return: Tuple of (chunk_id -> fused score, chunk_id -> Document for the chunks of the dense ranking).
+    """
+    scores = {}
+    documents = {}
+    for rank, doc in enumerate(dense_docs):
+        chunk_id = chunk_id_of(doc) or doc.page_content
+        documents[chunk_id] = doc
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    for rank, chunk_id in enumerate(lexical_chunk_ids):
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return scores, documents
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing dense vector search with BM25 lexical search by reciprocal rank fusion.
+    Both searches over-fetch `fetch_k` candidates and each chunk scores sum(1 / (rrf_k + rank))
+    over the rankings it appears in, so exact-term matches missed by the embeddings still surface.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any
+    lexical_index: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def search_with_scores(self, query, k=None):
+        """
+        Fused search keeping the RRF scores, e.g. for a reranking stage.
+        :param query: Query text.
+        :param k: Number of results, defaults to self.k.
+        :return: List of (document, rrf_score) pairs, best first.
+        """
+        k = k or self.k
+        dense_docs = self.vector_store.similarity_search(query, k=max(k, self.fetch_k))
+        return self.fuse(query, dense_docs, k)
+
+    def fuse(self, query, dense_docs, k=None):
+        """
+        Fuse already retrieved dense results with the BM25 results of the query, e.g. after a
+        batched vector search of many queries.
+        :param query: Query text.
+        :param dense_docs: Documents of the vector search, best first, at least fetch_k of them.
+        :param k: Number of results, defaults to self.k.
+        :return: List of (document, rrf_score) pairs, best first.
+        """
+        k = k or self.k
+        lexical_hits = []
+        if self.lexical_index is not None:
+            with get_instrumentation().stage("lexical_search") as stage:
+                lexical_hits = self.lexical_index.search(query, k=max(k, self.fetch_k))
+                stage.set("candidates", len(lexical_hits))
+
+        scores, documents = reciprocal_rank_fusion(dense_docs, [chunk_id for chunk_id, _ in lexical_hits], self.rrf_k)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+
+        # Chunks only found lexically are fetched from the store by ID
+        missing = [chunk_id for chunk_id in ranked if chunk_id not in documents]
+        if missing:
+            for doc in self.vector_store.get_by_ids(missing):
+                documents[chunk_id_of(doc)] = doc
+
+        return [(documents[chunk_id], scores[chunk_id]) for chunk_id in ranked if chunk_id in documents]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return [doc for doc, _ in self.search_with_scores(query)]
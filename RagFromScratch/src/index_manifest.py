@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+
+
+class IndexManifest:
+    """
+    Keeps track of what is currently indexed in the vector store.
+    For every source file it records the content hash of the file and the IDs of the chunks
+    that were embedded from it, so the vector store can be synced incrementally.
+    """
+
+    VERSION = 1
+
+    def __init__(self, manifest_path=None):
+        from RagFromScratch.src.config import Config
+
+        self.manifest_path = manifest_path or Config.MANIFEST_PATH
+        self.files = {}
+        self.load()
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def load(self):
+        """
+        Load the manifest from disk. A missing manifest is treated as an empty index.
+        :return: Mapping of source -> {"hash": ..., "chunk_ids": [...]}
+        """
+        if not self.exists():
+            self.files = {}
+            return self.files
+
+        with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+            data = json.load(manifest_file)
+
+        self.files = data.get("files", {})
+        return self.files
+
+    def save(self):
+        """
+        Write the manifest atomically so an interrupted sync never leaves a half-written file behind.
+        :return:
+        """
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump({"version": self.VERSION, "files": self.files}, manifest_file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def hash_file(file_path, block_size=1 << 20):
+        """
+        Compute the SHA-256 of a file's content, reading it in blocks.
+        :param file_path: Path of the file to hash.
+        :param block_size: Number of bytes read per block.
+        :return: Hex digest of the file content.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def diff(self, current_hashes):
+        """
+        Compare the files currently on disk with the manifest.
+        :param current_hashes: Mapping of source -> content hash for the files on disk.
+        :return: Tuple of (added, changed, removed) source lists.
+        """
+        added = sorted(source for source in current_hashes if source not in self.files)
+        changed = sorted(source for source, file_hash in current_hashes.items()
+                         if source in self.files and self.files[source]["hash"] != file_hash)
+        removed = sorted(source for source in self.files if source not in current_hashes)
+        return added, changed, removed
+
+    def chunk_ids(self, source):
+        entry = self.files.get(source)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def update(self, source, file_hash, chunk_ids):
+        self.files[source] = {"hash": file_hash, "chunk_ids": list(chunk_ids)}
+
+    def remove(self, source):
+        self.files.pop(source, None)
+
+    def reset_from_chunks(self, chunks):
+        """
+        Rebuild the manifest from a full set of chunks, as produced by a complete rebuild.
+        :param chunks: Chunks carrying 'source', 'file_hash' and 'chunk_id' metadata.
+        :return:
+        """
+        self.files = {}
+        for chunk in chunks:
+            source = chunk.metadata.get("source")
+            entry = self.files.setdefault(source, {"hash": chunk.metadata.get("file_hash"), "chunk_ids": []})
+            entry["chunk_ids"].append(chunk.metadata["chunk_id"])
@@ -0,0 +1,180 @@
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from RagFromScratch.src.config import Config
+from RagFromScratch.src.document_processor import DocumentProcessor
+
+_worker_processor = None
+_END_OF_STREAM = object()
+
+
+def _init_worker(chunk_size, chunk_overlap, chunker, use_parsed_cache):
+    """Create one DocumentProcessor per worker process instead of one per file."""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunker=chunker,
+                                          use_parsed_cache=use_parsed_cache)
+
+
+def _load_and_chunk(file_path, source):
+    """Load and chunk a single file inside a worker process."""
+    documents = _worker_processor.load_file(file_path, source=source)
+    if not documents:
+        return source, []
+    return source, _worker_processor.text_splitter.split_documents(documents)
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion pipeline: files are parsed and chunked in a process pool, and the chunks
+    flow in fixed-size batches through bounded queues to an embedding stage and a writer stage.
+    Only a bounded number of files and batches are in flight at any time, so memory stays flat
+    regardless of the corpus size.
+    """
+
+    def __init__(self, processor=None, max_workers=None, batch_size=None, queue_size=None):
+        self.processor = processor or DocumentProcessor()
+        self.max_workers = max_workers or Config.INGEST_WORKERS
+        self.batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        self.queue_size = queue_size or Config.INGEST_QUEUE_SIZE
+
+    def iter_chunks(self, folder_path):
+        """
+        Load and chunk every supported file below the folder in parallel.
+        Files are submitted lazily so at most two files per worker are pending at once.
+        :param folder_path: Root folder of the documents.
+        :return: Generator of (source, chunks) pairs in completion order.
+        """
+        max_pending = self.max_workers * 2
+        files = self.processor.iter_files(folder_path)
+
+        with ProcessPoolExecutor(max_workers=self.max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.processor.chunk_size, self.processor.chunk_overlap,
+                                           self.processor.chunker,
+                                           self.processor.parsed_cache is not None)) as executor:
+            pending = set()
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_pending:
+                    next_file = next(files, None)
+                    if next_file is None:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(_load_and_chunk, *next_file))
+
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, chunks = future.result()
+                    DocumentProcessor.assign_chunk_ids(chunks)
+                    yield source, chunks
+
+    def iter_batches(self, folder_path):
+        """
+        Regroup the chunk stream into fixed-size batches.
+        :param folder_path: Root folder of the documents.
+        :return: Generator of chunk lists of at most batch_size chunks.
+        """
+        batch = []
+        for _, chunks in self.iter_chunks(folder_path):
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def run(self, folder_path, embeddings, write_batch):
+        """
+        Run the pipeline: chunk batches -> embedding thread -> writer (the calling thread).
+        Each stage is connected by a bounded queue, so a slow stage applies backpressure upstream.
+        :param folder_path: Root folder of the documents.
+        :param embeddings: Embeddings used to embed each batch of chunks.
+        :param write_batch: Callable receiving (chunks, vectors) for every embedded batch.
+        :return: Dictionary with the number of batches and chunks written.
+        """
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        vector_queue = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        stop = threading.Event()
+
+        def put(target_queue, item):
+            while not stop.is_set():
+                try:
+                    target_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(source_queue):
+            # Polls, so a stage waiting for input exits when the writer failed and no sentinel will come
+            while not stop.is_set():
+                try:
+                    return source_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END_OF_STREAM
+
+        def produce():
+            try:
+                for batch in self.iter_batches(folder_path):
+                    if not put(chunk_queue, batch):
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(chunk_queue, _END_OF_STREAM)
+
+        def embed():
+            try:
+                while True:
+                    batch = get(chunk_queue)
+                    if batch is _END_OF_STREAM:
+                        break
+                    vectors = embeddings.embed_documents([chunk.page_content for chunk in batch])
+                    if not put(vector_queue, (batch, vectors)):
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(vector_queue, _END_OF_STREAM)
+
+        producer = threading.Thread(target=produce, name="ingest-loader", daemon=True)
+        embedder = threading.Thread(target=embed, name="ingest-embedder", daemon=True)
+        producer.start()
+        embedder.start()
+
+        stats = {"batches": 0, "chunks": 0}
+        try:
+            while True:
+                item = vector_queue.get()
+                if item is _END_OF_STREAM:
+                    break
+                batch, vectors = item
+                write_batch(batch, vectors)
+                stats["batches"] += 1
+                stats["chunks"] += len(batch)
+                print(f"   - Indexed batch {stats['batches']} ({stats['chunks']} chunks so far)")
+        finally:
+            stop.set()
+            producer.join()
+            embedder.join()
+
+        if errors:
+            raise errors[0]
+        return stats
+
+
+if __name__ == "__main__":
+    pipeline = IngestionPipeline()
+    total = 0
+    for source_name, file_chunks in pipeline.iter_chunks(Config.DATA_FOLDER):
+        total += len(file_chunks)
+        print(f"{source_name}: {len(file_chunks)} chunks")
+    print(f"📊 Total chunks: {total}")
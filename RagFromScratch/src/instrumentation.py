@@ -0,0 +1,217 @@
+import contextvars
+import threading
+import time
+
+# Per-query trace collecting the stage timings of the query running in the current context
+_current_trace = contextvars.ContextVar("rag_query_trace", default=None)
+
+
+class _NullStage:
+    """Stage returned when nothing is recorded: entering, exiting and setting attributes do nothing."""
+
+    enabled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """One timed stage of a query, reported to the active trace, the metrics and the tracer."""
+
+    enabled = True
+    __slots__ = ("instrumentation", "name", "trace", "attributes", "started", "_span_context", "_span")
+
+    def __init__(self, instrumentation, name, trace):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.trace = trace
+        self.attributes = {}
+        self.started = 0.0
+        self._span_context = None
+        self._span = None
+
+    def __enter__(self):
+        if self.instrumentation.tracer is not None:
+            self._span_context = self.instrumentation.tracer.start_as_current_span(f"rag.{self.name}")
+            self._span = self._span_context.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def set(self, key, value):
+        self.attributes[key] = value
+        if self._span is not None:
+            self._span.set_attribute(key, value)
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.started
+        if self.trace is not None:
+            self.trace.add_stage(self.name, seconds, self.attributes)
+        self.instrumentation.observe(self.name, seconds, self.attributes, failed=exc_type is not None)
+        if self._span_context is not None:
+            self._span_context.__exit__(exc_type, exc, traceback)
+        return False
+
+
+class QueryTrace:
+    """Stage timings and cache events of a single query, for the debug-mode breakdown."""
+
+    def __init__(self):
+        self.stages = []
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds, attributes):
+        with self._lock:
+            self.stages.append((name, seconds, dict(attributes)))
+
+    def add_cache_event(self, cache, hits, misses):
+        with self._lock:
+            previous_hits, previous_misses = self.caches.get(cache, (0, 0))
+            self.caches[cache] = (previous_hits + hits, previous_misses + misses)
+
+    def breakdown(self):
+        """
+        :return: {"stages": [{"stage", "ms", **attributes}, ...], "caches": {name: {"hits", "misses"}}}
+        """
+        with self._lock:
+            return {"stages": [{"stage": name, "ms": seconds * 1000, **attributes}
+                               for name, seconds, attributes in self.stages],
+                    "caches": {cache: {"hits": hits, "misses": misses}
+                               for cache, (hits, misses) in self.caches.items()}}
+
+
+class Instrumentation:
+    """
+    Hooks around the RAG stages (embedding, search, reranking, context packing, prompt, LLM call).
+    By default nothing is exported and stage() returns a shared no-op object, so the hot path pays
+    one context-variable lookup. Exporters are enabled per Config.INSTRUMENTATION:
+    - "prometheus": duration histograms per stage, candidate counts, token and cache counters
+    - "otel": one OpenTelemetry span per stage, with the stage attributes
+    Independently, a query run inside trace() collects its own per-stage breakdown.
+    """
+
+    DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, prometheus=False, opentelemetry=False):
+        self.registry = None
+        self.tracer = None
+        if prometheus:
+            self._setup_prometheus()
+        if opentelemetry:
+            self._setup_opentelemetry()
+        self.exporting = self.registry is not None or self.tracer is not None
+
+    def _setup_prometheus(self):
+        from prometheus_client import CollectorRegistry, Counter, Histogram
+
+        self.registry = CollectorRegistry()
+        self.stage_duration = Histogram("rag_stage_duration_seconds", "Duration of each RAG stage",
+                                        ["stage"], buckets=self.DURATION_BUCKETS, registry=self.registry)
+        self.stage_errors = Counter("rag_stage_errors_total", "Stages that raised an exception",
+                                    ["stage"], registry=self.registry)
+        self.candidates = Histogram("rag_stage_candidates", "Documents handled by a retrieval stage",
+                                    ["stage"], buckets=(1, 2, 4, 8, 16, 32, 64, 128), registry=self.registry)
+        self.tokens = Counter("rag_llm_tokens_total", "Prompt and completion tokens of the LLM calls",
+                              ["kind"], registry=self.registry)
+        self.cache_requests = Counter("rag_cache_requests_total", "Cache lookups by cache and result",
+                                      ["cache", "result"], registry=self.registry)
+
+    def _setup_opentelemetry(self):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            print("⚠️ opentelemetry-api is not installed, tracing spans are disabled.")
+            return
+        self.tracer = trace.get_tracer("rag_from_scratch")
+
+    def stage(self, name):
+        """
+        Time a stage: `with instrumentation.stage("vector_search") as stage: ... stage.set("candidates", n)`.
+        :param name: Stage name.
+        :return: A Stage, or the shared no-op stage when nothing would record it.
+        """
+        trace = _current_trace.get()
+        if trace is None and not self.exporting:
+            return NULL_STAGE
+        return Stage(self, name, trace)
+
+    def cache_event(self, cache, hits=0, misses=0):
+        """Count cache hits and misses, e.g. cache_event("embedding", hits=3, misses=1)."""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_cache_event(cache, hits, misses)
+        if self.registry is not None:
+            if hits:
+                self.cache_requests.labels(cache=cache, result="hit").inc(hits)
+            if misses:
+                self.cache_requests.labels(cache=cache, result="miss").inc(misses)
+
+    def observe(self, name, seconds, attributes, failed=False):
+        if self.registry is None:
+            return
+        self.stage_duration.labels(stage=name).observe(seconds)
+        if failed:
+            self.stage_errors.labels(stage=name).inc()
+        if "candidates" in attributes:
+            self.candidates.labels(stage=name).observe(attributes["candidates"])
+        if "prompt_tokens" in attributes:
+            self.tokens.labels(kind="prompt").inc(attributes["prompt_tokens"])
+        if "completion_tokens" in attributes:
+            self.tokens.labels(kind="completion").inc(attributes["completion_tokens"])
+
+    def new_trace_context(self):
+        """
+        Fresh context with a QueryTrace installed. Running every step of a query through
+        context.run() attributes all its stages to the trace, including the ones LangChain runs on
+        executor threads, without leaking the trace into the caller's context.
+        :return: Tuple of (contextvars.Context, QueryTrace).
+        """
+        trace = QueryTrace()
+        context = contextvars.copy_context()
+        context.run(_current_trace.set, trace)
+        return context, trace
+
+    def metrics_text(self):
+        """Prometheus text exposition of the metrics, or None when Prometheus export is disabled."""
+        if self.registry is None:
+            return None
+        from prometheus_client import generate_latest
+
+        return generate_latest(self.registry)
+
+    def start_metrics_server(self, port):
+        if self.registry is None:
+            return
+        from prometheus_client import start_http_server
+
+        start_http_server(port, registry=self.registry)
+        print(f"📊 Prometheus metrics on http://0.0.0.0:{port}/metrics")
+
+
+_instrumentation = None
+_instrumentation_lock = threading.Lock()
+
+
+def get_instrumentation():
+    """Process-wide Instrumentation configured from Config.INSTRUMENTATION, created on first use."""
+    global _instrumentation
+    if _instrumentation is None:
+        with _instrumentation_lock:
+            if _instrumentation is None:
+                from RagFromScratch.src.config import Config
+
+                exporters = {name.strip() for name in Config.INSTRUMENTATION.split(",") if name.strip()}
+                _instrumentation = Instrumentation(prometheus="prometheus" in exporters,
+                                                   opentelemetry="otel" in exporters)
+                if Config.METRICS_PORT:
+                    _instrumentation.start_metrics_server(Config.METRICS_PORT)
+    return _instrumentation
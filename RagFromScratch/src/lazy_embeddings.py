@@ -0,0 +1,38 @@
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+from RagFromScratch.src.startup import startup_timer
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that creates the underlying model on the first embed call.
+    Startups that never embed anything (cached queries, warm-worker clients, status commands)
+    then skip the model import and load entirely.
+    """
+
+    def __init__(self, factory, name="embedding model"):
+        self._factory = factory
+        self._name = name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    with startup_timer.phase(f"load {self._name}"):
+                        self._model = self._factory()
+        return self._model
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
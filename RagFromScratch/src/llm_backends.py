@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Stub latency profiles: time to first token and generation speed of typical deployments
+STUB_PROFILES = {"instant": {"latency_ms": 0.0, "tokens_per_second": 0.0},
+                 "fast": {"latency_ms": 50.0, "tokens_per_second": 0.0},
+                 "hosted": {"latency_ms": 400.0, "tokens_per_second": 150.0},
+                 "local-cpu": {"latency_ms": 1500.0, "tokens_per_second": 15.0}}
+
+
+def _prompt_text(messages):
+    return "".join(str(message.content) for message in messages)
+
+
+def _usage(input_tokens, output_tokens):
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens}
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for load tests and benchmarks: answers after a fixed latency
+    (time to first token) and then produces answer_tokens tokens at tokens_per_second, with a reply
+    derived from the prompt, so runs are reproducible and free of API calls and rate limits.
+    A tokens_per_second of 0 returns the whole answer at once. Token counts are reported in the
+    usage metadata, so the stage instrumentation sees the same fields as with a real model.
+    """
+
+    latency_ms: float = 50.0
+    tokens_per_second: float = 0.0
+    answer_tokens: int = 12
+
+    @classmethod
+    def from_profile(cls, profile, **overrides):
+        """
+        :param profile: Name of a STUB_PROFILES entry.
+        :param overrides: Field values replacing the profile's, None values are ignored.
+        :return: StubChatModel.
+        """
+        if profile not in STUB_PROFILES:
+            raise ValueError(f"Unknown stub LLM profile '{profile}'. Use one of: {', '.join(STUB_PROFILES)}.")
+        settings = {**STUB_PROFILES[profile], **{key: value for key, value in overrides.items() if value is not None}}
+        return cls(**settings)
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def reply_tokens(self, prompt):
+        """Tokens of the deterministic reply to a prompt, each but the first with its leading space."""
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        tokens = f"Stub answer {digest} from a prompt of {len(prompt)} characters.".split()
+        tokens.extend(f"token{index}" for index in range(len(tokens), self.answer_tokens))
+        return [token if index == 0 else f" {token}" for index, token in enumerate(tokens)]
+
+    def _token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _chunks(self, prompt):
+        tokens = self.reply_tokens(prompt)
+        usage = _usage(max(1, len(prompt) // 4), len(tokens))
+        for index, token in enumerate(tokens):
+            # The last chunk carries the usage, as streaming providers report it at the end
+            last = index == len(tokens) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage if last else None))
+
+    def _result(self, prompt):
+        tokens = self.reply_tokens(prompt)
+        message = AIMessage(content="".join(tokens), usage_metadata=_usage(max(1, len(prompt) // 4), len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = _prompt_text(messages)
+        time.sleep(self.latency_ms / 1000 + self._token_delay() * len(self.reply_tokens(prompt)))
+        return self._result(prompt)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = _prompt_text(messages)
+        await asyncio.sleep(self.latency_ms / 1000 + self._token_delay() * len(self.reply_tokens(prompt)))
+        return self._result(prompt)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        for index, chunk in enumerate(self._chunks(_prompt_text(messages))):
+            if index:
+                time.sleep(self._token_delay())
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        for index, chunk in enumerate(self._chunks(_prompt_text(messages))):
+            if index:
+                await asyncio.sleep(self._token_delay())
+            yield chunk
+
+
+class OllamaChatModel(BaseChatModel):
+    """
+    Chat model talking to an Ollama-compatible HTTP server (POST /api/chat), e.g. a local Ollama,
+    or the fake server of benchmarks/stubs.py for offline tests. Responses are streamed as
+    newline-delimited JSON, the token counts of the final message become the usage metadata.
+    """
+
+    base_url: str = "http://localhost:11434"
+    model: str = "llama3.2"
+    temperature: float = 0.1
+    timeout: float = 120.0
+
+    @property
+    def _llm_type(self):
+        return "ollama"
+
+    @staticmethod
+    def _role(message):
+        return {"human": "user", "ai": "assistant"}.get(message.type, message.type)
+
+    def _payload(self, messages, stream, stop):
+        options = {"temperature": self.temperature}
+        if stop:
+            options["stop"] = stop
+        return {"model": self.model, "stream": stream, "options": options,
+                "messages": [{"role": self._role(message), "content": str(message.content)} for message in messages]}
+
+    @staticmethod
+    def _chunk(data):
+        content = data.get("message", {}).get("content", "")
+        usage = None
+        if data.get("done"):
+            usage = _usage(data.get("prompt_eval_count", 0), data.get("eval_count", 0))
+        return ChatGenerationChunk(message=AIMessageChunk(content=content, usage_metadata=usage))
+
+    @staticmethod
+    def _result(data):
+        message = AIMessage(content=data.get("message", {}).get("content", ""),
+                            usage_metadata=_usage(data.get("prompt_eval_count", 0), data.get("eval_count", 0)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        import httpx
+
+        response = httpx.post(f"{self.base_url}/api/chat", json=self._payload(messages, False, stop),
+                              timeout=self.timeout)
+        response.raise_for_status()
+        return self._result(response.json())
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        import httpx
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.post(f"{self.base_url}/api/chat", json=self._payload(messages, False, stop))
+            response.raise_for_status()
+            return self._result(response.json())
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        import httpx
+
+        with httpx.stream("POST", f"{self.base_url}/api/chat", json=self._payload(messages, True, stop),
+                          timeout=self.timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield self._chunk(json.loads(line))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        import httpx
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with client.stream("POST", f"{self.base_url}/api/chat",
+                                     json=self._payload(messages, True, stop)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield self._chunk(json.loads(line))
+
+
+def _create_gemini():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    from RagFromScratch.src.config import Config
+
+    return ChatGoogleGenerativeAI(model=Config.CHAT_MODEL,
+                                  google_api_key=Config.GOOGLE_API_KEY,
+                                  temperature=0.1,
+                                  max_retries=Config.LLM_MAX_RETRIES)
+
+
+def _create_stub():
+    from RagFromScratch.src.config import Config
+
+    return StubChatModel.from_profile(Config.STUB_LLM_PROFILE, latency_ms=Config.STUB_LLM_LATENCY_MS,
+                                      tokens_per_second=Config.STUB_LLM_TOKENS_PER_SECOND,
+                                      answer_tokens=Config.STUB_LLM_ANSWER_TOKENS)
+
+
+def _create_ollama():
+    from RagFromScratch.src.config import Config
+
+    return OllamaChatModel(base_url=Config.OLLAMA_BASE_URL.rstrip("/"), model=Config.OLLAMA_MODEL)
+
+
+def without_client_retries(llm):
+    """
+    Copy of a chat model with its client-side retries disabled, for callers that retry themselves
+    (batch queries use retry_with_backoff), so failed calls are not retried twice over.
+    :param llm: LangChain chat model.
+    :return: The copy, or the model itself when it has no max_retries setting.
+    """
+    if "max_retries" in type(llm).model_fields:
+        return llm.model_copy(update={"max_retries": 0})
+    return llm
+
+
+LLM_BACKENDS = {"gemini": _create_gemini,
+                "stub": _create_stub,
+                "ollama": _create_ollama}
+
+
+def register_llm_backend(name, factory):
+    """
+    Make a chat model selectable with LLM_BACKEND=name.
+    :param name: Backend name.
+    :param factory: Callable without arguments returning a LangChain chat model.
+    """
+    LLM_BACKENDS[name.lower()] = factory
+
+
+def create_llm(backend=None):
+    """
+    :param backend: Registered backend name, defaults to Config.LLM_BACKEND.
+    :return: Chat model of the backend.
+    """
+    from RagFromScratch.src.config import Config
+
+    backend = (backend or Config.LLM_BACKEND).lower()
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}'. Use one of: {', '.join(LLM_BACKENDS)}.")
+    return LLM_BACKENDS[backend]()
+
+
+def describe_llm(backend=None):
+    """Backend and model name shown in the startup output."""
+    from RagFromScratch.src.config import Config
+
+    backend = (backend or Config.LLM_BACKEND).lower()
+    if backend == "stub":
+        return f"stub ({Config.STUB_LLM_PROFILE} profile)"
+    if backend == "ollama":
+        return f"ollama: {Config.OLLAMA_MODEL} at {Config.OLLAMA_BASE_URL}"
+    if backend == "gemini":
+        return f"gemini: {Config.CHAT_MODEL}"
+    return backend
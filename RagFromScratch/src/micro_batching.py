@@ -0,0 +1,73 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that merges concurrent embed_query calls into one embed_documents call.
+    Each caller enqueues its text and blocks on a future; a collector thread takes the first
+    waiting text, gathers whatever else arrives within `max_wait_ms` (up to `max_batch_size`
+    texts) and runs the model once for the whole batch. Under load the model sees a few large
+    batches instead of many single-text forward passes; a lone request only pays the short wait.
+    embed_documents calls are already batched and go straight to the model.
+    """
+
+    def __init__(self, embeddings, max_batch_size=None, max_wait_ms=None):
+        from RagFromScratch.src.config import Config
+
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size or Config.EMBEDDING_MICRO_BATCH_SIZE
+        self.max_wait_ms = Config.EMBEDDING_MICRO_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms
+
+        self._pending = queue.Queue()
+        self._collector = None
+        self._collector_lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+
+    def _ensure_collector(self):
+        if self._collector is None:
+            with self._collector_lock:
+                if self._collector is None:
+                    self._collector = threading.Thread(target=self._collect, name="embedding-micro-batcher",
+                                                       daemon=True)
+                    self._collector.start()
+
+    def _collect(self):
+        while True:
+            batch = [self._pending.get()]
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self._pending.get(timeout=self.max_wait_ms / 1000))
+            except queue.Empty:
+                pass
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def embed_query(self, text):
+        self._ensure_collector()
+        future = Future()
+        self._pending.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self):
+        return {"batches": self.batches,
+                "queries": self.queries,
+                "average_batch_size": self.queries / self.batches if self.batches else 0.0}
@@ -0,0 +1,511 @@
+import json
+import mmap
+import os
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from RagFromScratch.src.instrumentation import get_instrumentation
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store that keeps L2-normalized embeddings in one contiguous matrix.
+    On disk the matrix is a plain .npy file that is memory-mapped on load, and the chunk text and
+    metadata live in a JSON-lines side file that is read lazily by byte offset.
+    A top-k search is a single matrix-vector product followed by argpartition, or an approximate
+    FAISS search (HNSW / IVF-PQ) rescored against the matrix when an ANN index type is configured.
+    With a quantization mode (int8 / binary) the first pass scans compact in-memory codes instead
+    and only the shortlisted rows of the memory-mapped matrix are read for rescoring.
+    Adds and deletes leave both indexes as they are and searches fall back to the exact scan until
+    persist() applies the changes to them incrementally; only a fresh store trains them from scratch.
+    """
+
+    MATRIX_FILE = "embeddings.npy"
+    CHUNKS_FILE = "chunks.jsonl"
+    OFFSETS_FILE = "offsets.npy"
+    IDS_FILE = "ids_sorted.npy"
+    ID_ROWS_FILE = "ids_rows.npy"
+
+    def __init__(self, embedding_function, persist_directory=None, dtype="float32", ann_index_type=None,
+                 quantization=None):
+        self._embedding = embedding_function
+        self.persist_directory = persist_directory
+        self.dtype = np.dtype(dtype)
+        self.ann_index_type = ann_index_type or None
+        self.ann_index = None
+        self.quantization = quantization or None
+        self.quantized_index = None
+
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._buffer = None  # Preallocated rows behind _matrix while chunks are being added
+        self._records = []
+        self._ids = []
+        self._id_to_row = {}
+        # Old row of every row while the ANN / quantized indexes lag behind the matrix (-1 for new
+        # rows), None while they are up to date
+        self._index_origin = None
+
+        # Lazily read side file, only used until the store is modified
+        self._chunks_map = None
+        self._offsets = None
+        # Sorted chunk IDs and their rows, so IDs are resolved without materializing the records
+        self._sorted_ids = None
+        self._sorted_rows = None
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, persist_directory, embedding_function, dtype=None, ann_index_type=None, quantization=None):
+        """
+        Open a persisted store. The embedding matrix is memory-mapped, nothing is copied into RAM.
+        :param persist_directory: Directory written by persist().
+        :param embedding_function: Embeddings used for queries and new documents.
+        :param dtype: Ignored for loading, the matrix keeps the dtype it was written with.
+        :param ann_index_type: ANN index to (re)build on the next persist(), the persisted one is used if present.
+        :param quantization: "int8" or "binary" codes for the first search pass, built now if not persisted.
+        :return: NumpyVectorStore instance.
+        """
+        matrix_path = os.path.join(persist_directory, cls.MATRIX_FILE)
+        if not os.path.exists(matrix_path):
+            raise FileNotFoundError(f"Vector store not found at {persist_directory}. Please create it first.")
+
+        matrix = np.load(matrix_path, mmap_mode="r")
+        store = cls(embedding_function, persist_directory=persist_directory, dtype=matrix.dtype,
+                    ann_index_type=ann_index_type, quantization=quantization)
+        store._matrix = matrix
+        store._offsets = np.load(os.path.join(persist_directory, cls.OFFSETS_FILE), mmap_mode="r")
+
+        chunks_path = os.path.join(persist_directory, cls.CHUNKS_FILE)
+        if os.path.getsize(chunks_path):
+            with open(chunks_path, "rb") as chunks_file:
+                store._chunks_map = mmap.mmap(chunks_file.fileno(), 0, access=mmap.ACCESS_READ)
+        store._records = None
+        store._ids = None
+        store._id_to_row = None
+
+        ids_path = os.path.join(persist_directory, cls.IDS_FILE)
+        id_rows_path = os.path.join(persist_directory, cls.ID_ROWS_FILE)
+        if os.path.exists(ids_path) and os.path.exists(id_rows_path):
+            store._sorted_ids = np.load(ids_path, mmap_mode="r")
+            store._sorted_rows = np.load(id_rows_path, mmap_mode="r")
+
+        if ann_index_type:
+            from RagFromScratch.src.ann_index import FaissANNIndex
+
+            ann_index = FaissANNIndex.load(persist_directory)
+            if ann_index is not None and ann_index.nrows == store.count():
+                store.ann_index = ann_index
+
+        if quantization and store.count():
+            from RagFromScratch.src.quantized_index import QuantizedIndex
+
+            quantized_index = QuantizedIndex.load(persist_directory, mode=quantization)
+            if quantized_index is None or quantized_index.ntotal != store.count():
+                quantized_index = QuantizedIndex(mode=quantization).build(matrix)
+            store.quantized_index = quantized_index
+        return store
+
+    def persist(self, persist_directory=None):
+        """
+        Write the matrix and the side file. Files are written next to the old ones and swapped in,
+        so readers that still map the previous version are not affected.
+        :param persist_directory: Target directory, defaults to the directory the store was created with.
+        :return:
+        """
+        persist_directory = persist_directory or self.persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+
+        from RagFromScratch.src.ann_index import FaissANNIndex
+        from RagFromScratch.src.quantized_index import QuantizedIndex
+
+        with self._lock:
+            records = self._all_records()
+            matrix = self._matrix_or_empty()
+
+            offsets = [0]
+            chunks_tmp = os.path.join(persist_directory, self.CHUNKS_FILE + ".tmp")
+            with open(chunks_tmp, "wb") as chunks_file:
+                for record in records:
+                    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                    chunks_file.write(line)
+                    offsets.append(offsets[-1] + len(line))
+
+            ids = np.asarray([record["id"] for record in records], dtype=str)
+            order = np.argsort(ids, kind="stable")
+
+            matrix_tmp = os.path.join(persist_directory, "tmp_" + self.MATRIX_FILE)
+            offsets_tmp = os.path.join(persist_directory, "tmp_" + self.OFFSETS_FILE)
+            ids_tmp = os.path.join(persist_directory, "tmp_" + self.IDS_FILE)
+            id_rows_tmp = os.path.join(persist_directory, "tmp_" + self.ID_ROWS_FILE)
+            np.save(matrix_tmp, np.ascontiguousarray(matrix, dtype=self.dtype))
+            np.save(offsets_tmp, np.asarray(offsets, dtype=np.int64))
+            np.save(ids_tmp, ids[order])
+            np.save(id_rows_tmp, order.astype(np.int64))
+
+            os.replace(matrix_tmp, os.path.join(persist_directory, self.MATRIX_FILE))
+            os.replace(offsets_tmp, os.path.join(persist_directory, self.OFFSETS_FILE))
+            os.replace(ids_tmp, os.path.join(persist_directory, self.IDS_FILE))
+            os.replace(id_rows_tmp, os.path.join(persist_directory, self.ID_ROWS_FILE))
+            os.replace(chunks_tmp, os.path.join(persist_directory, self.CHUNKS_FILE))
+
+            self.update_indexes()
+            ann_path = os.path.join(persist_directory, FaissANNIndex.INDEX_FILE)
+            if self.ann_index_type and len(matrix):
+                self.build_ann_index()
+                self.ann_index.save(persist_directory)
+            else:
+                for path in (ann_path, os.path.join(persist_directory, FaissANNIndex.ROWS_FILE)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+            QuantizedIndex.remove(persist_directory, keep_mode=self.quantization if len(matrix) else None)
+            if self.quantization and len(matrix):
+                self.build_quantized_index()
+                self.quantized_index.save(persist_directory)
+
+    def update_indexes(self):
+        """
+        Apply the adds and deletes since the last persist() to the ANN index and the quantized codes
+        without retraining them: rows of deleted chunks are dropped and the new rows are added.
+        :return:
+        """
+        with self._lock:
+            if self._index_origin is None:
+                return
+            kept_rows = self._index_origin[self._index_origin >= 0]
+            new_vectors = self._matrix[len(kept_rows):]
+            if self.ann_index is not None:
+                self.ann_index.update(kept_rows, new_vectors)
+            if self.quantized_index is not None:
+                self.quantized_index.update(kept_rows, new_vectors)
+            self._index_origin = None
+
+    def build_ann_index(self, **params):
+        """
+        (Re)build the approximate nearest-neighbour index over the current matrix.
+        The index is skipped when it is already up to date with the matrix.
+        :param params: Overrides for FaissANNIndex (nlist, pq_m, hnsw_m, ef_construction, nprobe, ef_search).
+        :return: The FaissANNIndex.
+        """
+        from RagFromScratch.src.ann_index import FaissANNIndex
+
+        with self._lock:
+            self.update_indexes()
+            if self.ann_index is None or self.ann_index.nrows != self.count() or params:
+                self.ann_index = FaissANNIndex(index_type=self.ann_index_type, **params).build(self._matrix)
+            return self.ann_index
+
+    def build_quantized_index(self):
+        """
+        (Re)build the int8 / binary codes over the current matrix, unless they are up to date.
+        :return: The QuantizedIndex.
+        """
+        from RagFromScratch.src.quantized_index import QuantizedIndex
+
+        with self._lock:
+            self.update_indexes()
+            if self.quantized_index is None or self.quantized_index.ntotal != self.count():
+                self.quantized_index = QuantizedIndex(mode=self.quantization).build(self._matrix)
+            return self.quantized_index
+
+    def _read_record(self, row):
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._chunks_map[start:end])
+
+    def _all_records(self):
+        """Materialize every record, needed before the store can be modified."""
+        if self._records is None:
+            self._records = [self._read_record(row) for row in range(len(self._offsets) - 1)]
+            self._ids = [record["id"] for record in self._records]
+            self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        return self._records
+
+    def _record(self, row, records=None):
+        return records[row] if records is not None else self._read_record(row)
+
+    def _snapshot(self):
+        """
+        Matrix, records and first-pass index that belong together, taken atomically for lock-free
+        searching. The first-pass index is the ANN index, else the quantized codes, else None; both
+        expose search_rescored(matrix, query, k). It is None while the indexes lag behind the matrix.
+        """
+        with self._lock:
+            search_index = self.ann_index if self.ann_index is not None else self.quantized_index
+            return self._matrix, self._records, search_index if self._index_origin is None else None
+
+    def _matrix_or_empty(self):
+        if self._matrix is None:
+            self._matrix = np.zeros((0, 0), dtype=self.dtype)
+        return self._matrix
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas=metadatas, ids=ids)
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """
+        Add precomputed embeddings. Existing IDs are overwritten (upsert).
+        :param texts: Chunk texts.
+        :param embeddings: One vector per text.
+        :param metadatas: Optional metadata dictionaries.
+        :param ids: Optional IDs, random UUIDs are generated when missing.
+        :return: List of IDs that were written.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = self._normalize(embeddings).astype(self.dtype)
+
+        with self._lock:
+            self._all_records()
+            existing = [chunk_id for chunk_id in ids if chunk_id in self._id_to_row]
+            if existing:
+                self.delete(existing)
+
+            # Snapshots only read the rows they were taken with, so the records list and the
+            # buffer grow in place
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                self._id_to_row[chunk_id] = len(self._records)
+                self._records.append({"id": chunk_id, "text": text, "metadata": metadata})
+                self._ids.append(chunk_id)
+            self._track_index_rows(np.full(len(vectors), -1, dtype=np.int64))
+            self._append_rows(vectors)
+        return ids
+
+    def _track_index_rows(self, new_origin=None, keep=None):
+        """
+        Record how the rows move relative to the ANN / quantized indexes, so update_indexes() can
+        apply the changes later. Nothing is tracked when there are no indexes.
+        :param new_origin: Origins to append for added rows.
+        :param keep: Boolean mask of the rows that survive a delete.
+        :return:
+        """
+        if self.ann_index is None and self.quantized_index is None:
+            return
+        if self._index_origin is None:
+            self._index_origin = np.arange(self.count(), dtype=np.int64)
+        if new_origin is not None:
+            self._index_origin = np.concatenate([self._index_origin, new_origin])
+        if keep is not None:
+            self._index_origin = self._index_origin[keep]
+
+    def _append_rows(self, vectors):
+        """
+        Append vectors to the matrix. Rows go into a buffer whose capacity doubles when full, so a
+        streaming build of n chunks copies O(n) rows in total instead of the whole matrix per batch.
+        Rows visible to earlier snapshots are never overwritten.
+        """
+        count = self.count()
+        needed = count + len(vectors)
+        if self._buffer is None or needed > len(self._buffer):
+            buffer = np.empty((max(needed, 2 * count), vectors.shape[1]), dtype=self.dtype)
+            if count:
+                buffer[:count] = self._matrix
+            self._buffer = buffer
+        self._buffer[count:needed] = vectors
+        self._matrix = self._buffer[:needed]
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return False
+
+        with self._lock:
+            self._all_records()
+            rows = {self._id_to_row[chunk_id] for chunk_id in ids if chunk_id in self._id_to_row}
+            if not rows:
+                return False
+
+            keep = np.ones(len(self._records), dtype=bool)
+            keep[list(rows)] = False
+            self._track_index_rows(keep=keep)
+            self._matrix = np.asarray(self._matrix)[keep]
+            self._buffer = None
+            self._records = [record for row, record in enumerate(self._records) if keep[row]]
+            self._ids = [record["id"] for record in self._records]
+            self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._matrix = self._buffer = None
+            self._records, self._ids, self._id_to_row = [], [], {}
+            self._chunks_map, self._offsets = None, None
+            self._sorted_ids, self._sorted_rows = None, None
+            self.ann_index = None
+            self.quantized_index = None
+            self._index_origin = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def count(self):
+        return 0 if self._matrix is None else len(self._matrix)
+
+    def iter_texts(self):
+        """Generator of (chunk_id, text) pairs for every stored chunk, e.g. to build a lexical index."""
+        matrix, records, _ = self._snapshot()
+        for row in range(0 if matrix is None else len(matrix)):
+            record = self._record(row, records)
+            yield record["id"], record["text"]
+
+    def iter_metadatas(self):
+        """Generator of the metadata dictionary of every stored chunk."""
+        matrix, records, _ = self._snapshot()
+        for row in range(0 if matrix is None else len(matrix)):
+            yield self._record(row, records)["metadata"]
+
+    def _to_document(self, row, records=None):
+        record = self._record(row, records)
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+    def get_by_ids(self, ids, /):
+        with self._lock:
+            if self._id_to_row is None and self._sorted_ids is not None:
+                return [self._to_document(row) for row in self._rows_of(ids)]
+            self._all_records()
+            return [self._to_document(self._id_to_row[chunk_id], self._records)
+                    for chunk_id in ids if chunk_id in self._id_to_row]
+
+    def _rows_of(self, ids):
+        """Rows of the given IDs found by binary search in the persisted sorted IDs, unknown IDs are skipped."""
+        ids = list(ids)
+        if not ids or not len(self._sorted_ids):
+            return []
+        positions = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        return [int(self._sorted_rows[position]) for chunk_id, position in zip(ids, positions.tolist())
+                if self._sorted_ids[position] == chunk_id]
+
+    def _filter_mask(self, filter, count, records=None):
+        """Boolean mask of rows whose metadata matches a dict of equality conditions or a callable."""
+        matches = filter if callable(filter) else (
+            lambda metadata: all(metadata.get(key) == value for key, value in filter.items()))
+        return np.fromiter((matches(self._record(row, records)["metadata"]) for row in range(count)),
+                           dtype=bool, count=count)
+
+    def _top_k(self, scores, k):
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        """
+        Cosine top-k, timed as the "vector_search" stage, see _search_by_vector.
+        """
+        with get_instrumentation().stage("vector_search") as stage:
+            results = self._search_by_vector(embedding, k=k, filter=filter)
+            stage.set("candidates", len(results))
+        return results
+
+    def _search_by_vector(self, embedding, k=4, filter=None):
+        """
+        Cosine top-k. Without an ANN index or quantized codes this is one matrix-vector product plus
+        argpartition; with one, its candidates are rescored exactly against their rows of the matrix.
+        :param embedding: Query vector.
+        :param k: Number of results.
+        :param filter: Optional metadata filter (dict of equality conditions or callable).
+        :return: List of (Document, cosine similarity) pairs, best first.
+        """
+        matrix, records, search_index = self._snapshot()
+        if matrix is None or not len(matrix):
+            return []
+
+        query = self._normalize(embedding).astype(matrix.dtype, copy=False)
+        if search_index is not None and not filter:
+            rows, scores = search_index.search_rescored(matrix, query, k)
+            return [(self._to_document(int(row), records), float(score)) for row, score in zip(rows, scores)]
+
+        scores = (matrix @ query).astype(np.float32, copy=False)
+        if filter:
+            scores = np.where(self._filter_mask(filter, len(matrix), records), scores, -np.inf)
+
+        results = []
+        for row in self._top_k(scores, k):
+            if np.isfinite(scores[row]):
+                results.append((self._to_document(int(row), records), float(scores[row])))
+        return results
+
+    def batch_similarity_search_with_score_by_vector(self, embeddings, k=4, block_size=256):
+        """
+        Search many query vectors at once: one matrix-matrix product per block of queries and a
+        row-wise argpartition, instead of one search call per query.
+        :param embeddings: Query vectors, one per row.
+        :param k: Number of results per query.
+        :param block_size: Queries scored per matrix product, bounds the (block x n) score matrix.
+        :return: One list of (Document, cosine similarity) pairs per query, best first.
+        """
+        matrix, records, search_index = self._snapshot()
+        if matrix is None or not len(matrix):
+            return [[] for _ in embeddings]
+
+        queries = self._normalize(embeddings).astype(matrix.dtype, copy=False)
+        if search_index is not None:
+            results = []
+            for query in queries:
+                rows, scores = search_index.search_rescored(matrix, query, k)
+                results.append([(self._to_document(int(row), records), float(score))
+                                for row, score in zip(rows, scores)])
+            return results
+
+        k = min(k, len(matrix))
+        results = []
+        for start in range(0, len(queries), block_size):
+            scores = (queries[start:start + block_size] @ matrix.T).astype(np.float32, copy=False)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for rows, row_scores in zip(top, top_scores):
+                results.append([(self._to_document(int(row), records), float(score))
+                                for row, score in zip(rows, row_scores)])
+        return results
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities of normalized vectors
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, persist_directory=None, dtype="float32",
+                   ann_index_type=None, quantization=None, **kwargs):
+        store = cls(embedding, persist_directory=persist_directory, dtype=dtype, ann_index_type=ann_index_type,
+                    quantization=quantization)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        if persist_directory:
+            store.persist()
+        return store
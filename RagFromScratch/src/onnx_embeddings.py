@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformers model run through ONNX Runtime instead of PyTorch.
+    The exported graph is downloaded from the model repository (sentence-transformers ships one
+    under onnx/) or read from `model_dir`, and optionally quantized to int8 weights with dynamic
+    quantization. Inputs are tokenized once, sorted by length and batched so that each batch is
+    only padded to its own longest text, then mean-pooled and normalized like the original model.
+    """
+
+    MODEL_FILE = "model.onnx"
+    QUANTIZED_MODEL_FILE = "model_int8.onnx"
+    TOKENIZER_FILE = "tokenizer.json"
+
+    def __init__(self, model_name=None, model_dir=None, quantize=None, batch_size=None,
+                 intra_op_threads=None, max_seq_length=None, normalize=True):
+        from RagFromScratch.src.config import Config
+
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.model_dir = model_dir or os.path.join(Config.ONNX_MODEL_DIR, self.model_name.replace("/", "__"))
+        self.quantize = Config.ONNX_QUANTIZE if quantize is None else quantize
+        self.batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+        self.intra_op_threads = Config.EMBEDDING_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        self.max_seq_length = max_seq_length or Config.EMBEDDING_MAX_SEQ_LENGTH
+        self.normalize = normalize
+
+        self._session = None
+        self._tokenizer = None
+        self._input_names = ()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Model files and session
+    # ------------------------------------------------------------------
+
+    def _ensure_model_files(self):
+        """Download the exported model and tokenizer if they are not in model_dir yet."""
+        model_path = os.path.join(self.model_dir, self.MODEL_FILE)
+        tokenizer_path = os.path.join(self.model_dir, self.TOKENIZER_FILE)
+        if os.path.exists(model_path) and os.path.exists(tokenizer_path):
+            return model_path, tokenizer_path
+
+        from huggingface_hub import hf_hub_download
+
+        print(f"Downloading ONNX export of '{self.model_name}' to {self.model_dir}...")
+        os.makedirs(self.model_dir, exist_ok=True)
+        downloaded_model = hf_hub_download(self.model_name, f"onnx/{self.MODEL_FILE}")
+        downloaded_tokenizer = hf_hub_download(self.model_name, self.TOKENIZER_FILE)
+        for source, target in ((downloaded_model, model_path), (downloaded_tokenizer, tokenizer_path)):
+            with open(source, "rb") as src, open(target + ".tmp", "wb") as dst:
+                dst.write(src.read())
+            os.replace(target + ".tmp", target)
+        return model_path, tokenizer_path
+
+    def _quantized_model(self, model_path):
+        """Int8 dynamic quantization of the weights, written once next to the float model."""
+        quantized_path = os.path.join(self.model_dir, self.QUANTIZED_MODEL_FILE)
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            print("Quantizing ONNX model to int8...")
+            quantize_dynamic(model_path, quantized_path + ".tmp", weight_type=QuantType.QInt8)
+            os.replace(quantized_path + ".tmp", quantized_path)
+        return quantized_path
+
+    def _load(self):
+        if self._session is not None:
+            return
+        with self._lock:
+            if self._session is not None:
+                return
+
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            model_path, tokenizer_path = self._ensure_model_files()
+            if self.quantize:
+                model_path = self._quantized_model(model_path)
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.inter_op_num_threads = 1
+            if self.intra_op_threads:
+                options.intra_op_num_threads = self.intra_op_threads
+
+            tokenizer = Tokenizer.from_file(tokenizer_path)
+            tokenizer.no_padding()
+            tokenizer.enable_truncation(max_length=self.max_seq_length)
+
+            session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+            self._input_names = tuple(model_input.name for model_input in session.get_inputs())
+            self._tokenizer = tokenizer
+            self._session = session
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def _encode_batch(self, encodings):
+        """Pad one length-sorted batch to its longest member, run the model and mean-pool."""
+        longest = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(encodings), longest), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), longest), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self._session.run(None, feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def encode(self, texts):
+        """
+        Embed texts as a float32 matrix, in input order.
+        :param texts: List of strings.
+        :return: Array of shape (len(texts), dimension).
+        """
+        self._load()
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        encodings = self._tokenizer.encode_batch(list(texts))
+        order = np.argsort([len(encoding.ids) for encoding in encodings], kind="stable")
+
+        vectors = None
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            pooled = self._encode_batch([encodings[row] for row in rows])
+            if vectors is None:
+                vectors = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            vectors[rows] = pooled
+        return vectors
+
+    def embed_documents(self, texts):
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text):
+        return self.encode([text])[0].tolist()
+
+
+def backend_report(texts, baseline=None, candidate=None, repeats=1):
+    """
+    Compare an ONNX backend with the PyTorch baseline on the same texts.
+    Prints the cosine agreement between both embeddings of every text (mean, min, p5) and the
+    throughput of each backend in docs/sec.
+    :param texts: Sample texts, e.g. chunks of the corpus.
+    :param baseline: Baseline Embeddings, defaults to HuggingFaceEmbeddings on CPU.
+    :param candidate: Embeddings to compare, defaults to OnnxEmbeddings with the configured settings.
+    :param repeats: Timed runs per backend, the best one is reported.
+    :return: Dictionary with the agreement and throughput figures.
+    """
+    from RagFromScratch.src.config import Config
+
+    if baseline is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        baseline = HuggingFaceEmbeddings(model_name=Config.EMBEDDING_MODEL,
+                                         model_kwargs={"device": "cpu"},
+                                         encode_kwargs={"normalize_embeddings": True})
+    candidate = candidate or OnnxEmbeddings()
+
+    results = {}
+    vectors = {}
+    for name, embeddings in (("baseline", baseline), ("candidate", candidate)):
+        embeddings.embed_documents(texts[:8])  # Warm-up: model loading and first-call allocations
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            vectors[name] = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+            best = min(best, time.perf_counter() - started)
+        results[f"{name}_docs_per_sec"] = len(texts) / best
+
+    baseline_vectors = vectors["baseline"] / np.linalg.norm(vectors["baseline"], axis=1, keepdims=True)
+    candidate_vectors = vectors["candidate"] / np.linalg.norm(vectors["candidate"], axis=1, keepdims=True)
+    cosines = (baseline_vectors * candidate_vectors).sum(axis=1)
+    results.update({"texts": len(texts),
+                    "cosine_mean": float(cosines.mean()),
+                    "cosine_min": float(cosines.min()),
+                    "cosine_p5": float(np.percentile(cosines, 5)),
+                    "speedup": results["candidate_docs_per_sec"] / results["baseline_docs_per_sec"]})
+
+    print(f"📏 Embedding backend comparison on {len(texts)} texts:")
+    print(f"   - Cosine agreement: mean {results['cosine_mean']:.4f}, p5 {results['cosine_p5']:.4f}, "
+          f"min {results['cosine_min']:.4f}")
+    print(f"   - Baseline:  {results['baseline_docs_per_sec']:.1f} docs/sec")
+    print(f"   - Candidate: {results['candidate_docs_per_sec']:.1f} docs/sec "
+          f"({results['speedup']:.2f}x)")
+    return results
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.config import Config
+    from RagFromScratch.src.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    sample = [chunk.page_content for chunk in processor.chunk_documents(processor.load_documents(Config.DATA_FOLDER))]
+    backend_report(sample[:1000], repeats=2)
@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from langchain_core.documents import Document
+
+from RagFromScratch.src.index_manifest import IndexManifest
+from RagFromScratch.src.instrumentation import get_instrumentation
+
+COUNTERS = ("hits", "misses", "parse_seconds", "saved_seconds")
+
+
+class ParsedDocumentCache:
+    """
+    Persistent cache of the pages extracted from PDF/DOCX files, backed by SQLite.
+    A file is looked up by path, size and modification time first, so unchanged files are found
+    without reading them; a changed size or mtime falls back to the content hash, so touched or
+    renamed files with the same content are still hits. Page texts are stored zlib-compressed, one
+    row per page, and are read back lazily one page at a time.
+    Counters live in the database, so the hits of ingestion worker processes are reported too.
+    """
+
+    def __init__(self, cache_path=None):
+        from RagFromScratch.src.config import Config
+
+        self.cache_path = cache_path or Config.PARSED_CACHE_PATH
+
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Worker processes write to the same file, wait for their locks instead of failing
+        self._connection = sqlite3.connect(self.cache_path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS files (
+                                        path TEXT PRIMARY KEY,
+                                        size INTEGER NOT NULL,
+                                        mtime_ns INTEGER NOT NULL,
+                                        hash TEXT NOT NULL
+                                    ) WITHOUT ROWID""")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS documents (
+                                        hash TEXT NOT NULL,
+                                        loader TEXT NOT NULL,
+                                        pages INTEGER NOT NULL,
+                                        parse_seconds REAL NOT NULL,
+                                        PRIMARY KEY (hash, loader)
+                                    ) WITHOUT ROWID""")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS pages (
+                                        hash TEXT NOT NULL,
+                                        loader TEXT NOT NULL,
+                                        page INTEGER NOT NULL,
+                                        metadata TEXT NOT NULL,
+                                        text BLOB NOT NULL,
+                                        PRIMARY KEY (hash, loader, page)
+                                    ) WITHOUT ROWID""")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS counters (
+                                        name TEXT PRIMARY KEY,
+                                        value REAL NOT NULL
+                                    ) WITHOUT ROWID""")
+        self._connection.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                                     [(name,) for name in COUNTERS])
+        self._connection.commit()
+
+    def _add_counters(self, **values):
+        self._connection.executemany("UPDATE counters SET value = value + ? WHERE name = ?",
+                                     [(value, name) for name, value in values.items()])
+
+    def _content_hash(self, path, file_hash):
+        """Hash of the file, taken from the cache when its size and mtime did not change."""
+        stat = os.stat(path)
+        with self._lock:
+            row = self._connection.execute("SELECT size, mtime_ns, hash FROM files WHERE path = ?",
+                                           (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns and file_hash in (None, row[2]):
+            return row[2]
+
+        file_hash = file_hash or IndexManifest.hash_file(path)
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                                     (path, stat.st_size, stat.st_mtime_ns, file_hash))
+            if row and row[2] != file_hash:
+                self._drop_orphan(row[2])
+            self._connection.commit()
+        return file_hash
+
+    def _drop_orphan(self, content_hash):
+        """Delete the pages of an old file version once no cached path refers to it anymore."""
+        if self._connection.execute("SELECT 1 FROM files WHERE hash = ? LIMIT 1", (content_hash,)).fetchone():
+            return
+        self._connection.execute("DELETE FROM pages WHERE hash = ?", (content_hash,))
+        self._connection.execute("DELETE FROM documents WHERE hash = ?", (content_hash,))
+
+    def iter_pages(self, content_hash, loader):
+        """
+        Read the cached pages of a file lazily, one row per step.
+        :param content_hash: Content hash of the file.
+        :param loader: Name of the loader that parsed it.
+        :return: Generator of Documents, one per page.
+        """
+        page = 0
+        while True:
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT metadata, text FROM pages WHERE hash = ? AND loader = ? AND page = ?",
+                    (content_hash, loader, page)).fetchone()
+            if row is None:
+                return
+            yield Document(page_content=zlib.decompress(row[1]).decode("utf-8"), metadata=json.loads(row[0]))
+            page += 1
+
+    def _parse(self, content_hash, loader_name, loader):
+        """Parse a file with its loader, yielding pages as they come and caching them once all are read."""
+        rows = []
+        parse_seconds = 0.0
+        pages = loader.lazy_load()
+        while True:
+            started = time.perf_counter()
+            document = next(pages, None)
+            parse_seconds += time.perf_counter() - started
+            if document is None:
+                break
+            rows.append((content_hash, loader_name, len(rows), json.dumps(document.metadata, default=str),
+                         zlib.compress(document.page_content.encode("utf-8"))))
+            yield document
+
+        with self._lock:
+            self._connection.execute("DELETE FROM pages WHERE hash = ? AND loader = ?", (content_hash, loader_name))
+            self._connection.executemany(
+                "INSERT INTO pages (hash, loader, page, metadata, text) VALUES (?, ?, ?, ?, ?)", rows)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO documents (hash, loader, pages, parse_seconds) VALUES (?, ?, ?, ?)",
+                (content_hash, loader_name, len(rows), parse_seconds))
+            self._add_counters(parse_seconds=parse_seconds)
+            self._connection.commit()
+
+    def load(self, file_path, loader_class, file_hash=None):
+        """
+        Pages of a file, from the cache or parsed with the loader on a miss.
+        :param file_path: Path of the file.
+        :param loader_class: LangChain loader class used to parse the file on a miss.
+        :param file_hash: Content hash of the file if the caller already computed it.
+        :return: Tuple of (generator of page Documents, content hash of the file).
+        """
+        path = os.path.abspath(file_path)
+        content_hash = self._content_hash(path, file_hash)
+        loader_name = loader_class.__name__
+
+        with self._lock:
+            row = self._connection.execute("SELECT parse_seconds FROM documents WHERE hash = ? AND loader = ?",
+                                           (content_hash, loader_name)).fetchone()
+            if row:
+                self._add_counters(hits=1, saved_seconds=row[0])
+            else:
+                self._add_counters(misses=1)
+            self._connection.commit()
+        get_instrumentation().cache_event("parsed", hits=int(row is not None), misses=int(row is None))
+
+        if row:
+            return self.iter_pages(content_hash, loader_name), content_hash
+        return self._parse(content_hash, loader_name, loader_class(file_path)), content_hash
+
+    def stats(self, since=None):
+        """
+        Cache counters of every process using this cache file.
+        :param since: Earlier stats() result, to report only what happened after it.
+        :return: Dictionary with hits, misses, hit rate, seconds spent parsing, parse seconds saved
+                 by hits and the number of cached documents and pages.
+        """
+        with self._lock:
+            counters = dict(self._connection.execute("SELECT name, value FROM counters").fetchall())
+            documents, pages = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM documents").fetchone()
+        if since:
+            counters = {name: value - since.get(name, 0) for name, value in counters.items()}
+
+        hits, misses = int(counters["hits"]), int(counters["misses"])
+        return {"hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "parse_seconds": counters["parse_seconds"],
+                "saved_seconds": counters["saved_seconds"],
+                "documents": documents,
+                "pages": pages,
+                "size_bytes": os.path.getsize(self.cache_path)}
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            for table in ("files", "documents", "pages"):
+                self._connection.execute(f"DELETE FROM {table}")
+            self._connection.execute("UPDATE counters SET value = 0")
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def print_parsed_cache_stats(stats):
+    print(f"   - Parsed document cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_rate']:.0%} hit rate), {stats['parse_seconds']:.2f}s parsing, "
+          f"{stats['saved_seconds']:.2f}s saved, {stats['pages']} pages cached")
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.config import Config
+    from RagFromScratch.src.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    for attempt in ("cold", "warm"):
+        snapshot = processor.parsed_cache.stats()
+        started = time.perf_counter()
+        docs = processor.load_documents(Config.DATA_FOLDER)
+        print(f"{attempt}: {len(docs)} pages in {time.perf_counter() - started:.2f}s")
+        print_parsed_cache_stats(processor.parsed_cache.stats(since=snapshot))
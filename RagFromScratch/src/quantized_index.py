@@ -0,0 +1,240 @@
+import os
+import time
+
+import numpy as np
+
+# Set bits of every byte value, np.bitwise_count only exists from NumPy 2.0 on
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class QuantizedIndex:
+    """
+    Compressed copy of the normalized embedding matrix for a fast first search pass.
+    - int8: symmetric scalar quantization with one scale per dimension (4x smaller than float32),
+      scored with an integer-code matrix product.
+    - binary: one sign bit per dimension packed into bytes (32x smaller), scored by Hamming
+      distance between the packed codes.
+    The shortlist of rescore_factor * k best codes is rescored exactly against the full-precision
+    matrix, which stays on disk and is only touched for the shortlisted rows.
+    """
+
+    MODES = ("int8", "binary")
+    CODES_FILE = "codes_{mode}.npy"
+    SCALES_FILE = "codes_int8_scales.npy"
+
+    def __init__(self, mode=None, rescore_factor=None, block_size=16384):
+        from RagFromScratch.src.config import Config
+
+        self.mode = (mode or Config.VECTOR_QUANTIZATION).lower()
+        self.rescore_factor = rescore_factor or Config.QUANTIZATION_RESCORE_FACTOR
+        self.block_size = block_size
+        self.codes = None
+        self.scales = None
+
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown quantization mode '{self.mode}'. Use 'int8' or 'binary'.")
+
+    @property
+    def ntotal(self):
+        return 0 if self.codes is None else len(self.codes)
+
+    @property
+    def nbytes(self):
+        return (0 if self.codes is None else self.codes.nbytes) + (0 if self.scales is None else self.scales.nbytes)
+
+    def build(self, matrix):
+        """
+        Quantize a matrix of normalized embeddings, block by block so a memory-mapped matrix is
+        never loaded whole.
+        :param matrix: Array of shape (n, d).
+        :return: self
+        """
+        count, dimension = matrix.shape
+        if self.mode == "int8":
+            max_abs = np.zeros(dimension, dtype=np.float32)
+            for start in range(0, count, self.block_size):
+                block = np.abs(np.asarray(matrix[start:start + self.block_size], dtype=np.float32))
+                np.maximum(max_abs, block.max(axis=0), out=max_abs)
+            self.scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+            self.codes = np.empty((count, dimension), dtype=np.int8)
+        else:
+            self.codes = np.empty((count, (dimension + 7) // 8), dtype=np.uint8)
+
+        for start in range(0, count, self.block_size):
+            self.codes[start:start + self.block_size] = self._encode(matrix[start:start + self.block_size])
+        return self
+
+    def update(self, kept_rows, new_vectors):
+        """
+        Apply a sync without re-quantizing the whole matrix: keep the codes of the kept rows and
+        append codes for the new ones. The int8 scales are not refitted, new values beyond them are
+        clipped, which the exact rescoring absorbs; a --rebuild refits them.
+        :param kept_rows: Old row of each kept row of the new matrix, in order; new rows follow them.
+        :param new_vectors: Normalized embeddings of the added rows, shape (m, d).
+        :return: self
+        """
+        new_codes = [self._encode(new_vectors[start:start + self.block_size])
+                     for start in range(0, len(new_vectors), self.block_size)]
+        self.codes = np.concatenate([self.codes[kept_rows]] + new_codes)
+        return self
+
+    def _encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mode == "int8":
+            return np.clip(np.rint(vectors / self.scales), -127, 127).astype(np.int8)
+        return np.packbits(vectors > 0, axis=-1)
+
+    def approximate_scores(self, query):
+        """
+        First-pass scores of every row for one normalized query, higher is better.
+        int8 returns approximate inner products, binary returns (dimension - 2 * Hamming distance).
+        """
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        if self.mode == "int8":
+            # (codes * scales) @ query == codes @ (scales * query), the codes are never dequantized
+            scaled_query = self.scales * query
+            for start in range(0, len(self.codes), self.block_size):
+                scores[start:start + self.block_size] = self.codes[start:start + self.block_size] @ scaled_query
+        else:
+            query_bits = np.packbits(query > 0)
+            bits = query.shape[-1]
+            for start in range(0, len(self.codes), self.block_size):
+                hamming = POPCOUNT[self.codes[start:start + self.block_size] ^ query_bits].sum(axis=1, dtype=np.int32)
+                scores[start:start + self.block_size] = bits - 2 * hamming.astype(np.float32)
+        return scores
+
+    def search_rescored(self, matrix, query, k):
+        """
+        Shortlist rescore_factor * k rows by their codes, then re-rank the shortlist with exact inner
+        products against the full-precision matrix.
+        :param matrix: The (possibly memory-mapped) embedding matrix the codes were built from.
+        :param query: Normalized query vector.
+        :param k: Number of results.
+        :return: Tuple of (rows, scores) arrays, best first.
+        """
+        scores = self.approximate_scores(query)
+        candidates = min(len(scores), max(k, k * self.rescore_factor))
+        if candidates <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # Sorted rows turn the gather into a forward scan of the memory-mapped matrix
+        rows = np.sort(np.argpartition(-scores, candidates - 1)[:candidates])
+        exact = (matrix[rows] @ query.astype(matrix.dtype, copy=False)).astype(np.float32, copy=False)
+        order = np.argsort(-exact, kind="stable")[:k]
+        return rows[order], exact[order]
+
+    def save(self, persist_directory):
+        codes_path = os.path.join(persist_directory, self.CODES_FILE.format(mode=self.mode))
+        np.save(codes_path + ".tmp.npy", self.codes)
+        if self.mode == "int8":
+            scales_path = os.path.join(persist_directory, self.SCALES_FILE)
+            np.save(scales_path + ".tmp.npy", self.scales)
+            os.replace(scales_path + ".tmp.npy", scales_path)
+        os.replace(codes_path + ".tmp.npy", codes_path)
+
+    @classmethod
+    def load(cls, persist_directory, mode=None, **params):
+        """
+        Load persisted codes into memory, or return None when there are none for this mode.
+        :param persist_directory: Directory written by save().
+        :param mode: "int8" or "binary", defaults to Config.VECTOR_QUANTIZATION.
+        :return: QuantizedIndex or None.
+        """
+        index = cls(mode=mode, **params)
+        codes_path = os.path.join(persist_directory, cls.CODES_FILE.format(mode=index.mode))
+        scales_path = os.path.join(persist_directory, cls.SCALES_FILE)
+        if not os.path.exists(codes_path) or (index.mode == "int8" and not os.path.exists(scales_path)):
+            return None
+
+        # Codes are read into RAM on purpose: they are the part that gets scanned on every query
+        index.codes = np.load(codes_path)
+        if index.mode == "int8":
+            index.scales = np.load(scales_path)
+        return index
+
+    @classmethod
+    def remove(cls, persist_directory, keep_mode=None):
+        """
+        Delete persisted codes, e.g. after quantization was switched off or to another mode.
+        :param persist_directory: Directory written by save().
+        :param keep_mode: Mode whose codes are kept, None deletes the codes of every mode.
+        :return:
+        """
+        paths = [os.path.join(persist_directory, cls.CODES_FILE.format(mode=mode))
+                 for mode in cls.MODES if mode != keep_mode]
+        if keep_mode != "int8":
+            paths.append(os.path.join(persist_directory, cls.SCALES_FILE))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def quantization_report(store, k=10, sample_size=200, modes=("int8", "binary"), rescore_factors=(1, 4, 10),
+                        seed=42):
+    """
+    Measure memory, recall@k and per-query latency of each quantization mode against the exact
+    float search. Queries are stored vectors with a little noise added, as in the ANN recall report.
+    :param store: NumpyVectorStore to measure.
+    :param k: Number of neighbours compared.
+    :param sample_size: Number of queries sampled from the store.
+    :param modes: Quantization modes to build and compare.
+    :param rescore_factors: Shortlist sizes (multiples of k) swept per mode; 1 means no real rescoring.
+    :param seed: Random seed for the query sample.
+    :return: List of dictionaries, one per setting, including the exact baseline.
+    """
+    matrix = store._matrix
+    if matrix is None or not len(matrix):
+        raise ValueError("The vector store is empty.")
+
+    float_matrix = np.asarray(matrix, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(float_matrix), size=min(sample_size, len(float_matrix)), replace=False)
+    queries = float_matrix[rows] + rng.normal(scale=0.05, size=(len(rows), float_matrix.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    k = min(k, len(float_matrix))
+
+    exact = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        scores = float_matrix @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        latencies.append(time.perf_counter() - started)
+        exact.append(set(top.tolist()))
+
+    def summarize(setting, memory_bytes, hits, timings):
+        timings_ms = np.asarray(timings) * 1000
+        return {"setting": setting,
+                "memory_mb": memory_bytes / 2 ** 20,
+                "compression": float_matrix.nbytes / memory_bytes,
+                f"recall@{k}": hits / (k * len(queries)),
+                "p50_ms": float(np.percentile(timings_ms, 50)),
+                "p95_ms": float(np.percentile(timings_ms, 95))}
+
+    report = [summarize("float32", float_matrix.nbytes, k * len(queries), latencies)]
+    for mode in modes:
+        index = QuantizedIndex(mode=mode).build(matrix)
+        for factor in rescore_factors:
+            index.rescore_factor = factor
+            hits = 0
+            timings = []
+            for query, expected in zip(queries, exact):
+                started = time.perf_counter()
+                found, _ = index.search_rescored(matrix, query, k)
+                timings.append(time.perf_counter() - started)
+                hits += len(expected.intersection(found.tolist()))
+            report.append(summarize(f"{mode} x{factor}", index.nbytes, hits, timings))
+
+    print(f"📊 Quantized storage vs exact search ({len(float_matrix)} vectors, {float_matrix.shape[1]} dims, "
+          f"{len(queries)} queries):")
+    for row in report:
+        print(f"   - {row['setting']:<12} {row['memory_mb']:8.2f} MB ({row['compression']:4.1f}x)  "
+              f"recall@{k}={row[f'recall@{k}']:.3f}  p50={row['p50_ms']:.3f}ms  p95={row['p95_ms']:.3f}ms")
+    return report
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.vector_store_local import VectorStoreManager
+
+    vs_manager = VectorStoreManager()
+    quantization_report(vs_manager.load_vector_store())
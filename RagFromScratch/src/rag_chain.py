@@ -1,9 +1,15 @@
+import asyncio
+import time
+
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema.output_parser import StrOutputParser
-from langchain.schema.runnable import RunnablePassthrough
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.schema.runnable import RunnableLambda, RunnableParallel, RunnablePassthrough
+from langchain_core.messages.ai import add_usage
 
-from RagFromScratch.src.vector_store_local import VectorStoreManager
+from RagFromScratch.src.context_packer import ContextPacker, count_tokens
+from RagFromScratch.src.faq_index import faq_document
+from RagFromScratch.src.instrumentation import get_instrumentation
+from RagFromScratch.src.llm_backends import create_llm, describe_llm, without_client_retries
 
 
 class RAGSystemChain:
@@ -13,15 +19,19 @@ class RAGSystemChain:
     based on retrieved documents.
     """
 
-    def __init__(self):
+    def __init__(self, llm=None):
         from RagFromScratch.src.config import Config
 
-        Config.validate_config(Config)
-        print(f"🔧 Initializing RAG System Chain...: {Config.CHAT_MODEL}")
-        self.llm = ChatGoogleGenerativeAI(model=Config.CHAT_MODEL,
-                                          google_api_key=Config.GOOGLE_API_KEY,
-                                          temperature=0.1,
-                                          max_retries=2)
+        # Any LangChain chat model can be injected, e.g. a local fake model for tests
+        if llm is None:
+            Config.validate_config(Config)
+            print(f"🔧 Initializing RAG System Chain...: {describe_llm()}")
+            llm = create_llm()
+        else:
+            print(f"🔧 Initializing RAG System Chain...: {type(llm).__name__}")
+        self.llm = llm
+        self.context_packer = ContextPacker()
+        self.faq_index = None
         self.setup_prompt_template()
         print("✅ RAG System Chain initialized successfully.")
 
@@ -49,41 +59,259 @@ class RAGSystemChain:
             ANSWER:
             """)
 
-    def create_rag_chain(self, retriever):
+    def create_rag_chain(self, retriever, answer_cache=None, faq_index=None):
         """
         Create the RAG chain using the retriever and the initialized components.
+        The chain retrieves once and returns the question, the retrieved documents, the packed context
+        and the answer, so callers can show the sources the answer was generated from without searching again.
         :param retriever: The document retriever to use for fetching relevant documents.
-        :return: The configured RAG chain.
+        :param answer_cache: Optional AnswerCache consulted before calling the LLM.
+        :param faq_index: Optional FaqIndex; questions matching a known FAQ are answered with its stored
+            response, producing {"question", "documents", "faq", "answer"} without retrieval or LLM call.
+        :return: The configured RAG chain, producing {"question", "documents", "packed", "answer"}.
         """
-        from langchain.chains import RetrievalQA
+        instrumentation = get_instrumentation()
+        answer_chain = self.create_answer_chain()
+        if answer_cache is not None:
+            def answer_with_cache(inputs, config):
+                """
+                Serve the answer from the cache when possible, otherwise stream it from the LLM and remember it.
+                Written as a generator so the chain still streams tokens when the cache is enabled.
+                """
+                cached_answer = answer_cache.get(inputs["question"], inputs["documents"])
+                if cached_answer is not None:
+                    yield cached_answer
+                    return
 
-        def format_documents(documents):
-            """
-            Format the retrieved documents into a single context string.
-            :param documents: List of retrieved documents.
-            :return: Formatted context string.
-            """
-            if not documents:
-                return "No relevant documents found."
+                tokens = []
+                for token in answer_chain.stream(inputs, config):
+                    tokens.append(token)
+                    yield token
+                answer_cache.put(inputs["question"], inputs["documents"], "".join(tokens))
 
-            formatted_docs = []
-            for i, doc in enumerate(documents, 1):
-                source = doc.metadata.get("source", "Unknown Source")
-                content = doc.page_content.strip()
-                formatted_docs.append(f"Document {i} (Source: {source}):\n{content}\n")
+            answer_step = RunnableLambda(answer_with_cache)
+        else:
+            answer_step = answer_chain
 
-            return "\n\n".join(formatted_docs)
+        def retrieve(question, config):
+            with instrumentation.stage("retrieve") as stage:
+                documents = retriever.invoke(question, config)
+                stage.set("candidates", len(documents))
+            return documents
+
+        def pack_context(inputs):
+            with instrumentation.stage("pack_context") as stage:
+                packed = self.context_packer.pack(inputs["documents"])
+                stage.set("original_tokens", packed["stats"]["original_tokens"])
+                stage.set("packed_tokens", packed["stats"]["packed_tokens"])
+            return packed
 
         rag_chain = (
-                {
-                    "context": retriever | format_documents,
-                    "question": RunnablePassthrough(),
-                }
-                | self.prompt_template
-                | self.llm
-                | self.output_parser
+                RunnableParallel(documents=RunnableLambda(retrieve, name="retrieve"), question=RunnablePassthrough())
+                | RunnablePassthrough.assign(packed=pack_context)
+                | RunnablePassthrough.assign(answer=answer_step)
         )
-        return rag_chain
+
+        self.faq_index = faq_index
+        if faq_index is None:
+            return rag_chain
+
+        def answer_from_faq(question):
+            """Route known questions to their stored answer, everything else through retrieval and the LLM."""
+            match = faq_index.match(question)
+            if match is None:
+                return rag_chain
+            return RunnableLambda(lambda _: {"question": question,
+                                             "documents": [faq_document(match)],
+                                             "faq": match,
+                                             "answer": match["response"]}, name="faq_answer")
+
+        return RunnableLambda(answer_from_faq, name="faq_shortcut")
+
+    def stream_query(self, chain, question):
+        """
+        Query the RAG chain and stream the answer as it is generated.
+        Yields event dictionaries that can be rendered in a terminal or forwarded as server-sent events:
+        {"type": "documents", "documents": [...]} once retrieval is done,
+        {"type": "context", "stats": {...}} with the prompt-size savings of the packed context,
+        {"type": "faq", "match": {...}} instead of the context when a known FAQ answered the question,
+        {"type": "token", "text": ...} for every answer token, and finally
+        {"type": "done", "answer": ..., "ttft_ms": ..., "total_ms": ..., "stages": [...], "caches": {...}}
+        with the full answer, the timings and the per-stage breakdown of this query.
+        :param chain: The RAG chain created by create_rag_chain.
+        :param question: The question to ask.
+        :return: Generator of event dictionaries.
+        """
+        print(f"❓ Streaming RAG Chain answer for question: {question}")
+        started = time.perf_counter()
+        first_token_at = None
+        tokens = []
+        shortcut = False
+
+        # Every step of the chain runs in a context carrying this query's trace, so the stages
+        # record into it even though the consumer may resume this generator from other threads
+        context, trace = get_instrumentation().new_trace_context()
+        chunks = context.run(chain.stream, question)
+        while True:
+            chunk = context.run(next, chunks, None)
+            if chunk is None:
+                break
+            if "documents" in chunk:
+                yield {"type": "documents", "documents": chunk["documents"]}
+            if "faq" in chunk:
+                shortcut = True
+                yield {"type": "faq", "match": chunk["faq"]}
+            if "packed" in chunk:
+                yield {"type": "context", "stats": chunk["packed"]["stats"]}
+            if chunk.get("answer"):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                tokens.append(chunk["answer"])
+                yield {"type": "token", "text": chunk["answer"]}
+
+        finished = time.perf_counter()
+        if self.faq_index is not None:
+            self.faq_index.record_latency(finished - started, shortcut=shortcut)
+        yield {"type": "done",
+               "answer": "".join(tokens),
+               "ttft_ms": ((first_token_at or finished) - started) * 1000,
+               "total_ms": (finished - started) * 1000,
+               **trace.breakdown()}
+
+    def create_answer_chain(self, llm=None):
+        """
+        Create the generation part of the RAG chain, from retrieved documents to the answer.
+        The context is packed under the token budget, reusing inputs["packed"] when the caller
+        already packed it.
+        :param llm: Chat model to answer with, defaults to self.llm.
+        :return: Runnable taking {"documents", "question"} and producing the answer string.
+        """
+        llm = llm or self.llm
+
+        instrumentation = get_instrumentation()
+
+        def build_prompt_inputs(inputs):
+            packed = inputs.get("packed") or self.context_packer.pack(inputs["documents"])
+            return {"context": packed["context"], "question": inputs["question"]}
+
+        def generate(inputs, config):
+            """
+            Format the prompt and stream the LLM answer as separate stages. The LLM stage records the
+            time to first token and the prompt/completion token counts, taken from the model's usage
+            metadata when it reports them and counted with the local tokenizer otherwise.
+            """
+            with instrumentation.stage("format_prompt"):
+                prompt = self.prompt_template.invoke(build_prompt_inputs(inputs), config)
+
+            with instrumentation.stage("llm") as stage:
+                started = time.perf_counter()
+                usage = None
+                answer = []
+                for message in llm.stream(prompt, config):
+                    if message.usage_metadata:
+                        usage = add_usage(usage, message.usage_metadata)
+                    text = message.content if isinstance(message.content, str) else self.output_parser.invoke(message)
+                    if text:
+                        if not answer:
+                            stage.set("ttft_ms", (time.perf_counter() - started) * 1000)
+                        answer.append(text)
+                        yield text
+
+                if stage.enabled:
+                    if usage:
+                        stage.set("prompt_tokens", usage["input_tokens"])
+                        stage.set("completion_tokens", usage["output_tokens"])
+                    else:
+                        stage.set("prompt_tokens", count_tokens(prompt.to_string()))
+                        stage.set("completion_tokens", count_tokens("".join(answer)))
+
+        return RunnableLambda(generate, name="answer")
+
+    async def abatch_query(self, questions, vs_manager, k=None, answer_cache=None, concurrency=None,
+                           requests_per_second=None, faq_index=None):
+        """
+        Answer many questions at once.
+        All questions are embedded in one batched pass and retrieved with one vectorized search,
+        followed by the configured hybrid fusion and reranking per question, then the LLM calls run
+        concurrently, bounded by a semaphore and a token-bucket rate limiter, and failed calls are
+        retried with exponential backoff.
+        :param questions: List of questions.
+        :param vs_manager: VectorStoreManager (or ShardedIndexManager) providing the embeddings and batch_retrieve.
+        :param k: Number of documents retrieved per question, defaults to Config.SEARCH_K.
+        :param answer_cache: Optional AnswerCache consulted before each LLM call.
+        :param concurrency: Maximum number of LLM calls in flight, defaults to Config.LLM_CONCURRENCY.
+        :param requests_per_second: LLM call rate limit, defaults to Config.LLM_REQUESTS_PER_SECOND.
+        :param faq_index: Optional FaqIndex; matching questions get the stored answer and skip
+            retrieval and the LLM.
+        :return: One {"question", "documents", "answer", "error"} dictionary per question, in order.
+        """
+        from RagFromScratch.src.concurrency import TokenBucket, retry_with_backoff
+        from RagFromScratch.src.config import Config
+
+        questions = list(questions)
+        if not questions:
+            return []
+
+        concurrency = concurrency or Config.LLM_CONCURRENCY
+        requests_per_second = Config.LLM_REQUESTS_PER_SECOND if requests_per_second is None else requests_per_second
+        print(f"📦 Answering {len(questions)} questions (concurrency={concurrency}, "
+              f"rate limit={requests_per_second or 'none'}/s)...")
+
+        # Known FAQ questions are answered directly, only the others are embedded and retrieved
+        matches = [None] * len(questions)
+        if faq_index is not None:
+            matches = await asyncio.to_thread(lambda: [faq_index.match(question) for question in questions])
+        unmatched = [question for question, match in zip(questions, matches) if match is None]
+
+        documents_per_question = []
+        query_vectors = []
+        if unmatched:
+            query_vectors = await asyncio.to_thread(vs_manager.embeddings.embed_documents, unmatched)
+            documents_per_question = await asyncio.to_thread(vs_manager.batch_retrieve, unmatched, query_vectors, k)
+        retrieved = iter(zip(documents_per_question, query_vectors))
+        retrieved = [next(retrieved) if match is None else (None, None) for match in matches]
+
+        # retry_with_backoff bounds the attempts, the client must not multiply them
+        answer_chain = self.create_answer_chain(without_client_retries(self.llm))
+        semaphore = asyncio.Semaphore(concurrency)
+        rate_limiter = TokenBucket(requests_per_second)
+
+        async def answer(question, match, documents, query_vector):
+            if match is not None:
+                return {"question": question, "documents": [faq_document(match)], "answer": match["response"],
+                        "error": None, "faq": match}
+
+            result = {"question": question, "documents": documents, "answer": None, "error": None}
+            # The cache lookup reuses the batched query vector and stays off the event loop
+            if answer_cache is not None:
+                result["answer"] = await asyncio.to_thread(answer_cache.get, question, documents, query_vector)
+                if result["answer"] is not None:
+                    return result
+
+            async def call_llm():
+                await rate_limiter.acquire()
+                return await answer_chain.ainvoke({"question": question, "documents": documents})
+
+            async with semaphore:
+                try:
+                    result["answer"] = await retry_with_backoff(call_llm)
+                except Exception as e:
+                    result["error"] = str(e)
+                    print(f"❌ Failed to answer '{question}': {e}")
+                    return result
+
+            if answer_cache is not None:
+                await asyncio.to_thread(answer_cache.put, question, documents, result["answer"], query_vector)
+            return result
+
+        results = await asyncio.gather(*(answer(question, match, documents, query_vector)
+                                         for question, match, (documents, query_vector) in zip(questions, matches,
+                                                                                               retrieved)))
+        failed = sum(1 for result in results if result["error"])
+        shortcuts = len(questions) - len(unmatched)
+        print(f"✅ Answered {len(results) - failed}/{len(results)} questions"
+              + (f" ({shortcuts} from the FAQ)." if shortcuts else "."))
+        return results
 
     def query(self, chain, question):
         """
@@ -92,15 +320,31 @@ class RAGSystemChain:
         :param question: The question to ask.
         :return: The generated answer.
         """
+        result = self.query_with_sources(chain, question)
+        return result["answer"] if result else None
+
+    def query_with_sources(self, chain, question):
+        """
+        Query the RAG chain and keep the documents the answer was generated from.
+        :param chain: The RAG chain to query.
+        :param question: The question to ask.
+        :return: Dictionary with the question, the retrieved documents and the answer.
+        """
         try:
             print(f"❓ Querying RAG Chain with question: {question}")
-            return chain.invoke(question)
+            started = time.perf_counter()
+            result = chain.invoke(question)
+            if self.faq_index is not None:
+                self.faq_index.record_latency(time.perf_counter() - started, shortcut="faq" in result)
+            return result
 
         except Exception as e:
             print(f"Error printing question: {e}")
 
 
 if __name__ == "__main__":
+    from RagFromScratch.src.vector_store_local import VectorStoreManager
+
     print("Testing the rag System chain...")
 
     try:
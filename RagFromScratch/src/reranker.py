@@ -0,0 +1,154 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from RagFromScratch.src.hybrid_retriever import chunk_id_of
+from RagFromScratch.src.instrumentation import get_instrumentation
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs with a small local cross-encoder.
+    All candidates of a query go through the model in a single batched forward pass, and scores
+    are kept in an LRU cache keyed by the query and chunk so repeated questions cost nothing.
+    """
+
+    def __init__(self, model_name=None, device=None, max_length=None, cache_max_entries=None):
+        from RagFromScratch.src.config import Config
+
+        self.model_name = model_name or Config.RERANKER_MODEL
+        self.device = device or Config.RERANKER_DEVICE
+        self.max_length = max_length or Config.RERANKER_MAX_LENGTH
+        self.cache_max_entries = cache_max_entries or Config.RERANK_CACHE_MAX_ENTRIES
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._scores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.forward_passes = 0
+
+    @property
+    def model(self):
+        """The cross-encoder, loaded on first use so the reranker costs nothing until it is needed."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    print(f"Loading reranker model '{self.model_name}' on {self.device}...")
+                    self._model = CrossEncoder(self.model_name, device=self.device, max_length=self.max_length)
+        return self._model
+
+    @staticmethod
+    def _cache_key(query, doc):
+        chunk_key = chunk_id_of(doc) or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        return query, chunk_key
+
+    def score(self, query, documents):
+        """
+        Cross-encoder relevance scores for the documents, from the cache where possible.
+        :param query: Query text.
+        :param documents: Candidate documents.
+        :return: List of scores aligned with documents, higher is more relevant.
+        """
+        keys = [self._cache_key(query, doc) for doc in documents]
+        scores = [None] * len(documents)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[i] = self._scores[key]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.hits += len(documents) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            pairs = [(query, documents[i].page_content) for i in missing]
+            predicted = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            self.forward_passes += 1
+            with self._lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    self._scores[keys[i]] = scores[i]
+                while len(self._scores) > self.cache_max_entries:
+                    self._scores.popitem(last=False)
+        return scores
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "forward_passes": self.forward_passes,
+                "entries": len(self._scores)}
+
+
+def score_margin(search_type):
+    """
+    First-stage score gap that skips reranking for a search type. Cosine similarities span [-1, 1]
+    while RRF scores are at most 2 / (HYBRID_RRF_K + 1), so each score type has its own margin.
+    :param search_type: "similarity" or "hybrid".
+    :return: Margin for RerankingRetriever, 0 = always rerank.
+    """
+    from RagFromScratch.src.config import Config
+
+    return Config.RERANK_RRF_MARGIN if search_type == "hybrid" else Config.RERANK_SCORE_MARGIN
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Two-stage retriever: over-fetch `fetch_k` candidates from the first stage, rerank them with a
+    cross-encoder and keep the top `k`.
+    When the first-stage score gap between the k-th and (k+1)-th candidate is at least `margin`,
+    the top k are already clearly separated from the rest and the reranker is skipped; the margin
+    must be on the scale of the first-stage scores, see score_margin().
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    search_with_scores: Any  # Callable (query, k) -> list of (document, score), best first
+    reranker: Any
+    k: int = 4
+    fetch_k: int = 20
+    margin: float = 0.0
+    skipped: int = 0
+    reranked: int = 0
+    _counter_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def _count(self, counter):
+        # Server threads share one retriever
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def rerank(self, query, candidates):
+        """
+        Second stage over already retrieved candidates, e.g. after a batched first-stage search.
+        :param query: Query text.
+        :param candidates: List of (document, first-stage score) pairs, best first.
+        :return: The top k documents.
+        """
+        if len(candidates) <= self.k:
+            return [doc for doc, _ in candidates]
+
+        first_stage_gap = candidates[self.k - 1][1] - candidates[self.k][1]
+        if self.margin > 0 and first_stage_gap >= self.margin:
+            self._count("skipped")
+            return [doc for doc, _ in candidates[:self.k]]
+
+        self._count("reranked")
+        documents = [doc for doc, _ in candidates]
+        with get_instrumentation().stage("rerank") as stage:
+            scores = self.reranker.score(query, documents)
+            stage.set("candidates", len(documents))
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)[:self.k]
+        return [documents[i] for i in order]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return self.rerank(query, self.search_with_scores(query, max(self.k, self.fetch_k)))
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from RagFromScratch.src.instrumentation import get_instrumentation
+from RagFromScratch.src.streaming import format_sse, serialize_event
+
+_END_OF_STREAM = object()
+
+
+class QueryRequest(BaseModel):
+    question: str
+
+
+class BatchRequest(BaseModel):
+    questions: list[str]
+
+
+class QueryServer:
+    """
+    HTTP front end for an initialized RAGFromScratchApp.
+    The embedding model, vector store handle and RAG chain are loaded once and shared by every
+    request. Chain calls run on a fixed pool of worker threads, so concurrent requests overlap
+    their LLM calls while query embeddings are micro-batched into single model calls. Requests
+    beyond `max_pending` admitted ones are rejected with 429 instead of queueing without bound,
+    and requests exceeding `request_timeout` seconds are answered with 504.
+    """
+
+    def __init__(self, rag_app, workers=None, max_pending=None, request_timeout=None, max_batch=None):
+        from RagFromScratch.src.config import Config
+
+        self.rag_app = rag_app
+        self.workers = workers or Config.SERVER_WORKERS
+        self.max_pending = max_pending or Config.SERVER_MAX_PENDING
+        self.request_timeout = request_timeout or Config.SERVER_REQUEST_TIMEOUT
+        self.max_batch = max_batch or Config.SERVER_MAX_BATCH
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-query")
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._pending_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Admission control
+    # ------------------------------------------------------------------
+
+    def _admit(self, slots=1):
+        with self._pending_lock:
+            if self.pending + slots > self.max_pending:
+                self.rejected += 1
+                raise HTTPException(status_code=429, detail="Server is busy, retry later.",
+                                    headers={"Retry-After": "1"})
+            self.pending += slots
+
+    def _release(self, slots=1):
+        with self._pending_lock:
+            self.pending -= slots
+
+    async def _run_with_timeout(self, awaitable):
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HTTPException(status_code=504, detail=f"No answer within {self.request_timeout:.0f}s.")
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+
+    def _query(self, question):
+        result = self.rag_app.rag_system.query_with_sources(self.rag_app.chain, question)
+        if result is None:
+            raise RuntimeError("The RAG chain failed to answer.")
+        return self.rag_app.result_row(result)
+
+    async def query(self, request: QueryRequest):
+        self._admit()
+        try:
+            # The worker thread keeps running after a timeout, its slot is freed when it is done
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self._query, request.question)
+            future.add_done_callback(lambda _: self._release())
+        except Exception:
+            self._release()
+            raise
+        try:
+            return await self._run_with_timeout(asyncio.shield(future))
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def batch(self, request: BatchRequest):
+        if len(request.questions) > self.max_batch:
+            raise HTTPException(status_code=413, detail=f"At most {self.max_batch} questions per batch.")
+        slots = max(1, len(request.questions))
+        self._admit(slots)
+        try:
+            # Like a single query, the batch keeps running after a timeout and frees its slots when done
+            task = asyncio.ensure_future(self.rag_app.abatch_query(request.questions))
+            task.add_done_callback(lambda _: self._release(slots))
+        except Exception:
+            self._release(slots)
+            raise
+        results = await self._run_with_timeout(asyncio.shield(task))
+        return {"results": [self.rag_app.result_row(result) for result in results or []]}
+
+    def _produce_events(self, question, events, stop):
+        """Run the streamed chain call on a worker thread, handing its events to the response."""
+        try:
+            stream = self.rag_app.stream_query(question)
+            if stream is None:
+                raise RuntimeError("The RAG chain is not initialized.")
+            try:
+                for event in stream:
+                    if stop.is_set():
+                        return
+                    events.put(event)
+            finally:
+                stream.close()
+        except Exception as e:
+            events.put({"type": "error", "error": str(e)})
+        finally:
+            events.put(_END_OF_STREAM)
+
+    def _stream_events(self, events, stop, response_format):
+        """
+        Generator of encoded stream frames. Waiting for the next event is bounded by the time left
+        until the deadline, so a stalled LLM call still ends the stream in time.
+        """
+        if response_format == "ndjson":
+            encode = lambda event: json.dumps(serialize_event(event), ensure_ascii=False) + "\n"
+        else:
+            encode = format_sse
+
+        deadline = time.monotonic() + self.request_timeout
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self.timed_out += 1
+                    yield encode({"type": "error", "error": f"No answer within {self.request_timeout:.0f}s."})
+                    return
+                if event is _END_OF_STREAM:
+                    return
+                yield encode(event)
+        finally:
+            # Also reached when the client disconnects, the worker stops at its next event
+            stop.set()
+
+    async def stream(self, request: QueryRequest, format: str = "sse"):
+        self._admit()
+        events = queue.Queue()
+        stop = threading.Event()
+        try:
+            # As for /query, the slot is freed when the worker thread is done
+            future = self.executor.submit(self._produce_events, request.question, events, stop)
+            future.add_done_callback(lambda _: self._release())
+        except Exception:
+            self._release()
+            raise
+        media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+        return StreamingResponse(self._stream_events(events, stop, format), media_type=media_type)
+
+    async def health(self):
+        vs_manager = self.rag_app.vs_manager
+        return {"status": "ok",
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "workers": self.workers,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "index_version": getattr(vs_manager, "index_version", None)}
+
+    async def metrics(self):
+        body = get_instrumentation().metrics_text()
+        if body is None:
+            raise HTTPException(status_code=404, detail="Metrics are disabled, set INSTRUMENTATION=prometheus.")
+        return Response(content=body, media_type="text/plain; version=0.0.4")
+
+    def build_app(self):
+        app = FastAPI(title="RAG From Scratch")
+        app.add_api_route("/query", self.query, methods=["POST"])
+        app.add_api_route("/batch", self.batch, methods=["POST"])
+        app.add_api_route("/stream", self.stream, methods=["POST"])
+        app.add_api_route("/health", self.health, methods=["GET"])
+        app.add_api_route("/metrics", self.metrics, methods=["GET"])
+        app.add_event_handler("shutdown", lambda: self.executor.shutdown(wait=False))
+        return app
+
+
+def run_server(rag_app, host=None, port=None):
+    """
+    Serve an initialized RAGFromScratchApp over HTTP until interrupted.
+    :param rag_app: RAGFromScratchApp after initialize_environment().
+    :param host: Bind address, defaults to Config.SERVER_HOST.
+    :param port: Port, defaults to Config.SERVER_PORT.
+    """
+    import uvicorn
+
+    from RagFromScratch.src.config import Config
+
+    server = QueryServer(rag_app)
+    host = host or Config.SERVER_HOST
+    port = port or Config.SERVER_PORT
+    print(f"🌐 Serving /query, /batch and /stream on http://{host}:{port} "
+          f"({server.workers} workers, max {server.max_pending} pending requests)")
+    uvicorn.run(server.build_app(), host=host, port=port, log_level="warning")
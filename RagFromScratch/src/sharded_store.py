@@ -0,0 +1,525 @@
+import contextvars
+import heapq
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from RagFromScratch.src.embedding_cache import CachedEmbeddings
+from RagFromScratch.src.hybrid_retriever import chunk_id_of, reciprocal_rank_fusion
+from RagFromScratch.src.instrumentation import get_instrumentation
+from RagFromScratch.src.numpy_vector_store import NumpyVectorStore
+from RagFromScratch.src.reranker import CrossEncoderReranker, RerankingRetriever, score_margin
+from RagFromScratch.src.vector_store_local import VectorStoreManager
+
+
+def parse_collections(spec):
+    """
+    Parse a collection definition such as "tenant_a=../data/tenant_a;docs=../data/documents".
+    :param spec: Semicolon-separated name=folder pairs.
+    :return: Mapping of collection name -> data folder, in definition order.
+    """
+    collections = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        name, separator, folder = entry.partition("=")
+        if not separator or not name.strip() or not folder.strip():
+            raise ValueError(f"Invalid collection definition '{entry}', expected name=folder.")
+        collections[name.strip()] = folder.strip()
+    return collections
+
+
+def shard_of(source, num_shards):
+    """Stable shard number of a source file, so a file always lands in the same shard."""
+    return zlib.crc32(source.encode("utf-8")) % num_shards
+
+
+class ShardFiles:
+    """
+    DocumentProcessor view restricted to the files of one shard. Building and syncing a shard walk
+    the collection folder through it, so each shard is ingested independently of the others.
+    """
+
+    def __init__(self, processor, shard, num_shards):
+        self.processor = processor
+        self.shard = shard
+        self.num_shards = num_shards
+
+    def iter_files(self, folder_path):
+        for file_path, source in self.processor.iter_files(folder_path):
+            if shard_of(source, self.num_shards) == self.shard:
+                yield file_path, source
+
+    def __getattr__(self, name):
+        return getattr(self.processor, name)
+
+
+class Shard:
+    """
+    One independently built and loaded part of a collection: a VectorStoreManager over its own
+    directory plus a summary of the metadata values it contains, used to prune it from searches.
+    """
+
+    SUMMARY_FILE = "summary.json"
+    SUMMARY_MAX_VALUES = 1024  # Keys with more distinct values than this are not used for pruning
+
+    def __init__(self, collection, number, root, embeddings):
+        self.collection = collection
+        self.number = number
+        self.directory = os.path.join(root, collection, f"shard_{number:03d}")
+        self.manager = VectorStoreManager(persist_directory=os.path.join(self.directory, "store"),
+                                          embeddings=embeddings)
+        self.summary = self._load_summary()
+
+    @property
+    def name(self):
+        return f"{self.collection}/{self.number}"
+
+    def _load_summary(self):
+        summary_path = os.path.join(self.directory, self.SUMMARY_FILE)
+        if not os.path.exists(summary_path):
+            return None
+        with open(summary_path, "r", encoding="utf-8") as summary_file:
+            return json.load(summary_file)
+
+    def write_summary(self):
+        """Record the chunk count and the distinct scalar metadata values of the shard."""
+        values = {}
+        overflowing = set()
+        chunks = 0
+        for metadata in VectorStoreManager._iter_store_metadatas(self.manager.get_vector_store()):
+            chunks += 1
+            for key, value in metadata.items():
+                if key in overflowing or not isinstance(value, (str, int, float, bool)):
+                    continue
+                key_values = values.setdefault(key, set())
+                key_values.add(value)
+                if len(key_values) > self.SUMMARY_MAX_VALUES:
+                    overflowing.add(key)
+                    del values[key]
+
+        self.summary = {"collection": self.collection,
+                        "shard": self.number,
+                        "chunks": chunks,
+                        "values": {key: sorted(key_values, key=str) for key, key_values in values.items()},
+                        "unbounded_keys": sorted(overflowing)}
+        with open(os.path.join(self.directory, self.SUMMARY_FILE), "w", encoding="utf-8") as summary_file:
+            json.dump(self.summary, summary_file, ensure_ascii=False)
+
+    def may_match(self, filter):
+        """
+        False when the shard is empty or its summary proves no chunk can match the equality filter.
+        :param filter: Dict of metadata key -> required value, or None.
+        """
+        if self.summary is None:
+            return True
+        if not self.summary["chunks"]:
+            return False
+        if not filter:
+            return True
+        for key, value in filter.items():
+            if key in self.summary["unbounded_keys"]:
+                continue
+            if value not in self.summary["values"].get(key, ()):
+                return False
+        return True
+
+    def _relevance(self, vector_store):
+        # Chroma reports distances, the NumPy store cosine similarities; both become "higher is better"
+        return vector_store._select_relevance_score_fn()
+
+    @staticmethod
+    def _chroma_where(filter):
+        if not filter:
+            return None
+        conditions = [{key: value} for key, value in filter.items()]
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def search_by_vector(self, vector, k, filter=None):
+        """
+        :return: List of (document, relevance score) pairs, best first.
+        """
+        vector_store = self.manager.get_vector_store()
+        if isinstance(vector_store, NumpyVectorStore):
+            return vector_store.similarity_search_with_score_by_vector(vector, k=k, filter=filter or None)
+
+        relevance = self._relevance(vector_store)
+        results = vector_store.similarity_search_by_vector_with_relevance_scores(
+            vector, k=k, filter=self._chroma_where(filter))
+        return [(doc, relevance(distance)) for doc, distance in results]
+
+    def search_lexical(self, query, k):
+        """
+        BM25 search of the shard.
+        :return: List of (chunk_id, BM25 score, shard) triples, best first.
+        """
+        lexical_index = self.manager.get_lexical_index()
+        if lexical_index is None:
+            print(f"⚠️ No lexical index found for shard {self.name}, rebuilding it from the vector store...")
+            lexical_index = self.manager._lexical_index = self.manager.rebuild_lexical_index(
+                self.manager.get_vector_store())
+        return [(chunk_id, score, self) for chunk_id, score in lexical_index.search(query, k=k)]
+
+    def search_candidates(self, query, vector, k):
+        """Dense and lexical candidate lists of the shard, fused globally by ShardedIndexManager."""
+        return self.search_by_vector(vector, k), self.search_lexical(query, k)
+
+    def batch_search_by_vector(self, vectors, k):
+        """
+        :return: One list of (document, relevance score) pairs per query vector, best first.
+        """
+        vector_store = self.manager.get_vector_store()
+        if isinstance(vector_store, NumpyVectorStore):
+            return vector_store.batch_similarity_search_with_score_by_vector(vectors, k=k)
+
+        relevance = self._relevance(vector_store)
+        response = vector_store._collection.query(query_embeddings=[list(vector) for vector in vectors],
+                                                  n_results=k, include=["documents", "metadatas", "distances"])
+        return [[(Document(id=chunk_id, page_content=text, metadata=metadata or {}), relevance(distance))
+                 for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances)]
+                for ids, texts, metadatas, distances in zip(response["ids"], response["documents"],
+                                                            response["metadatas"], response["distances"])]
+
+
+class ShardedRetriever(BaseRetriever):
+    """Retriever over the selected collections of a ShardedIndexManager, see its search_with_scores."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: Any
+    k: int = 4
+    search_type: str = "similarity"
+    collections: Optional[list] = None
+    filter: Optional[dict] = None
+
+    def search_with_scores(self, query, k=None):
+        return self.index.search_with_scores(query, k=k or self.k, search_type=self.search_type,
+                                             collections=self.collections, filter=self.filter)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return [doc for doc, _ in self.search_with_scores(query)]
+
+
+class ShardedIndexManager:
+    """
+    Several named collections (tenants, document sets), each split into shards that are built,
+    synced and loaded independently. Files are assigned to shards by a stable hash of their source.
+    A query fans out to the selected shards on a thread pool, where the matrix products release
+    the GIL, and the per-shard top-k lists are merged with a heap. Shards whose metadata summary
+    cannot satisfy the filter are pruned before any search runs, so with bounded shard sizes the
+    search latency stays flat as collections grow.
+    Offers the VectorStoreManager methods used by the application, so it can replace it.
+    """
+
+    def __init__(self, collections=None, num_shards=None, root=None, workers=None, micro_batch_queries=False):
+        """
+        :param collections: Mapping of collection name -> data folder, defaults to Config.COLLECTIONS.
+        :param num_shards: Shards per collection, defaults to Config.SHARDS_PER_COLLECTION.
+        :param root: Directory holding the shards, defaults to Config.SHARD_ROOT.
+        :param workers: Threads searching shards in parallel, defaults to Config.SHARD_SEARCH_WORKERS.
+        :param micro_batch_queries: Merge concurrent query embeddings into single model calls (servers).
+        """
+        from RagFromScratch.src.config import Config
+
+        self.collections = collections or parse_collections(Config.COLLECTIONS)
+        if not self.collections:
+            raise ValueError("No collections configured, set COLLECTIONS=name=folder;other=folder.")
+        self.num_shards = num_shards or Config.SHARDS_PER_COLLECTION
+        self.root = root or Config.SHARD_ROOT
+        self.query_collections = [name for name in Config.QUERY_COLLECTIONS.split(",") if name.strip()] or None
+
+        # One embedding stack for every shard, the model is loaded once
+        self.embeddings = VectorStoreManager.create_embeddings(micro_batch_queries)
+        self.shards = {(collection, number): Shard(collection, number, self.root, self.embeddings)
+                       for collection in self.collections for number in range(self.num_shards)}
+        self.executor = ThreadPoolExecutor(max_workers=workers or Config.SHARD_SEARCH_WORKERS,
+                                           thread_name_prefix="rag-shard")
+        self._retrievers = {}
+        self._reranker = None
+        self._lock = threading.Lock()
+        print(f"🧩 Sharded index: {len(self.collections)} collections x {self.num_shards} shards in {self.root}")
+
+    @property
+    def index_version(self):
+        """Changes whenever any shard is rebuilt or synced."""
+        return sum(shard.manager.index_version for shard in self.shards.values())
+
+    def exists(self):
+        return any(shard.manager.exists() for shard in self.shards.values())
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def build_shard(self, collection, number, processor):
+        """
+        Rebuild one shard from its files of the collection folder, leaving the other shards untouched.
+        :return: Number of chunks written.
+        """
+        shard = self.shards[(collection, number)]
+        files = ShardFiles(processor, number, self.num_shards)
+        chunk_count = shard.manager.build_vector_store_streaming(files, self.collections[collection])
+        shard.write_summary()
+        return chunk_count
+
+    def build_vector_store_streaming(self, processor, folder_path=None, collections=None):
+        """
+        Rebuild every shard of the given collections.
+        :param processor: DocumentProcessor defining chunking and supported formats.
+        :param folder_path: Unused, each collection is built from its own folder; kept so the
+            application can call both managers the same way.
+        :param collections: Names of the collections to rebuild, defaults to all of them.
+        :return: Total number of chunks written.
+        """
+        return sum(self.build_shard(collection, number, processor)
+                   for collection in collections or self.collections
+                   for number in range(self.num_shards))
+
+    def sync_vector_store(self, processor, folder_path=None, collections=None):
+        """
+        Incrementally sync every shard of the given collections with its folder.
+        :return: Dictionary with the summed sync statistics of the shards.
+        """
+        totals = {}
+        for collection in collections or self.collections:
+            for number in range(self.num_shards):
+                shard = self.shards[(collection, number)]
+                stats = shard.manager.sync_vector_store(ShardFiles(processor, number, self.num_shards),
+                                                        self.collections[collection])
+                if any(stats.values()) or shard.summary is None:
+                    shard.write_summary()
+                for key, value in stats.items():
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    # ------------------------------------------------------------------
+    # Searching
+    # ------------------------------------------------------------------
+
+    def select_shards(self, collections=None, filter=None):
+        """
+        Shards to search: those of the selected collections whose summary can satisfy the filter.
+        A "collection" key in the filter selects collections as well.
+        :return: Tuple of (shards to search, number of built shards pruned by the filter).
+        """
+        filter = dict(filter or {})
+        wanted = collections or self.query_collections or list(self.collections)
+        if "collection" in filter:
+            required = filter.pop("collection")
+            wanted = [name for name in wanted if name == required]
+
+        candidates = [shard for (collection, _), shard in self.shards.items()
+                      if collection in wanted and shard.manager.exists()]
+        selected = [shard for shard in candidates if shard.may_match(filter)]
+        return selected, len(candidates) - len(selected)
+
+    def _fan_out(self, shards, search):
+        """Run search(shard) on every shard in parallel, each in a copy of the caller's context."""
+        futures = [self.executor.submit(contextvars.copy_context().run, search, shard) for shard in shards]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _merge(result_lists, k):
+        """Top k of several best-first (document, score) lists, merged lazily with a heap."""
+        return list(islice(heapq.merge(*result_lists, key=lambda result: result[1], reverse=True), k))
+
+    def _search_hybrid(self, shards, query, k, vector=None):
+        """
+        Hybrid search over several shards: every shard returns its own dense and BM25 candidates,
+        each candidate list is merged globally and reciprocal rank fusion runs once on the merged
+        rankings, so the fused scores do not depend on how the chunks are spread over the shards.
+        BM25 statistics are per shard, which shards of a similar size and mix keep comparable.
+        :param vector: Embedding of the query, computed when not given.
+        :return: List of (document, rrf_score) pairs, best first.
+        """
+        from RagFromScratch.src.config import Config
+
+        fetch_k = max(k, Config.HYBRID_FETCH_K)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+        candidates = self._fan_out(shards, lambda shard: shard.search_candidates(query, vector, fetch_k))
+        dense = self._merge([dense_results for dense_results, _ in candidates], fetch_k)
+        lexical = self._merge([lexical_results for _, lexical_results in candidates], fetch_k)
+
+        scores, documents = reciprocal_rank_fusion([doc for doc, _ in dense],
+                                                   [chunk_id for chunk_id, _, _ in lexical], Config.HYBRID_RRF_K)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+
+        # Chunks only found lexically are fetched by ID from the shard that found them
+        owners = {chunk_id: shard for chunk_id, _, shard in lexical}
+        missing = {}
+        for chunk_id in ranked:
+            if chunk_id not in documents:
+                missing.setdefault(owners[chunk_id], []).append(chunk_id)
+        for shard, chunk_ids in missing.items():
+            for doc in shard.manager.get_vector_store().get_by_ids(chunk_ids):
+                documents[chunk_id_of(doc)] = doc
+
+        return [(documents[chunk_id], scores[chunk_id]) for chunk_id in ranked if chunk_id in documents]
+
+    def search_with_scores(self, query, k=4, search_type="similarity", collections=None, filter=None):
+        """
+        Search the selected collections.
+        :param query: Query text.
+        :param k: Number of results.
+        :param search_type: "similarity" (vector search) or "hybrid" (BM25 + vectors fused by RRF over all shards).
+        :param collections: Names of the collections to search, defaults to Config.QUERY_COLLECTIONS or all.
+        :param filter: Dict of metadata equality conditions; prunes shards, then filters chunks.
+        :return: List of (document, score) pairs, best first.
+        """
+        with get_instrumentation().stage("shard_fanout") as stage:
+            shards, pruned = self.select_shards(collections, filter)
+            stage.set("shards", len(shards))
+            stage.set("pruned", pruned)
+            if not shards:
+                return []
+
+            shard_filter = {key: value for key, value in (filter or {}).items() if key != "collection"}
+            if search_type == "hybrid":
+                if shard_filter:
+                    raise ValueError("Metadata filters are only supported for 'similarity' search.")
+                results = self._search_hybrid(shards, query, k)
+            elif search_type == "similarity":
+                vector = self.embeddings.embed_query(query)
+                result_lists = self._fan_out(shards, lambda shard: shard.search_by_vector(vector, k, shard_filter))
+                results = self._merge(result_lists, k)
+            else:
+                raise ValueError(f"Sharded search supports 'similarity' and 'hybrid', not '{search_type}'.")
+
+            stage.set("candidates", len(results))
+        return results
+
+    def batch_similarity_search_with_scores(self, query_vectors, k=None, collections=None):
+        """
+        Retrieve documents for many already-embedded queries: every shard searches all queries in
+        one vectorized call, then the results are merged per query.
+        :return: One list of (document, relevance score) pairs per query, best first.
+        """
+        from RagFromScratch.src.config import Config
+
+        k = k or Config.SEARCH_K
+        if not len(query_vectors):
+            return []
+        shards, _ = self.select_shards(collections)
+        per_shard = self._fan_out(shards, lambda shard: shard.batch_search_by_vector(query_vectors, k))
+        return [self._merge([results[query] for results in per_shard], k) for query in range(len(query_vectors))]
+
+    def batch_similarity_search(self, query_vectors, k=None, collections=None):
+        """
+        See batch_similarity_search_with_scores.
+        :return: One list of documents per query.
+        """
+        return [[doc for doc, _ in results]
+                for results in self.batch_similarity_search_with_scores(query_vectors, k, collections)]
+
+    def batch_retrieve(self, questions, query_vectors, k=None, search_type=None, rerank=None, collections=None):
+        """
+        Retrieve documents for many questions the way get_retriever() does for one, see
+        VectorStoreManager.batch_retrieve. Hybrid candidates are fused per question over all shards.
+        :return: One list of documents per question.
+        """
+        from RagFromScratch.src.config import Config
+
+        k = k or Config.SEARCH_K
+        search_type = search_type or Config.SEARCH_TYPE
+        rerank = Config.USE_RERANKER if rerank is None else rerank
+        candidates_k = max(k, Config.RERANK_FETCH_K) if rerank else k
+        if search_type == "hybrid":
+            shards, _ = self.select_shards(collections)
+            candidates = [self._search_hybrid(shards, question, candidates_k, vector) if shards else []
+                          for question, vector in zip(questions, query_vectors)]
+        elif search_type == "similarity":
+            candidates = self.batch_similarity_search_with_scores(query_vectors, candidates_k, collections)
+        else:
+            raise ValueError(f"Sharded search supports 'similarity' and 'hybrid', not '{search_type}'.")
+
+        if rerank:
+            reranker = self.get_retriever(search_type=search_type, k=k, rerank=True, collections=collections)
+            return [reranker.rerank(question, results) for question, results in zip(questions, candidates)]
+        return [[doc for doc, _ in results[:k]] for results in candidates]
+
+    def get_reranker(self):
+        """Return the shared cross-encoder reranker, created on first use."""
+        if self._reranker is None:
+            with self._lock:
+                if self._reranker is None:
+                    self._reranker = CrossEncoderReranker()
+        return self._reranker
+
+    def get_retriever(self, search_type="similarity", k=4, rerank=None, collections=None, filter=None):
+        """
+        Retriever searching the selected collections of all shards.
+        :param search_type: "similarity" or "hybrid".
+        :param k: Number of documents, defaults to Config.SEARCH_K.
+        :param rerank: Over-fetch candidates and rerank them with the cross-encoder, defaults to Config.USE_RERANKER.
+        :param collections: Names of the collections to search, defaults to Config.QUERY_COLLECTIONS or all.
+        :param filter: Dict of metadata equality conditions.
+        :return: ShardedRetriever, wrapped in a RerankingRetriever when reranking.
+        """
+        from RagFromScratch.src.config import Config
+
+        k = k or Config.SEARCH_K
+        rerank = Config.USE_RERANKER if rerank is None else rerank
+        retriever_key = (search_type, k, rerank, tuple(collections or ()), tuple(sorted((filter or {}).items())))
+        if retriever_key in self._retrievers:
+            return self._retrievers[retriever_key]
+
+        retriever = ShardedRetriever(index=self, k=k, search_type=search_type, collections=collections,
+                                     filter=filter)
+        if rerank:
+            retriever = RerankingRetriever(search_with_scores=retriever.search_with_scores,
+                                           reranker=self.get_reranker(),
+                                           k=k,
+                                           fetch_k=max(k, Config.RERANK_FETCH_K),
+                                           margin=score_margin(search_type))
+        with self._lock:
+            self._retrievers[retriever_key] = retriever
+        return retriever
+
+    def get_embedding_cache_stats(self):
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.stats()
+        return None
+
+    def print_embedding_cache_stats(self):
+        stats = self.get_embedding_cache_stats()
+        if stats is not None:
+            print(f"   - Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+
+    def get_doc_count(self):
+        """Total number of chunks over all shards, from the shard summaries."""
+        doc_count = 0
+        for shard in self.shards.values():
+            if shard.summary is None and shard.manager.exists():
+                shard.write_summary()
+            doc_count += shard.summary["chunks"] if shard.summary else 0
+        print(f"Sharded index contains {doc_count} documents in {len(self.shards)} shards.")
+        return doc_count
+
+    def shard_report(self):
+        """One {"shard", "chunks", "built"} row per shard, for status output."""
+        return [{"shard": shard.name,
+                 "chunks": shard.summary["chunks"] if shard.summary else 0,
+                 "built": shard.manager.exists()} for shard in self.shards.values()]
+
+
+if __name__ == "__main__":
+    from RagFromScratch.src.document_processor import DocumentProcessor
+
+    index = ShardedIndexManager()
+    if not index.exists():
+        index.build_vector_store_streaming(DocumentProcessor())
+    for row in index.shard_report():
+        print(row)
+    for doc, score in index.search_with_scores("What is this document about?", k=4):
+        print(f"{score:.3f} {doc.metadata.get('source')}")
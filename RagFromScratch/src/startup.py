@@ -0,0 +1,54 @@
+import time
+
+# Taken before anything else is imported, so the "imports" phase covers all of them
+PROCESS_STARTED_AT = time.perf_counter()
+
+import threading  # noqa: E402
+from contextlib import contextmanager  # noqa: E402
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase takes (imports, config, store, model load, ...).
+    Phases are recorded in the order they finish; the same phase name can be recorded more than
+    once, e.g. when a lazily loaded model is only needed later on.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def since_process_start(self):
+        return time.perf_counter() - PROCESS_STARTED_AT
+
+    def report(self):
+        """
+        Print the recorded phases and the time since the process started.
+        :return: Dictionary of phase name to milliseconds, plus "total_ms".
+        """
+        with self._lock:
+            phases = list(self.phases)
+        timings = {}
+        for name, seconds in phases:
+            timings[name] = timings.get(name, 0.0) + seconds * 1000
+        timings["total_ms"] = self.since_process_start() * 1000
+
+        print("⏱️ Startup timings: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items()
+                                                if name != "total_ms")
+              + f" | total {timings['total_ms']:.0f} ms")
+        return timings
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,38 @@
+import json
+
+
+def serialize_event(event):
+    """
+    Turn a stream event from RAGSystemChain.stream_query into a JSON-serializable dictionary.
+    Documents are reduced to their source and chunk ID so the payload stays small.
+    :param event: Event dictionary.
+    :return: JSON-serializable dictionary.
+    """
+    if event["type"] != "documents":
+        return event
+    return {"type": "documents",
+            "documents": [{"source": doc.metadata.get("source"),
+                           "chunk_id": getattr(doc, "id", None) or doc.metadata.get("chunk_id")}
+                          for doc in event["documents"]]}
+
+
+def format_sse(event):
+    """
+    Format one stream event as a server-sent events frame.
+    :param event: Event dictionary.
+    :return: The SSE frame as a string.
+    """
+    payload = serialize_event(event)
+    return f"event: {payload['type']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def iter_sse(events):
+    """Generator of SSE frames for a stream of events, ready for a chunked HTTP response."""
+    for event in events:
+        yield format_sse(event)
+
+
+def iter_ndjson(events):
+    """Generator of newline-delimited JSON lines, for clients that do not speak SSE."""
+    for event in events:
+        yield json.dumps(serialize_event(event), ensure_ascii=False) + "\n"
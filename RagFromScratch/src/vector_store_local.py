@@ -1,99 +1,612 @@
 import os
+import shutil
+import tempfile
+import threading
 
-# from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
-
-from langchain_chroma import Chroma
-from Secrets.openai_key import google_api_key
-
-GOOGLE_API_KEY = google_api_key
+from RagFromScratch.src.bm25_index import BM25Index
+from RagFromScratch.src.embedding_cache import CachedEmbeddings
+from RagFromScratch.src.hybrid_retriever import HybridRetriever
+from RagFromScratch.src.index_manifest import IndexManifest
+from RagFromScratch.src.lazy_embeddings import LazyEmbeddings
+from RagFromScratch.src.micro_batching import MicroBatchingEmbeddings
+from RagFromScratch.src.numpy_vector_store import NumpyVectorStore
+from RagFromScratch.src.reranker import CrossEncoderReranker, RerankingRetriever, score_margin
 
 
 class VectorStoreManager:
-    def __init__(self, persist_directory=None):
+    def __init__(self, persist_directory=None, micro_batch_queries=False, embeddings=None):
+        """
+        :param persist_directory: Store location, defaults to Config.PERSIST_DIRECTORY. An explicit
+            directory keeps its manifest and lexical index beside it instead of at the configured paths.
+        :param micro_batch_queries: Merge concurrent query embeddings into single model calls (servers).
+        :param embeddings: Embeddings to share with other managers, e.g. the shards of a collection.
+        """
         from RagFromScratch.src.config import Config
 
         self.persist_directory = persist_directory or Config.PERSIST_DIRECTORY
+        self.backend = Config.VECTOR_STORE_BACKEND
+        self.vector_dtype = Config.VECTOR_DTYPE
+        self.ann_index_type = Config.ANN_INDEX_TYPE or None
+        self.quantization = Config.VECTOR_QUANTIZATION or None
+
+        # Long-lived store handle and retrievers, shared by every query instead of reopened per call
+        self._vector_store = None
+        self._retrievers = {}
+        self._handle_lock = threading.Lock()
+        # Bumped whenever the indexed content changes, caches keyed on the index compare against it
+        self.index_version = 0
+
+        if persist_directory:
+            self.manifest_path = persist_directory.rstrip("/\\") + "_manifest.json"
+            self.lexical_index_path = persist_directory.rstrip("/\\") + "_bm25.npz"
+        else:
+            self.manifest_path = Config.MANIFEST_PATH
+            self.lexical_index_path = Config.BM25_INDEX_PATH
+        self._lexical_index = None
+        self._reranker = None
 
         # Create storage directory if it doesn't exist
         os.makedirs(os.path.dirname(self.persist_directory), exist_ok=True)
-        print(f"Initializing VectorStoreManager with persist directory: {self.persist_directory}")
+        print(f"Initializing VectorStoreManager with persist directory: {self.persist_directory} "
+              f"(backend: {self.backend})")
+
+        self.embeddings = embeddings or self.create_embeddings(micro_batch_queries)
+
+    @classmethod
+    def create_embeddings(cls, micro_batch_queries=False):
+        """
+        Build the embedding stack: the lazily loaded model, optionally micro-batched, behind the cache.
+        :param micro_batch_queries: Merge concurrent query embeddings into single model calls.
+        :return: Embeddings instance.
+        """
+        from RagFromScratch.src.config import Config
+
+        # The model is only imported and loaded when something actually has to be embedded
+        embeddings = LazyEmbeddings(cls._create_embedding_model)
+        if micro_batch_queries:
+            # Servers merge the query embeddings of concurrent requests into one model call
+            embeddings = MicroBatchingEmbeddings(embeddings)
+        if Config.EMBEDDING_BACKEND == "onnx":
+            # Quantized vectors differ slightly, so they are cached apart from the PyTorch ones
+            cache_model_name = f"{Config.EMBEDDING_MODEL}@onnx{'-int8' if Config.ONNX_QUANTIZE else ''}"
+        else:
+            cache_model_name = Config.EMBEDDING_MODEL
+        if Config.USE_EMBEDDING_CACHE:
+            # Documents and queries both go through the cache, only misses reach the model
+            embeddings = CachedEmbeddings(embeddings,
+                                          model_name=cache_model_name,
+                                          normalize=True)
+        return embeddings
+
+    def exists(self):
+        """True if the store was built before and can be loaded."""
+        return os.path.exists(self.persist_directory)
 
-        self.embeddings = HuggingFaceEmbeddings(
+    @staticmethod
+    def _create_embedding_model():
+        from RagFromScratch.src.config import Config
+
+        if Config.EMBEDDING_BACKEND == "onnx":
+            from RagFromScratch.src.onnx_embeddings import OnnxEmbeddings
+
+            return OnnxEmbeddings(model_name=Config.EMBEDDING_MODEL, normalize=True)
+
+        # from langchain_community.embeddings import HuggingFaceEmbeddings
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
             model_name=Config.EMBEDDING_MODEL,
             model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True}
+            encode_kwargs={"normalize_embeddings": True, "batch_size": Config.EMBEDDING_BATCH_SIZE}
         )
 
     def create_vector_store(self, documents):
         """
         Create a vector store from the given documents. 
-        This method will generate embeddings for the documents and store them in a Chroma vector store.
+        This method will generate embeddings for the documents and store them in the configured vector store.
         :param documents: 
         :return: 
         """
         try:
             print(f"🏗️ Creating vector store with {len(documents)} chunks...")
 
-            vector_store = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=self.persist_directory
-            )
+            chunk_ids = [doc.metadata.get("chunk_id") for doc in documents]
+            if self.backend == "numpy":
+                vector_store = NumpyVectorStore.from_documents(
+                    documents=documents,
+                    embedding=self.embeddings,
+                    persist_directory=self.persist_directory,
+                    dtype=self.vector_dtype,
+                    ann_index_type=self.ann_index_type,
+                    quantization=self.quantization,
+                    ids=chunk_ids if all(chunk_ids) else None
+                )
+            else:
+                from langchain_chroma import Chroma
+
+                vector_store = Chroma.from_documents(
+                    documents=documents,
+                    embedding=self.embeddings,
+                    persist_directory=self.persist_directory,
+                    ids=chunk_ids if all(chunk_ids) else None
+                )
             # vector_store.persist()
 
+            if all(chunk_ids):
+                manifest = IndexManifest(self.manifest_path)
+                manifest.reset_from_chunks(documents)
+                manifest.save()
+            self._set_vector_store(vector_store)
+
             print(f"✅ Vector store created successfully!")
             print(f"   - Location: {self.persist_directory}")
             print(f"   - Documents: {len(documents)}")
+            self.print_embedding_cache_stats()
 
             return vector_store
         except Exception as e:
             print(f"❌ An error occurred while creating the vector store: {e}")
             raise
 
+    def build_vector_store_streaming(self, processor, folder_path):
+        """
+        Rebuild the vector store from a folder with the streaming ingestion pipeline.
+        Files are parsed in parallel and embedded batch by batch as they arrive, instead of
+        loading and chunking the whole corpus before embedding starts. The new store is written
+        next to the current one and only swapped in once complete, so a failed rebuild leaves the
+        previous store and its manifest untouched.
+        :param processor: DocumentProcessor defining chunk size, overlap and supported formats.
+        :param folder_path: Root folder of the documents, walked recursively.
+        :return: Number of chunks written to the vector store.
+        """
+        from RagFromScratch.src.ingestion_pipeline import IngestionPipeline
+
+        print(f"🏗️ Streaming documents from {folder_path} into the vector store...")
+        # A fresh name per build: Chroma keeps one client per path for the life of the process
+        store_path = self.persist_directory.rstrip("/\\")
+        building_directory = tempfile.mkdtemp(prefix=os.path.basename(store_path) + ".building-",
+                                              dir=os.path.dirname(store_path) or ".")
+        vector_store = self._open_vector_store(create=True, persist_directory=building_directory)
+
+        manifest = IndexManifest(self.manifest_path)
+        manifest.files = {}
+        lexical_index = BM25Index()
+        parse_snapshot = processor.get_parsed_cache_stats()
+
+        def write_batch(chunks, vectors):
+            chunk_ids = [chunk.metadata["chunk_id"] for chunk in chunks]
+            texts = [chunk.page_content for chunk in chunks]
+            if isinstance(vector_store, NumpyVectorStore):
+                vector_store.add_embeddings(texts, vectors, metadatas=[chunk.metadata for chunk in chunks],
+                                            ids=chunk_ids)
+            else:
+                metadatas = [{key: value for key, value in chunk.metadata.items()
+                              if isinstance(value, (str, int, float, bool))} for chunk in chunks]
+                vector_store._collection.upsert(ids=chunk_ids, embeddings=vectors,
+                                                metadatas=metadatas, documents=texts)
+            for chunk_id, text in zip(chunk_ids, texts):
+                lexical_index.add(chunk_id, text)
+            for chunk in chunks:
+                source = chunk.metadata["source"]
+                entry = manifest.files.setdefault(source, {"hash": chunk.metadata["file_hash"], "chunk_ids": []})
+                entry["chunk_ids"].append(chunk.metadata["chunk_id"])
+
+        try:
+            stats = IngestionPipeline(processor=processor).run(folder_path, self.embeddings, write_batch)
+            if isinstance(vector_store, NumpyVectorStore):
+                vector_store.persist()
+        except BaseException:
+            shutil.rmtree(building_directory, ignore_errors=True)
+            raise
+        del vector_store
+
+        self._replace_directory(building_directory)
+        manifest.save()
+        self._set_vector_store(self._open_vector_store(), lexical_index.build())
+
+        print(f"✅ Vector store created successfully!")
+        print(f"   - Location: {self.persist_directory}")
+        print(f"   - Chunks: {stats['chunks']} in {stats['batches']} batches")
+        processor.print_parsed_cache_stats(since=parse_snapshot)
+        self.print_embedding_cache_stats()
+        return stats["chunks"]
+
+    def _replace_directory(self, building_directory):
+        """Swap a completely written store directory in place of the persisted one."""
+        old_directory = self.persist_directory.rstrip("/\\") + ".old"
+        shutil.rmtree(old_directory, ignore_errors=True)
+        if os.path.exists(self.persist_directory):
+            os.replace(self.persist_directory, old_directory)
+        os.replace(building_directory, self.persist_directory)
+        # Readers still mapping the old files keep them until they reopen the store
+        shutil.rmtree(old_directory, ignore_errors=True)
+
+        if self.backend != "numpy":
+            from chromadb.api.shared_system_client import SharedSystemClient
+
+            # Drop the cached clients of both paths, the one of the persist directory still has the old files open
+            for path in (building_directory, self.persist_directory):
+                SharedSystemClient._identifier_to_system.pop(path, None)
+
+    def _open_vector_store(self, create=False, persist_directory=None):
+        """
+        Open the vector store of the configured backend for writing.
+        :param create: Start from an empty store instead of the persisted one.
+        :param persist_directory: Directory to open, defaults to the store's persist directory.
+        :return: Chroma or NumpyVectorStore instance.
+        """
+        persist_directory = persist_directory or self.persist_directory
+        if self.backend == "numpy":
+            if create or not os.path.exists(os.path.join(persist_directory, NumpyVectorStore.MATRIX_FILE)):
+                return NumpyVectorStore(self.embeddings, persist_directory=persist_directory,
+                                        dtype=self.vector_dtype, ann_index_type=self.ann_index_type,
+                                        quantization=self.quantization)
+            return NumpyVectorStore.load(persist_directory, self.embeddings, ann_index_type=self.ann_index_type,
+                                         quantization=self.quantization)
+
+        from langchain_chroma import Chroma
+
+        vector_store = Chroma(persist_directory=persist_directory, embedding_function=self.embeddings)
+        if create:
+            vector_store.reset_collection()
+        return vector_store
+
     def load_vector_store(self):
         """
         Load an existing vector store from the persist directory. 
-        This method will return a Chroma vector store if it exists, otherwise it will raise an error.
+        This method will return a Chroma or NumPy vector store if it exists, otherwise it will raise an error.
         :return: 
         """""
         if not os.path.exists(self.persist_directory):
             raise FileNotFoundError(f"Vector store not found at {self.persist_directory}. Please create it first.")
 
-        loaded_vector_store = Chroma(
-            persist_directory=self.persist_directory,
-            embedding_function=self.embeddings,
-        )
+        if self.backend == "numpy":
+            loaded_vector_store = NumpyVectorStore.load(self.persist_directory, self.embeddings,
+                                                        ann_index_type=self.ann_index_type,
+                                                        quantization=self.quantization)
+        else:
+            from langchain_chroma import Chroma
+
+            loaded_vector_store = Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embeddings,
+            )
         print(f"Vector store loaded from {self.persist_directory}.")
         return loaded_vector_store
 
-    def get_retriever(self, search_type="similarity", k=4):
+    def get_vector_store(self):
+        """
+        Return the shared vector store handle, opening it from disk only on first use.
+        The handle is safe to share across threads and is replaced when the store is rebuilt or synced.
+        :return: The loaded vector store.
+        """
+        if self._vector_store is None:
+            with self._handle_lock:
+                if self._vector_store is None:
+                    self._vector_store = self.load_vector_store()
+        return self._vector_store
+
+    def _set_vector_store(self, vector_store, lexical_index=None):
+        """
+        Swap in a freshly written store with its lexical index and drop the retrievers bound to the old one.
+        :param vector_store: The new store.
+        :param lexical_index: BM25Index already updated with the store's chunks, persisted beside it;
+            rebuilt from the store when not given.
+        """
+        if lexical_index is None:
+            lexical_index = self.rebuild_lexical_index(vector_store)
+        else:
+            self._save_lexical_index(lexical_index)
+        with self._handle_lock:
+            self._vector_store = vector_store
+            self._lexical_index = lexical_index
+            self._retrievers = {}
+            self.index_version += 1
+
+    @staticmethod
+    def _iter_store_texts(vector_store, page_size=5000):
+        """Generator of (chunk_id, text) pairs for every chunk in the store, read page by page."""
+        if isinstance(vector_store, NumpyVectorStore):
+            yield from vector_store.iter_texts()
+            return
+
+        offset = 0
+        while True:
+            page = vector_store._collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            yield from zip(page["ids"], page["documents"])
+            offset += len(page["ids"])
+
+    @staticmethod
+    def _iter_store_metadatas(vector_store, page_size=5000):
+        """Generator of the metadata dictionary of every chunk in the store, read page by page."""
+        if isinstance(vector_store, NumpyVectorStore):
+            yield from vector_store.iter_metadatas()
+            return
+
+        offset = 0
+        while True:
+            page = vector_store._collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            yield from (metadata or {} for metadata in page["metadatas"])
+            offset += len(page["ids"])
+
+    def rebuild_lexical_index(self, vector_store):
+        """
+        Build the BM25 index over every chunk in the store and persist it beside the store.
+        :param vector_store: The vector store whose chunks are indexed.
+        :return: The new BM25Index.
+        """
+        lexical_index = BM25Index()
+        for chunk_id, text in self._iter_store_texts(vector_store):
+            lexical_index.add(chunk_id, text or "")
+        lexical_index.build()
+        self._save_lexical_index(lexical_index)
+        return lexical_index
+
+    def _save_lexical_index(self, lexical_index):
+        lexical_index.save(self.lexical_index_path)
+        print(f"   - Lexical index: {len(lexical_index)} chunks, {len(lexical_index.vocabulary)} terms")
+
+    def get_lexical_index(self):
+        """
+        Return the BM25 index, loading it from disk on first use.
+        :return: BM25Index, or None if the store was built before lexical indexing existed.
+        """
+        if self._lexical_index is None:
+            with self._handle_lock:
+                if self._lexical_index is None:
+                    self._lexical_index = BM25Index.load(self.lexical_index_path)
+        return self._lexical_index
+
+    def sync_vector_store(self, processor, folder_path):
+        """
+        Incrementally sync the vector store with the files in a folder.
+        Only chunks of new or changed files that are not already indexed get embedded,
+        and the chunks of removed files are deleted. Files that fail to load keep their indexed chunks
+        and manifest entry, so they are retried on the next sync. The manifest next to the persist directory
+        records which file hashes and chunk IDs are currently in the store.
+        :param processor: DocumentProcessor used to load and chunk the changed files.
+        :param folder_path: Folder containing the source documents.
+        :return: Dictionary with the number of added, changed and removed files and chunks.
+        """
+        manifest = IndexManifest(self.manifest_path)
+        if not manifest.exists() and os.path.exists(self.persist_directory):
+            print("⚠️ No index manifest found for the existing vector store. "
+                  "Run with --rebuild once if the store was built before incremental sync existed.")
+
+        current_hashes = {}
+        file_paths = {}
+        for file_path, source in processor.iter_files(folder_path):
+            current_hashes[source] = IndexManifest.hash_file(file_path)
+            file_paths[source] = file_path
+
+        added, changed, removed = manifest.diff(current_hashes)
+        stats = {"added_files": len(added), "changed_files": len(changed), "removed_files": len(removed),
+                 "failed_files": 0, "embedded_chunks": 0, "deleted_chunks": 0}
+
+        if not (added or changed or removed):
+            print("✅ Vector store is up to date, nothing to sync.")
+            return stats
+
+        print(f"🔄 Syncing vector store: {len(added)} new, {len(changed)} changed, {len(removed)} removed files...")
+        vector_store = self._open_vector_store()
+        # Updated with the changed chunks only, on a copy so running searches keep the current one
+        lexical_index = self.get_lexical_index()
+        lexical_index = lexical_index.copy() if lexical_index is not None else None
+        parse_snapshot = processor.get_parsed_cache_stats()
+
+        # Stale chunks of every file are collected first and deleted in one call, since a delete can
+        # cost as much as rewriting the whole store
+        stale_ids = []
+        for source in removed:
+            source_ids = manifest.chunk_ids(source)
+            stale_ids.extend(source_ids)
+            manifest.remove(source)
+            print(f"   - Removed {len(source_ids)} chunks of deleted file {source}")
+
+        pending = []
+        for source in added + changed:
+            documents = processor.load_file(file_paths[source], source=source, file_hash=current_hashes[source])
+            if not documents:
+                # Keep the indexed chunks and the old manifest entry, so the file is retried on the next sync
+                stats["failed_files"] += 1
+                print(f"   - ⚠️ {source}: nothing loaded, keeping its indexed chunks until it loads again")
+                continue
+            chunks = processor.chunk_documents(documents)
+            chunk_ids = [chunk.metadata["chunk_id"] for chunk in chunks]
+
+            old_ids = set(manifest.chunk_ids(source))
+            source_stale_ids = list(old_ids.difference(chunk_ids))
+            new_chunks = [chunk for chunk in chunks if chunk.metadata["chunk_id"] not in old_ids]
+            stale_ids.extend(source_stale_ids)
+            pending.append((source, chunk_ids, new_chunks, len(source_stale_ids)))
+
+        if stale_ids:
+            vector_store.delete(ids=stale_ids)
+            if lexical_index is not None:
+                lexical_index.delete(stale_ids)
+        stats["deleted_chunks"] = len(stale_ids)
+
+        for source, chunk_ids, new_chunks, stale_count in pending:
+            if new_chunks:
+                vector_store.add_documents(new_chunks, ids=[chunk.metadata["chunk_id"] for chunk in new_chunks])
+            if lexical_index is not None:
+                for chunk in new_chunks:
+                    lexical_index.add(chunk.metadata["chunk_id"], chunk.page_content)
+
+            stats["embedded_chunks"] += len(new_chunks)
+            manifest.update(source, current_hashes[source], chunk_ids)
+            print(f"   - {source}: {len(new_chunks)} chunks embedded, {stale_count} removed, "
+                  f"{len(chunk_ids) - len(new_chunks)} unchanged")
+
+        if isinstance(vector_store, NumpyVectorStore):
+            vector_store.persist()
+        manifest.save()
+        self._set_vector_store(vector_store, lexical_index.build() if lexical_index is not None else None)
+        print(f"✅ Vector store synced: {stats['embedded_chunks']} chunks embedded, "
+              f"{stats['deleted_chunks']} chunks deleted, {stats['failed_files']} files failed to load.")
+        processor.print_parsed_cache_stats(since=parse_snapshot)
+        self.print_embedding_cache_stats()
+        return stats
+
+    def get_reranker(self):
+        """Return the shared cross-encoder reranker, created on first use."""
+        if self._reranker is None:
+            with self._handle_lock:
+                if self._reranker is None:
+                    self._reranker = CrossEncoderReranker()
+        return self._reranker
+
+    def get_retriever(self, search_type="similarity", k=4, rerank=None):
         """
         Get a retriever from the given vector store. 
         This method will return a retriever that can be used to query the vector store for relevant documents.
-        :param search_type: 
+        :param search_type: "similarity", "mmr", "similarity_score_threshold" or "hybrid" (BM25 + vectors)
         :param k: 
+        :param rerank: Over-fetch candidates and rerank them with the cross-encoder, defaults to Config.USE_RERANKER.
         :return: 
         """
         from RagFromScratch.src.config import Config
 
         k = k or Config.SEARCH_K  # Use default from config if k is not provided
+        rerank = Config.USE_RERANKER if rerank is None else rerank
+        retriever_key = (search_type, k, rerank)
+        if retriever_key in self._retrievers:
+            return self._retrievers[retriever_key]
+
         print(f"Creating retriever with search type '{search_type}' and k={k}...")
 
-        retriever_vector_store = self.load_vector_store()
+        retriever_vector_store = self.get_vector_store()
 
-        retrieved_store = retriever_vector_store.as_retriever(
-            search_type=search_type,
-            search_kwargs={"k": k}
-        )
+        if search_type == "hybrid":
+            lexical_index = self.get_lexical_index()
+            if lexical_index is None:
+                print("⚠️ No lexical index found, rebuilding it from the vector store...")
+                lexical_index = self._lexical_index = self.rebuild_lexical_index(retriever_vector_store)
+            retrieved_store = HybridRetriever(vector_store=retriever_vector_store,
+                                              lexical_index=lexical_index,
+                                              k=k,
+                                              fetch_k=max(k, Config.HYBRID_FETCH_K),
+                                              rrf_k=Config.HYBRID_RRF_K)
+        else:
+            retrieved_store = retriever_vector_store.as_retriever(
+                search_type=search_type,
+                search_kwargs={"k": k}
+            )
+
+        if rerank:
+            if search_type == "hybrid":
+                search_with_scores = retrieved_store.search_with_scores
+            elif search_type == "similarity":
+                search_with_scores = lambda query, fetch_k: \
+                    retriever_vector_store.similarity_search_with_relevance_scores(query, k=fetch_k)
+            else:
+                raise ValueError(f"Reranking is supported for 'similarity' and 'hybrid' search, not '{search_type}'.")
+            retrieved_store = RerankingRetriever(search_with_scores=search_with_scores,
+                                                 reranker=self.get_reranker(),
+                                                 k=k,
+                                                 fetch_k=max(k, Config.RERANK_FETCH_K),
+                                                 margin=score_margin(search_type))
+        with self._handle_lock:
+            self._retrievers[retriever_key] = retrieved_store
 
-        print("Retriever created from the vector store with search type '{}' and k={}".format(search_type, k))
+        print("Retriever created from the vector store with search type '{}' and k={}{}".format(
+            search_type, k, " (reranked)" if rerank else ""))
         return retrieved_store
 
+    def batch_similarity_search_with_scores(self, query_vectors, k=None):
+        """
+        Retrieve documents for many already-embedded queries in one vectorized call.
+        The NumPy backend scores all queries with a single matrix product per block, Chroma receives
+        all query embeddings in one collection query.
+        :param query_vectors: One embedding per query.
+        :param k: Number of documents per query, defaults to Config.SEARCH_K.
+        :return: One list of (document, relevance score) pairs per query, best first.
+        """
+        from langchain_core.documents import Document
+        from RagFromScratch.src.config import Config
+
+        k = k or Config.SEARCH_K
+        vector_store = self.get_vector_store()
+        if not len(query_vectors):
+            return []
+
+        if isinstance(vector_store, NumpyVectorStore):
+            return vector_store.batch_similarity_search_with_score_by_vector(query_vectors, k=k)
+
+        relevance = vector_store._select_relevance_score_fn()
+        response = vector_store._collection.query(query_embeddings=[list(vector) for vector in query_vectors],
+                                                  n_results=k, include=["documents", "metadatas", "distances"])
+        return [[(Document(id=chunk_id, page_content=text, metadata=metadata or {}), relevance(distance))
+                 for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances)]
+                for ids, texts, metadatas, distances in zip(response["ids"], response["documents"],
+                                                            response["metadatas"], response["distances"])]
+
+    def batch_similarity_search(self, query_vectors, k=None):
+        """
+        See batch_similarity_search_with_scores.
+        :return: One list of documents per query.
+        """
+        return [[doc for doc, _ in results] for results in self.batch_similarity_search_with_scores(query_vectors, k)]
+
+    def batch_retrieve(self, questions, query_vectors, k=None, search_type=None, rerank=None):
+        """
+        Retrieve documents for many questions the way get_retriever() does for one: the dense search
+        of all questions runs as one vectorized call, then BM25 fusion and reranking run per question.
+        :param questions: Question texts.
+        :param query_vectors: One embedding per question.
+        :param k: Number of documents per question, defaults to Config.SEARCH_K.
+        :param search_type: "similarity" or "hybrid", defaults to Config.SEARCH_TYPE.
+        :param rerank: Rerank the candidates with the cross-encoder, defaults to Config.USE_RERANKER.
+        :return: One list of documents per question.
+        """
+        from RagFromScratch.src.config import Config
+
+        k = k or Config.SEARCH_K
+        search_type = search_type or Config.SEARCH_TYPE
+        rerank = Config.USE_RERANKER if rerank is None else rerank
+        if search_type not in ("similarity", "hybrid"):
+            retriever = self.get_retriever(search_type=search_type, k=k, rerank=rerank)
+            return [retriever.invoke(question) for question in questions]
+
+        candidates_k = max(k, Config.RERANK_FETCH_K) if rerank else k
+        if search_type == "hybrid":
+            hybrid = self.get_retriever(search_type="hybrid", k=k, rerank=False)
+            dense = self.batch_similarity_search(query_vectors, max(candidates_k, hybrid.fetch_k))
+            candidates = [hybrid.fuse(question, docs, candidates_k) for question, docs in zip(questions, dense)]
+        else:
+            candidates = self.batch_similarity_search_with_scores(query_vectors, candidates_k)
+
+        if rerank:
+            reranker = self.get_retriever(search_type=search_type, k=k, rerank=True)
+            return [reranker.rerank(question, results) for question, results in zip(questions, candidates)]
+        return [[doc for doc, _ in results[:k]] for results in candidates]
+
+    def get_embedding_cache_stats(self):
+        """
+        Hit/miss counters of the embedding cache, or None when the cache is disabled.
+        :return:
+        """
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.stats()
+        return None
+
+    def print_embedding_cache_stats(self):
+        stats = self.get_embedding_cache_stats()
+        if stats is not None:
+            print(f"   - Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+
     def get_doc_count(self):
         try:
-            doc_vector_store = self.load_vector_store()
-            doc_count = doc_vector_store._collection.count()
+            doc_vector_store = self.get_vector_store()
+            if isinstance(doc_vector_store, NumpyVectorStore):
+                doc_count = doc_vector_store.count()
+            else:
+                doc_count = doc_vector_store._collection.count()
             print(f"Vector store contains {doc_count} documents.")
             return doc_count
         except FileNotFoundError:
@@ -106,7 +619,6 @@ class VectorStoreManager:
 
 if __name__ == "__main__":
     from document_processor import DocumentProcessor
-    from Secrets.openai_key import google_api_key
 
     processor = DocumentProcessor()
     docs = processor.load_documents("../data/documents")
@@ -0,0 +1,185 @@
+import os
+import secrets
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+
+def parse_address(address):
+    """'host:port' becomes a TCP address, anything else is used as a Unix socket path."""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return host or "localhost", int(port)
+    return address
+
+
+def resolve_authkey(authkey=None, create=False):
+    """
+    Secret the worker and its clients authenticate with. Connections unpickle what they receive,
+    so there is no shared default: an explicit WARM_WORKER_AUTHKEY is used as is, otherwise the
+    worker generates a random key into WARM_WORKER_KEY_FILE, readable by its own user only.
+    :param authkey: Explicit key, defaults to Config.WARM_WORKER_AUTHKEY.
+    :param create: Write a new random key (worker side) instead of reading the existing one (client side).
+    :return: Key bytes, or None on the client side when no key file exists.
+    """
+    from RagFromScratch.src.config import Config
+
+    authkey = authkey or Config.WARM_WORKER_AUTHKEY
+    if authkey:
+        return authkey
+
+    key_file = Config.WARM_WORKER_KEY_FILE
+    if create:
+        directory = os.path.dirname(key_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(key_file):
+            os.remove(key_file)  # Recreated below so the 0600 mode always applies
+        authkey = secrets.token_hex(32).encode("ascii")
+        with os.fdopen(os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as key:
+            key.write(authkey)
+        return authkey
+
+    if not os.path.exists(key_file):
+        return None
+    with open(key_file, "rb") as key:
+        return key.read().strip()
+
+
+class WarmWorker:
+    """
+    Long-lived process that keeps an initialized RAGFromScratchApp (vector store handle, embedding
+    model, LLM client, caches) and answers requests from short-lived CLI invocations over a
+    multiprocessing connection, so those invocations skip the heavy imports and model loads.
+    Requests are dictionaries with an "op" ("ping", "query", "batch", "shutdown"); every connection
+    is served on its own thread.
+    """
+
+    def __init__(self, app, address=None, authkey=None):
+        from RagFromScratch.src.config import Config
+
+        self.app = app
+        self.address = parse_address(address or Config.WARM_WORKER_ADDRESS)
+        self.authkey = resolve_authkey(authkey, create=True)
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._listener = None
+
+    def serve_forever(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)  # Stale socket of a previous worker
+
+        self._listener = Listener(self.address, authkey=self.authkey)
+        print(f"🔥 Warm worker listening on {self.address} (pid {os.getpid()})")
+        try:
+            while not self._stop.is_set():
+                try:
+                    connection = self._listener.accept()
+                except AuthenticationError:
+                    continue  # A client without the key, keep serving the others
+                if self._stop.is_set():
+                    connection.close()
+                    break
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def stop(self):
+        """Stop accepting connections; the blocking accept() is woken up with a dummy connection."""
+        self._stop.set()
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+
+    def _serve_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    response = self.handle(request)
+                except Exception as e:
+                    response = {"error": f"{e.__class__.__name__}: {e}"}
+                connection.send(response)
+                if request.get("op") == "shutdown":
+                    self.stop()
+                    return
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime_s": time.time() - self.started_at}
+        if op == "query":
+            return {"result": self.app.batch_rows([request["question"]])[0]}
+        if op == "batch":
+            return {"results": self.app.batch_rows(request["questions"])}
+        if op == "shutdown":
+            return {"ok": True}
+        raise ValueError(f"Unknown warm worker operation '{op}'.")
+
+
+class WarmWorkerClient:
+    """Connection to a running WarmWorker, see WarmWorkerClient.connect."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @classmethod
+    def connect(cls, address=None, authkey=None):
+        """
+        Connect to a warm worker if one is running.
+        :param address: 'host:port' or Unix socket path, defaults to Config.WARM_WORKER_ADDRESS.
+        :param authkey: Shared secret, defaults to Config.WARM_WORKER_AUTHKEY or the worker's key file.
+        :return: WarmWorkerClient, or None when no address is configured or nobody is listening.
+        """
+        from RagFromScratch.src.config import Config
+
+        address = address or Config.WARM_WORKER_ADDRESS
+        authkey = resolve_authkey(authkey)
+        if not address or authkey is None:
+            return None
+        try:
+            connection = Client(parse_address(address), authkey=authkey)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return None
+        except AuthenticationError:
+            print("⚠️ The warm worker rejected the authentication key (WARM_WORKER_AUTHKEY / WARM_WORKER_KEY_FILE).")
+            return None
+        return cls(connection)
+
+    def request(self, op, **payload):
+        self.connection.send({"op": op, **payload})
+        response = self.connection.recv()
+        if "error" in response:
+            raise RuntimeError(f"Warm worker failed: {response['error']}")
+        return response
+
+    def ping(self):
+        return self.request("ping")
+
+    def query(self, question):
+        return self.request("query", question=question)["result"]
+
+    def batch(self, questions):
+        return self.request("batch", questions=questions)["results"]
+
+    def shutdown(self):
+        return self.request("shutdown")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
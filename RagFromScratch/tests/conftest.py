@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Modules import each other as RagFromScratch.src.*, so the folder above the project must be importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from RagFromScratch.benchmarks.stubs import HashingEmbeddings  # noqa: E402
+from RagFromScratch.src.config import Config  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def offline_config(monkeypatch, tmp_path):
+    """Keep every test on the NumPy backend and away from the caches and models of the working copy."""
+    monkeypatch.setattr(Config, "VECTOR_STORE_BACKEND", "numpy")
+    monkeypatch.setattr(Config, "ANN_INDEX_TYPE", "")
+    monkeypatch.setattr(Config, "VECTOR_QUANTIZATION", "")
+    monkeypatch.setattr(Config, "USE_PARSED_CACHE", False)
+    monkeypatch.setattr(Config, "USE_EMBEDDING_CACHE", False)
+    monkeypatch.setattr(Config, "INGEST_WORKERS", 1)
+    monkeypatch.setattr(Config, "PERSIST_DIRECTORY", str(tmp_path / "storage" / "store"))
+    monkeypatch.setattr(Config, "MANIFEST_PATH", str(tmp_path / "storage" / "store_manifest.json"))
+    monkeypatch.setattr(Config, "BM25_INDEX_PATH", str(tmp_path / "storage" / "store_bm25.npz"))
+
+
+@pytest.fixture
+def embeddings():
+    return HashingEmbeddings(dimension=64)
+
+
+@pytest.fixture
+def documents_folder(tmp_path):
+    """Folder of small text files, each about its own topic."""
+    folder = tmp_path / "documents"
+    folder.mkdir()
+    for number in range(5):
+        (folder / f"topic{number}.txt").write_text(f"Document {number} explains topic{number} in detail. " * 20,
+                                                   encoding="utf-8")
+    return folder
@@ -0,0 +1,35 @@
+from langchain_core.documents import Document
+
+from RagFromScratch.src.answer_cache import AnswerCache
+
+
+class ConstantEmbeddings:
+    """Every question gets the same vector, so only the guards decide whether a cached answer is reused."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def documents(*ids):
+    return [Document(id=chunk_id, page_content=f"Text of {chunk_id}.") for chunk_id in ids]
+
+
+def answer_cache():
+    cache = AnswerCache(embeddings=ConstantEmbeddings(), max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("How do I apply the 50/30/20 rule?", documents("a", "b"), "cached answer")
+    return cache
+
+
+def test_similar_question_over_overlapping_documents_hits():
+    assert answer_cache().get("How can I apply the 50/30/20 rule?", documents("b", "c")) == "cached answer"
+
+
+def test_similar_question_over_other_documents_misses():
+    assert answer_cache().get("How can I apply the 50/30/20 rule?", documents("c", "d")) is None
+
+
+def test_question_with_other_numbers_or_a_negation_misses():
+    cache = answer_cache()
+    assert cache.get("How do I apply the 60/30/10 rule?", documents("a", "b")) is None
+    assert cache.get("How do I not apply the 50/30/20 rule?", documents("a", "b")) is None
+    assert cache.stats()["semantic_hits"] == 0
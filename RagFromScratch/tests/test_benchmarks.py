@@ -0,0 +1,65 @@
+"""
+pytest-benchmark wrappers around the stages of benchmarks/run_benchmarks.py, so the stages can be
+tracked with `pytest --benchmark-autosave` and compared with `--benchmark-compare`.
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from RagFromScratch.benchmarks.run_benchmarks import BenchmarkSuite  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def suite(tmp_path_factory):
+    return BenchmarkSuite(chunks=2000, queries=100, batch_size=32, llm_latency_ms=0.0, e2e_queries=20,
+                          work_dir=str(tmp_path_factory.mktemp("benchmarks")))
+
+
+def prepare(suite, *stages):
+    """Run the stages a benchmark depends on, unless an earlier benchmark already did."""
+    for stage, done in (("bench_load_and_chunk", suite.chunks), ("bench_embed", suite.vectors),
+                        ("bench_index_build", suite.store), ("bench_retrieval", suite.queries)):
+        if stage in stages and done is None:
+            getattr(suite, stage)()
+
+
+def test_load_and_chunk(benchmark, suite):
+    benchmark.pedantic(suite.bench_load_and_chunk, rounds=1, iterations=1)
+    assert suite.results["chunk"]["chunks"] > 0
+
+
+def test_embed(benchmark, suite):
+    prepare(suite, "bench_load_and_chunk")
+    benchmark.pedantic(suite.bench_embed, rounds=1, iterations=1)
+    assert len(suite.vectors) == len(suite.chunks)
+
+
+def test_index_build(benchmark, suite):
+    prepare(suite, "bench_load_and_chunk", "bench_embed")
+    benchmark.pedantic(suite.bench_index_build, rounds=1, iterations=1)
+    assert suite.store.count() == len(suite.chunks)
+
+
+def test_retrieval_single(benchmark, suite):
+    prepare(suite, "bench_load_and_chunk", "bench_embed", "bench_index_build", "bench_retrieval")
+    query_vector = suite.embeddings.embed_query(suite.queries[0][0])
+    results = benchmark(suite.store.similarity_search_with_score_by_vector, query_vector, k=suite.k)
+    assert len(results) == suite.k
+
+
+def test_retrieval_batched(benchmark, suite):
+    prepare(suite, "bench_load_and_chunk", "bench_embed", "bench_index_build", "bench_retrieval")
+    query_vectors = suite.embeddings.embed_documents([query for query, _ in suite.queries[:suite.batch_size]])
+    results = benchmark(suite.store.batch_similarity_search_with_score_by_vector, query_vectors, k=suite.k)
+    assert len(results) == len(query_vectors)
+
+
+def test_end_to_end(benchmark, suite):
+    prepare(suite, "bench_load_and_chunk", "bench_embed", "bench_index_build", "bench_retrieval")
+    from RagFromScratch.src.llm_backends import StubChatModel
+    from RagFromScratch.src.rag_chain import RAGSystemChain
+
+    chain = RAGSystemChain(llm=StubChatModel(latency_ms=suite.llm_latency_ms)).create_rag_chain(
+        suite.store.as_retriever(search_kwargs={"k": suite.k}))
+    result = benchmark(chain.invoke, suite.queries[0][0])
+    assert result["answer"]
@@ -0,0 +1,33 @@
+import time
+
+from RagFromScratch.src.embedding_cache import EmbeddingCache
+
+
+def key(number):
+    return EmbeddingCache.make_key("test", str(number))
+
+
+def test_puts_and_hits_do_not_count_or_update_every_time(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=100)
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+
+    for number in range(10):
+        cache.put_many([(key(number), [float(number)])])
+        assert cache.get_many([key(number)]) == {key(number): [float(number)]}
+
+    assert not [statement for statement in statements if "COUNT(*)" in statement or statement.startswith("UPDATE")]
+    assert cache._count == len(cache) == 10
+
+
+def test_eviction_keeps_the_recently_hit_entries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+    cache.put_many([(key(number), [float(number)]) for number in range(10)])
+    time.sleep(0.01)
+    cache.get_many([key(0), key(1)])
+
+    # Evicts down to 90% of the bound, the buffered hits are written before the oldest entries are chosen
+    cache.put_many([(key(10), [10.0])])
+    remaining = cache.get_many([key(number) for number in range(11)])
+    assert len(cache) == cache._count == 9
+    assert {key(0), key(1), key(10)} <= remaining.keys()
@@ -0,0 +1,47 @@
+import pytest
+
+from RagFromScratch.src.faq_index import FaqIndex
+
+FAQS = [("What is compound interest?", "Interest earned on both the principal and past interest."),
+        ("What is the 50/30/20 budgeting rule?", "Needs 50%, wants 30% and savings 20% of your income."),
+        ("How can I improve my credit score?", "Pay bills on time and keep your credit utilization low.")]
+
+
+@pytest.fixture
+def faq_index(embeddings):
+    # A low similarity threshold lets the hashing embeddings propose near misses, which must still be rejected
+    index = FaqIndex(embeddings=embeddings, fuzzy_match=True, fuzzy_threshold=80, similarity_threshold=0.5)
+    for prompt, response in FAQS:
+        index.add(prompt, response, source="faqs.csv")
+    return index
+
+
+@pytest.mark.parametrize("question", ["What is compound interest?", "  what is COMPOUND interest "])
+def test_exact_match(faq_index, question):
+    match = faq_index.match(question)
+    assert (match["method"], match["response"]) == ("exact", FAQS[0][1])
+
+
+def test_fuzzy_match_with_the_same_words(faq_index):
+    match = faq_index.match("Compound interest is what?")
+    assert match["method"] == "fuzzy"
+    assert match["prompt"] == FAQS[0][0]
+
+
+@pytest.mark.parametrize("question", ["What is not compound interest?",
+                                      "What isn't compound interest?",
+                                      "What is the 60/30/10 budgeting rule?",
+                                      "How can I avoid improving my credit score?"])
+def test_near_misses_are_rejected(faq_index, question):
+    assert faq_index.match(question) is None
+    assert faq_index.stats()["misses"] == 1
+
+
+def test_unrelated_question_misses(faq_index):
+    assert faq_index.match("Which documents do I need to open a bank account?") is None
+
+
+def test_fuzzy_match_is_off_by_default(embeddings):
+    index = FaqIndex(embeddings=None, fuzzy_match=False)
+    index.add(*FAQS[0])
+    assert index.match("Compound interest is what?") is None
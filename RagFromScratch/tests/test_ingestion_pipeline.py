@@ -0,0 +1,65 @@
+import os
+import threading
+
+import pytest
+
+from RagFromScratch.src.document_processor import DocumentProcessor
+from RagFromScratch.src.ingestion_pipeline import IngestionPipeline
+from RagFromScratch.src.vector_store_local import VectorStoreManager
+
+
+def create_pipeline():
+    # One chunk per batch and one batch per queue, so every stage is blocked on the next one
+    return IngestionPipeline(processor=DocumentProcessor(chunk_size=200, chunk_overlap=0), max_workers=1,
+                             batch_size=1, queue_size=1)
+
+
+def pipeline_threads():
+    return [thread for thread in threading.enumerate() if thread.name in ("ingest-loader", "ingest-embedder")]
+
+
+def test_run_writes_every_chunk(documents_folder, embeddings):
+    written = []
+    stats = create_pipeline().run(str(documents_folder), embeddings,
+                                  lambda chunks, vectors: written.extend(zip(chunks, vectors)))
+
+    assert stats["chunks"] == len(written) > 5
+    assert {chunk.metadata["source"] for chunk, _ in written} == {f"topic{number}.txt" for number in range(5)}
+    assert all(len(vector) == embeddings.dimension for _, vector in written)
+
+
+def test_writer_error_stops_every_stage(documents_folder, embeddings):
+    def write_batch(chunks, vectors):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        create_pipeline().run(str(documents_folder), embeddings, write_batch)
+    assert not pipeline_threads()
+
+
+def test_embedding_error_is_raised(documents_folder, embeddings, monkeypatch):
+    def embed_documents(texts):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(embeddings, "embed_documents", embed_documents)
+    written = []
+    with pytest.raises(RuntimeError, match="model crashed"):
+        create_pipeline().run(str(documents_folder), embeddings, lambda chunks, vectors: written.append(chunks))
+    assert not written
+    assert not pipeline_threads()
+
+
+def test_failed_rebuild_keeps_the_previous_store(documents_folder, embeddings, monkeypatch):
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=0)
+    manager = VectorStoreManager(embeddings=embeddings)
+    chunks = manager.build_vector_store_streaming(processor, str(documents_folder))
+
+    (documents_folder / "topic5.txt").write_text("A new document about topic5. " * 20, encoding="utf-8")
+    monkeypatch.setattr(embeddings, "embed_documents", lambda texts: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        manager.build_vector_store_streaming(processor, str(documents_folder))
+
+    store = VectorStoreManager(embeddings=embeddings).load_vector_store()
+    assert store.count() == chunks
+    storage = os.path.dirname(manager.persist_directory)
+    assert not [name for name in os.listdir(storage) if ".building-" in name]
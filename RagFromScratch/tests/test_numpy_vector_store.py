@@ -0,0 +1,16 @@
+from RagFromScratch.src.numpy_vector_store import NumpyVectorStore
+
+
+def test_get_by_ids_reads_only_the_requested_rows(tmp_path, embeddings):
+    texts = [f"Chunk {number} about topic{number}." for number in range(50)]
+    ids = [f"chunk{number:02d}" for number in range(50)]
+    NumpyVectorStore.from_texts(texts, embeddings, ids=ids, persist_directory=str(tmp_path))
+
+    store = NumpyVectorStore.load(str(tmp_path), embeddings)
+    documents = store.get_by_ids(["chunk42", "missing", "chunk07", "chunk99"])
+    assert [(doc.id, doc.page_content) for doc in documents] == [("chunk42", texts[42]), ("chunk07", texts[7])]
+    assert store._records is None
+
+    # Once the store is modified the IDs are resolved in memory again
+    store.delete(["chunk42"])
+    assert [doc.id for doc in store.get_by_ids(["chunk42", "chunk07"])] == ["chunk07"]
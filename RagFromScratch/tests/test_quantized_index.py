@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from RagFromScratch.src.numpy_vector_store import NumpyVectorStore
+from RagFromScratch.src.quantized_index import POPCOUNT, QuantizedIndex
+
+
+def clustered_vectors(count, dimension=64, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.3 * rng.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def noisy_queries(matrix, count, seed=1):
+    """Stored vectors with a little noise, as in the recall reports: unseen queries close to indexed rows."""
+    rng = np.random.default_rng(seed)
+    queries = matrix[rng.choice(len(matrix), count, replace=False)] + rng.normal(scale=0.05, size=(count, matrix.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_top_k(matrix, query, k):
+    return set(np.argsort(-(matrix @ query))[:k].tolist())
+
+
+def test_popcount_table_matches_unpackbits():
+    values = np.arange(256, dtype=np.uint8)
+    assert np.array_equal(POPCOUNT[values], np.unpackbits(values[:, None], axis=1).sum(axis=1))
+
+
+@pytest.mark.parametrize("mode, min_recall", [("int8", 0.99), ("binary", 0.9)])
+def test_rescored_search_recall(mode, min_recall):
+    matrix = clustered_vectors(2000)
+    queries = noisy_queries(matrix, 50)
+    index = QuantizedIndex(mode=mode, rescore_factor=10, block_size=512).build(matrix)
+
+    hits = 0
+    for query in queries:
+        rows, scores = index.search_rescored(matrix, query, 10)
+        assert np.all(np.diff(scores) <= 0)
+        np.testing.assert_allclose(scores, matrix[rows] @ query, rtol=1e-5)
+        hits += len(exact_top_k(matrix, query, 10).intersection(rows.tolist()))
+    assert hits / (10 * len(queries)) >= min_recall
+
+
+@pytest.mark.parametrize("mode", QuantizedIndex.MODES)
+def test_update_matches_a_rebuild_with_the_same_scales(mode):
+    matrix = clustered_vectors(500)
+    new_vectors = clustered_vectors(50, seed=2)
+    kept_rows = np.flatnonzero(np.arange(500) % 3)
+
+    index = QuantizedIndex(mode=mode).build(matrix)
+    updated = index.update(kept_rows, new_vectors)
+    rebuilt = QuantizedIndex(mode=mode)
+    rebuilt.scales = index.scales
+    rebuilt.codes = rebuilt._encode(np.concatenate([matrix[kept_rows], new_vectors]))
+    assert np.array_equal(updated.codes, rebuilt.codes)
+
+
+@pytest.mark.parametrize("mode", QuantizedIndex.MODES)
+def test_store_search_with_quantized_codes(tmp_path, embeddings, mode):
+    matrix = clustered_vectors(1000)
+    ids = [f"chunk{row}" for row in range(len(matrix))]
+    store = NumpyVectorStore(embeddings, persist_directory=str(tmp_path), quantization=mode)
+    store.add_embeddings([f"text {row}" for row in range(len(matrix))], matrix, ids=ids)
+    store.persist()
+
+    store = NumpyVectorStore.load(str(tmp_path), embeddings, quantization=mode)
+    assert store.quantized_index.ntotal == store.count()
+    for row in (0, 500, 999):
+        assert store.similarity_search_by_vector(matrix[row], k=1)[0].id == ids[row]
+
+    # Deletes and adds are applied to the persisted codes without re-quantizing the matrix
+    store.delete(ids[:100])
+    store.add_embeddings(["new text"], clustered_vectors(1, seed=3), ids=["new"])
+    store.persist()
+    store = NumpyVectorStore.load(str(tmp_path), embeddings, quantization=mode)
+    assert store.quantized_index.ntotal == store.count() == 901
+    assert store.similarity_search_by_vector(clustered_vectors(1, seed=3)[0], k=1)[0].id == "new"
+    found = {doc.id for query in noisy_queries(matrix, 50) for doc in store.similarity_search_by_vector(query, k=10)}
+    assert not found.intersection(ids[:100])
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+from RagFromScratch.src.llm_backends import StubChatModel  # noqa: E402
+from RagFromScratch.src.numpy_vector_store import NumpyVectorStore  # noqa: E402
+from RagFromScratch.src.rag_chain import RAGSystemChain  # noqa: E402
+from RagFromScratch.src.server import QueryServer  # noqa: E402
+
+
+class StubRagApp:
+    """The parts of RAGFromScratchApp the server uses, answering with a StubChatModel."""
+
+    def __init__(self, embeddings, latency_ms):
+        store = NumpyVectorStore.from_texts([f"Document {number} explains topic{number}." for number in range(5)],
+                                            embeddings)
+        self.latency_ms = latency_ms
+        self.rag_system = RAGSystemChain(llm=StubChatModel(latency_ms=latency_ms))
+        self.chain = self.rag_system.create_rag_chain(store.as_retriever(search_kwargs={"k": 2}))
+
+    async def abatch_query(self, questions):
+        await asyncio.to_thread(time.sleep, self.latency_ms / 1000)
+        return [{"question": question, "answer": "Stub answer"} for question in questions]
+
+    @staticmethod
+    def result_row(result):
+        return {"question": result["question"], "answer": result["answer"]}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def create_client(embeddings):
+    clients = []
+
+    def create(latency_ms, **server_params):
+        server = QueryServer(StubRagApp(embeddings, latency_ms), **server_params)
+        # Entered, so every request runs on one event loop and the slot release callbacks fire
+        client = TestClient(server.build_app()).__enter__()
+        clients.append(client)
+        return server, client
+
+    yield create
+    for client in clients:
+        client.__exit__(None, None, None)
+
+
+def test_query_answers(create_client):
+    server, client = create_client(latency_ms=0)
+    response = client.post("/query", json={"question": "What does document 3 explain?"})
+
+    assert response.status_code == 200
+    assert response.json()["answer"].startswith("Stub answer")
+    assert server.pending == 0
+
+
+def test_query_beyond_max_pending_is_rejected_with_429(create_client):
+    server, client = create_client(latency_ms=500, max_pending=1)
+    first = []
+    thread = threading.Thread(target=lambda: first.append(client.post("/query", json={"question": "topic1?"})))
+    thread.start()
+    wait_until(lambda: server.pending == 1)
+
+    response = client.post("/query", json={"question": "topic2?"})
+    thread.join()
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert first[0].status_code == 200
+    assert server.rejected == 1
+
+
+def test_query_past_the_deadline_is_answered_with_504(create_client):
+    server, client = create_client(latency_ms=1000, request_timeout=0.2)
+    started = time.monotonic()
+    response = client.post("/query", json={"question": "topic3?"})
+
+    assert response.status_code == 504
+    assert time.monotonic() - started < 1.0
+    assert server.timed_out == 1
+    # The slot stays taken until the worker thread is done with the abandoned call
+    assert server.pending == 1
+    wait_until(lambda: server.pending == 0)
+
+
+def test_batch_past_the_deadline_keeps_its_slots_until_done(create_client):
+    server, client = create_client(latency_ms=1000, request_timeout=0.2)
+    response = client.post("/batch", json={"questions": ["topic1?", "topic2?"]})
+
+    assert response.status_code == 504
+    assert server.pending == 2
+    wait_until(lambda: server.pending == 0)
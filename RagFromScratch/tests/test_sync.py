@@ -0,0 +1,67 @@
+from RagFromScratch.src.document_processor import DocumentProcessor
+from RagFromScratch.src.numpy_vector_store import NumpyVectorStore
+from RagFromScratch.src.vector_store_local import VectorStoreManager
+
+
+def chunk_sources(manager):
+    return [metadata["source"] for metadata in manager.get_vector_store().iter_metadatas()]
+
+
+def build(documents_folder, embeddings):
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=0)
+    manager = VectorStoreManager(embeddings=embeddings)
+    manager.build_vector_store_streaming(processor, str(documents_folder))
+    return manager, processor
+
+
+def test_sync_embeds_only_changed_files(documents_folder, embeddings):
+    manager, processor = build(documents_folder, embeddings)
+    (documents_folder / "topic1.txt").write_text("Rewritten text about zeppelins. " * 20, encoding="utf-8")
+    (documents_folder / "topic2.txt").unlink()
+
+    stats = manager.sync_vector_store(processor, str(documents_folder))
+
+    assert (stats["changed_files"], stats["removed_files"], stats["failed_files"]) == (1, 1, 0)
+    assert "topic2.txt" not in chunk_sources(manager)
+    assert [chunk_id for chunk_id, _ in manager.get_lexical_index().search("zeppelins")]
+    assert not manager.get_lexical_index().search("topic2")
+
+
+def test_sync_keeps_the_chunks_of_a_file_that_fails_to_load(documents_folder, embeddings, monkeypatch):
+    manager, processor = build(documents_folder, embeddings)
+    indexed = chunk_sources(manager).count("topic1.txt")
+    (documents_folder / "topic1.txt").write_text("Rewritten text about zeppelins. " * 20, encoding="utf-8")
+
+    load_file = processor.load_file
+    monkeypatch.setattr(processor, "load_file",
+                        lambda file_path, **kwargs: [] if file_path.endswith("topic1.txt")
+                        else load_file(file_path, **kwargs))
+    stats = manager.sync_vector_store(processor, str(documents_folder))
+
+    assert (stats["changed_files"], stats["failed_files"], stats["embedded_chunks"]) == (1, 1, 0)
+    assert chunk_sources(manager).count("topic1.txt") == indexed
+
+    # The manifest still holds the old hash, so the next sync retries the file
+    monkeypatch.setattr(processor, "load_file", load_file)
+    stats = manager.sync_vector_store(processor, str(documents_folder))
+
+    assert (stats["changed_files"], stats["failed_files"]) == (1, 0)
+    assert stats["embedded_chunks"] > 0
+    assert manager.get_lexical_index().search("zeppelins")
+
+
+def test_sync_deletes_the_stale_chunks_of_all_files_at_once(documents_folder, embeddings, monkeypatch):
+    manager, processor = build(documents_folder, embeddings)
+    for number in (1, 3):
+        (documents_folder / f"topic{number}.txt").write_text(f"Rewritten text number {number}. " * 20, encoding="utf-8")
+    (documents_folder / "topic2.txt").unlink()
+
+    deleted = []
+    delete = NumpyVectorStore.delete
+    monkeypatch.setattr(NumpyVectorStore, "delete",
+                        lambda store, ids=None, **kwargs: deleted.append(list(ids)) or delete(store, ids, **kwargs))
+    stats = manager.sync_vector_store(processor, str(documents_folder))
+
+    assert len(deleted) == 1 and len(deleted[0]) == stats["deleted_chunks"] > 0
+    sources = set(chunk_sources(manager))
+    assert "topic2.txt" not in sources and {"topic1.txt", "topic3.txt"} <= sources